@@ -0,0 +1,646 @@
+# benchmark_db.py
+#
+# Pomiar wydajności warstwy bazy danych bez uruchamiania interfejsu.
+# Uruchomienie: python benchmark_db.py [liczba_depozytów] [liczba_depozytów_wyszukiwania]
+
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+from database import (
+    CONNECTION_PROFILES, HOT_QUERIES, ANALYTICS_QUERIES, ACTIVE_DEPOSITS_QUERY, DEPOSIT_DURATION_SQL,
+    open_connection, migrate, check_query_plans, check_analytics_plans, check_rollups
+)
+from repositories import Repositories, ActiveDepositRow, DepositRepository, STATEMENT_CACHE_SIZE, PAGE_SIZE
+from reminders import REMINDERS, queue_reminders
+
+
+SURNAMES = ["Kowalski", "Nowak", "Wiśniewski", "Wójcik", "Kamiński", "Lewandowski", "Zieliński",
+            "Szymański", "Woźniak", "Dąbrowski", "Kozłowski", "Jankowski", "Mazur", "Krawczyk"]
+PLATE_PREFIXES = ["WA", "KR", "PO", "GD", "WR", "LU", "EL", "SK", "BI", "ZS"]
+
+
+def seed(conn, deposit_count):
+    """Wypełnia bazę losowymi (deterministycznymi) klientami i depozytami."""
+    migrate(conn)
+    client_count = max(1, deposit_count // 3)
+    conn.executemany(
+        "INSERT INTO clients (name, phone_number, email) VALUES (?, ?, ?)",
+        ((f"{SURNAMES[i % len(SURNAMES)]} {i}", f"500{i:06d}", f"klient{i}@example.com") for i in range(client_count))
+    )
+    start = datetime(2018, 1, 1)
+    sizes = ["205/55 R16", "195/65 R15", "225/45 R17", "215/60 R16"]
+
+    def rows():
+        for i in range(deposit_count):
+            deposit_date = start + timedelta(days=i % 2500)
+            status = "Aktywny" if i % 4 == 0 else "Wydany"
+            yield (
+                i % client_count + 1, "Model", f"{PLATE_PREFIXES[i % len(PLATE_PREFIXES)]} {i:05d}", "Michelin", sizes[i % len(sizes)], 4,
+                f"R{i % 40}", 0, 1, deposit_date.strftime("%Y-%m-%d %H:%M:%S"),
+                None if status == "Aktywny" else (deposit_date + timedelta(days=180)).strftime("%Y-%m-%d %H:%M:%S"),
+                status, "Zima" if i % 2 else "Lato",
+                (deposit_date + timedelta(days=180)).strftime("%Y-%m-%d"), "Dobry",
+                deposit_date.strftime("%Y-%m-%d"), 120.0,
+            )
+
+    conn.executemany('''
+        INSERT INTO deposits (
+            client_id, car_model, registration_number, tire_brand, tire_size, quantity, location,
+            washing, conservation, deposit_date, issue_date, status, season, expected_return_date,
+            technical_condition, storage_date, price
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows())
+    conn.commit()
+
+
+def bench_commit_latency(conn, iterations=200):
+    """Średni czas (ms) zapisu depozytu z wpisem historii, jak w save_deposit."""
+    started = time.perf_counter()
+    for i in range(iterations):
+        cursor = conn.execute(
+            "INSERT INTO deposits (client_id, registration_number, tire_size, quantity, deposit_date, status) "
+            "VALUES (1, ?, '205/55 R16', 4, ?, 'Aktywny')",
+            (f"BENCH {i}", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        )
+        conn.execute(
+            "INSERT INTO history (deposit_id, change_date, user, description) VALUES (?, ?, 'bench', 'Dodano')",
+            (cursor.lastrowid, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        )
+        conn.commit()
+    return (time.perf_counter() - started) * 1000 / iterations
+
+
+def bench_read_throughput(conn, repeats=5):
+    """Liczba wierszy na sekundę dla zapytania zakładki 'Depozyty aktywne'."""
+    rows = 0
+    started = time.perf_counter()
+    for _ in range(repeats):
+        rows += len(conn.execute(ACTIVE_DEPOSITS_QUERY, ("%%", "%%")).fetchall())
+    elapsed = time.perf_counter() - started
+    return rows / elapsed if elapsed else float("inf")
+
+
+def run_profiles(deposit_count):
+    print(f"Profile połączeń ({deposit_count} depozytów)")
+    print(f"{'profil':<20}{'commit [ms]':>14}{'odczyt [wiersze/s]':>22}")
+    for profile in CONNECTION_PROFILES:
+        work_dir = tempfile.mkdtemp(prefix="tdm_bench_")
+        try:
+            conn = open_connection(os.path.join(work_dir, "bench.db"), profile)
+            seed(conn, deposit_count)
+            latency = bench_commit_latency(conn)
+            throughput = bench_read_throughput(conn)
+            conn.close()
+            print(f"{profile:<20}{latency:>14.3f}{throughput:>22.0f}")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_repository_lookups(repos, deposit_count, iterations=20000):
+    """Liczba odczytów depozytu na sekundę (deposits.get - etykiety, potwierdzenia, kontakt)."""
+    started = time.perf_counter()
+    for i in range(iterations):
+        repos.deposits.get(i % deposit_count + 1)
+    elapsed = time.perf_counter() - started
+    return iterations / elapsed if elapsed else float("inf")
+
+
+def run_statement_cache(deposit_count):
+    """Porównanie pamięci przygotowanych zapytań: bez cache vs STATEMENT_CACHE_SIZE."""
+    print(f"Pamięć przygotowanych zapytań ({deposit_count} depozytów)")
+    work_dir = tempfile.mkdtemp(prefix="tdm_bench_")
+    try:
+        db_path = os.path.join(work_dir, "bench.db")
+        conn = open_connection(db_path)
+        seed(conn, deposit_count)
+        conn.close()
+        for cache_size in (0, STATEMENT_CACHE_SIZE):
+            repos = Repositories.open(db_path, cached_statements=cache_size)
+            rate = bench_repository_lookups(repos, deposit_count)
+            print(f"  cached_statements={cache_size:<6}{rate:>12.0f} odczytów/s")
+            repos.close()
+
+        # Raport QueryStats - te same liczniki, które aplikacja zbiera dla każdego zapytania
+        repos = Repositories.open(db_path)
+        bench_repository_lookups(repos, deposit_count, iterations=1000)
+        repos.deposits.list_active()
+        repos.deposits.statistics()
+        print(f"  {'zapytanie':<32}{'wykonań':>9}{'łącznie [ms]':>14}{'średnio [ms]':>14}")
+        for name, count, total_ms, avg_ms in repos.stats.report():
+            print(f"  {name:<32}{count:>9}{total_ms:>14.1f}{avg_ms:>14.3f}")
+        repos.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_search_latency(deposit_count, typed_text="Kowalski 1234"):
+    """Czas od naciśnięcia klawisza do wyniku na zakładce 'Depozyty aktywne': LIKE vs FTS5."""
+    print(f"Wyszukiwanie - czas na naciśnięcie klawisza ({deposit_count} depozytów)")
+    work_dir = tempfile.mkdtemp(prefix="tdm_bench_")
+    try:
+        db_path = os.path.join(work_dir, "bench.db")
+        conn = open_connection(db_path)
+        seed(conn, deposit_count)
+        conn.close()
+        repos = Repositories.open(db_path)
+        print(f"  {'tekst':<16}{'LIKE [ms]':>12}{'FTS5 [ms]':>12}{'wierszy':>10}{'zgodne':>8}")
+        like_total = fts_total = 0.0
+        all_equal = True
+        for length in range(1, len(typed_text) + 1):
+            text = typed_text[:length]
+            pattern = f"%{text}%"
+            started = time.perf_counter()
+            like_rows = repos.deposits._fetchall("bench.like", ACTIVE_DEPOSITS_QUERY, (pattern, pattern),
+                                                 ActiveDepositRow)
+            like_ms = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            rows = repos.deposits.list_active(text)
+            fts_ms = (time.perf_counter() - started) * 1000
+            like_total += like_ms
+            fts_total += fts_ms
+            # FTS5 ma zwracać dokładnie te same wiersze co LIKE
+            equal = sorted(rows) == sorted(like_rows)
+            all_equal = all_equal and equal
+            print(f"  {text!r:<16}{like_ms:>12.1f}{fts_ms:>12.1f}{len(rows):>10}{'tak' if equal else 'NIE':>8}")
+        print(f"  {'razem':<16}{like_total:>12.1f}{fts_total:>12.1f}")
+        repos.close()
+        return all_equal
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def counter_workflow(repos, iterations, unit_of_work):
+    """
+    Przyjęcie i wydanie depozytu przy ladzie (zapis + wpis historii w każdej akcji).
+    Zwraca liczbę akcji na sekundę; unit_of_work=False odtwarza osobne commity każdego zapisu.
+    """
+    action = repos.transaction if unit_of_work else nullcontext
+    started = time.perf_counter()
+    for i in range(iterations):
+        with action():
+            deposit_id = repos.deposits.create(
+                1, "Model", f"UOW {i:05d}", "Michelin", "205/55 R16", 4, "R1", False, False, "Aktywny", "Zima",
+                "2025-04-01", "Dobry", "2024-10-01", 120.0
+            )
+            repos.deposits.record_history(deposit_id, "Dodano nowy depozyt")
+        with action():
+            repos.deposits.mark_issued(deposit_id)
+            repos.deposits.record_history(deposit_id, "Oznaczono jako wydany")
+    elapsed = time.perf_counter() - started
+    return iterations * 2 / elapsed if elapsed else float("inf")
+
+
+def run_unit_of_work(deposit_count, iterations=300):
+    """Akcje na sekundę przy ladzie: commit każdego zapisu vs jedna jednostka pracy na akcję."""
+    print(f"Jednostka pracy - akcje przy ladzie ({deposit_count} depozytów, {iterations * 2} akcji)")
+    print(f"  {'profil':<20}{'osobne commity [akcje/s]':>26}{'jednostka pracy [akcje/s]':>28}")
+    for profile in CONNECTION_PROFILES:
+        work_dir = tempfile.mkdtemp(prefix="tdm_bench_")
+        try:
+            db_path = os.path.join(work_dir, "bench.db")
+            conn = open_connection(db_path, profile)
+            seed(conn, deposit_count)
+            conn.close()
+            repos = Repositories.open(db_path, profile)
+            separate = counter_workflow(repos, iterations, unit_of_work=False)
+            commits_before = repos.unit_of_work.commits
+            combined = counter_workflow(repos, iterations, unit_of_work=True)
+            commits_per_action = (repos.unit_of_work.commits - commits_before) / (iterations * 2)
+            repos.close()
+            print(f"  {profile:<20}{separate:>26.0f}{combined:>28.0f}   ({commits_per_action:.0f} commit/akcję)")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_keystroke_latency(deposit_count, typed_text="Kowalski 1234"):
+    """
+    Czas odpowiedzi na naciśnięcie klawisza: pełne zapytanie przy każdym znaku
+    vs wyszukiwanie przyrostowe (zawężanie poprzedniego wyniku w pamięci, jak SearchController).
+    """
+    print(f"Wyszukiwanie przyrostowe - czas na naciśnięcie klawisza ({deposit_count} depozytów)")
+    work_dir = tempfile.mkdtemp(prefix="tdm_bench_")
+    try:
+        db_path = os.path.join(work_dir, "bench.db")
+        conn = open_connection(db_path)
+        seed(conn, deposit_count)
+        conn.close()
+        repos = Repositories.open(db_path)
+        print(f"  {'tekst':<16}{'pełne [ms]':>12}{'przyrostowe [ms]':>18}{'wierszy':>10}")
+        full_total = incremental_total = 0.0
+        queries = 0
+        rows = previous_text = None
+        for length in range(1, len(typed_text) + 1):
+            text = typed_text[:length]
+            started = time.perf_counter()
+            full_rows = repos.deposits.list_active(text)
+            full_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            narrowed = repos.deposits.narrow(rows, previous_text, text) if rows is not None else None
+            if narrowed is None:
+                narrowed = repos.deposits.list_active(text)
+                queries += 1
+            incremental_ms = (time.perf_counter() - started) * 1000
+            rows, previous_text = narrowed, text
+
+            if {row.id for row in narrowed} != {row.id for row in full_rows}:
+                print(f"  BŁĄD: zawężony wynik dla {text!r} różni się od zapytania do bazy")
+            full_total += full_ms
+            incremental_total += incremental_ms
+            print(f"  {text!r:<16}{full_ms:>12.1f}{incremental_ms:>18.1f}{len(narrowed):>10}")
+        print(f"  {'razem':<16}{full_total:>12.1f}{incremental_total:>18.1f}"
+              f"   (zapytań do bazy: {len(typed_text)} vs {queries})")
+        repos.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_targeted_refresh(deposit_count, repeats=20):
+    """
+    Odświeżenie zakładek po zmianie jednego depozytu: przeładowanie trzech list i statystyk
+    (dawne zachowanie) vs pobranie tylko wierszy zmienionego ID (subskrybenci DepositChanged).
+    """
+    print(f"Odświeżenie po zmianie jednego depozytu ({deposit_count} depozytów)")
+    work_dir = tempfile.mkdtemp(prefix="tdm_bench_")
+    try:
+        db_path = os.path.join(work_dir, "bench.db")
+        conn = open_connection(db_path)
+        seed(conn, deposit_count)
+        conn.close()
+        repos = Repositories.open(db_path)
+        changed = []
+        repos.events.subscribe(None, changed.append)
+        deposit_id = repos.deposits.list_active()[0].id
+        full_total = targeted_total = 0.0
+        for _ in range(repeats):
+            repos.deposits.toggle_status(deposit_id)
+            started = time.perf_counter()
+            repos.deposits.list_active()
+            repos.deposits.list_issued()
+            repos.deposits.list_overdue()
+            repos.deposits.statistics()
+            full_total += time.perf_counter() - started
+
+            ids = changed[-1].ids
+            started = time.perf_counter()
+            repos.deposits.list_active_by_ids(ids)
+            repos.deposits.list_issued_by_ids(ids)
+            repos.deposits.list_overdue_by_ids(ids)
+            repos.deposits.statistics()
+            targeted_total += time.perf_counter() - started
+        print(f"  przeładowanie wszystkiego  {full_total * 1000 / repeats:8.1f} ms")
+        print(f"  tylko zmienione wiersze    {targeted_total * 1000 / repeats:8.1f} ms   (zdarzeń: {len(changed)})")
+        repos.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_change_detection(deposit_count, ticks=20):
+    """
+    Minutowy przebieg timera bez zmian w bazie: dawny zapis czasu trwania wszystkich depozytów
+    i przeładowanie zakładki vs sprawdzenie PRAGMA data_version i liczników zapisów (ChangeTracker).
+    """
+    print(f"Przebieg timera bez zmian w bazie ({deposit_count} depozytów)")
+    work_dir = tempfile.mkdtemp(prefix="tdm_bench_")
+    try:
+        db_path = os.path.join(work_dir, "bench.db")
+        conn = open_connection(db_path)
+        seed(conn, deposit_count)
+        conn.close()
+        repos = Repositories.open(db_path)
+        other = Repositories.open(db_path)
+        # Dawny przebieg: kolumna duration przepisywana co minutę w całej tabeli
+        repos.conn.execute("ALTER TABLE deposits ADD COLUMN duration INTEGER")
+        started = time.perf_counter()
+        for _ in range(ticks):
+            with repos.transaction():
+                repos.conn.execute(f"UPDATE deposits SET duration = {DEPOSIT_DURATION_SQL} WHERE deposit_date IS NOT NULL")
+            repos.deposits.list_active()
+        full = (time.perf_counter() - started) * 1000 / ticks
+
+        today = datetime.now().date().isoformat()
+        repos.changes.mark("active", ("deposits", "clients"), today)
+        reloads = 0
+        started = time.perf_counter()
+        for _ in range(ticks):
+            if repos.changes.changed("active", ("deposits", "clients"), today):
+                repos.deposits.list_active()
+                reloads += 1
+        skipped = (time.perf_counter() - started) * 1000 / ticks
+        # Zapis z innego połączenia (np. druga instancja programu) musi zostać wykryty
+        other.deposits.toggle_status(other.deposits.list_active()[0].id)
+        detected = repos.changes.changed("active", ("deposits", "clients"))
+        print(f"  przeliczenie i przeładowanie {full:8.2f} ms")
+        print(f"  wykrywanie zmian             {skipped:8.2f} ms   (przeładowań: {reloads}, "
+              f"zapis innego połączenia wykryty: {'tak' if detected else 'NIE'})")
+        other.close()
+        repos.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_statistics_cache(deposit_count, repeats=20):
+    """Zakładka statystyk: agregaty liczone za każdym razem vs StatisticsCache (bez zmian i po zapisie)."""
+    print(f"Statystyki z pamięci wyników ({deposit_count} depozytów)")
+    work_dir = tempfile.mkdtemp(prefix="tdm_bench_")
+    try:
+        db_path = os.path.join(work_dir, "bench.db")
+        conn = open_connection(db_path)
+        seed(conn, deposit_count)
+        conn.close()
+        repos = Repositories.open(db_path)
+        started = time.perf_counter()
+        for _ in range(repeats):
+            expected = (repos.deposits.statistics(), repos.deposits.monthly_counts())
+        uncached = (time.perf_counter() - started) * 1000 / repeats
+
+        repos.statistics.summary()
+        started = time.perf_counter()
+        for _ in range(repeats):
+            cached_result = repos.statistics.summary()
+        cached = (time.perf_counter() - started) * 1000 / repeats
+
+        deposit_id = repos.deposits.list_active()[0].id
+        repos.deposits.toggle_status(deposit_id)
+        started = time.perf_counter()
+        changed_result = repos.statistics.summary()
+        after_write = (time.perf_counter() - started) * 1000
+        consistent = cached_result[:2] == expected and changed_result[:2] == (repos.deposits.statistics(),
+                                                                               repos.deposits.monthly_counts())
+        print(f"  bez pamięci                {uncached:8.2f} ms")
+        print(f"  z pamięci, bez zmian       {cached:8.3f} ms")
+        print(f"  po zapisie depozytu        {after_write:8.2f} ms   (wyniki zgodne: {'tak' if consistent else 'NIE'})")
+        for name, hits, misses, total_ms in repos.statistics.counters():
+            print(f"    {name:<24} z pamięci {hits:4d}  przeliczeń {misses:3d}  {total_ms:8.1f} ms")
+        repos.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_rollups(deposit_count, repeats=10):
+    """Statystyki: agregaty po całej tabeli deposits vs odczyt zestawień deposit_rollups; kontrola zgodności."""
+    print(f"Zestawienia statystyk ({deposit_count} depozytów)")
+    work_dir = tempfile.mkdtemp(prefix="tdm_bench_")
+    try:
+        db_path = os.path.join(work_dir, "bench.db")
+        conn = open_connection(db_path)
+        seed(conn, deposit_count)
+        conn.close()
+        repos = Repositories.open(db_path)
+        raw_queries = (
+            "SELECT COUNT(*) FROM deposits WHERE status = 'Aktywny'",
+            "SELECT COUNT(*) FROM deposits WHERE status = 'Wydany'",
+            f"SELECT AVG({DEPOSIT_DURATION_SQL}) FROM deposits",
+            "SELECT SUM(price) FROM deposits WHERE status = 'Aktywny'",
+            "SELECT strftime('%Y-%m', deposit_date) AS month, COUNT(*) FROM deposits GROUP BY month ORDER BY month",
+            "SELECT season, status, COUNT(*), SUM(price) FROM deposits GROUP BY season, status",
+            "SELECT location, status, COUNT(*), SUM(price) FROM deposits GROUP BY location, status",
+        )
+        started = time.perf_counter()
+        for _ in range(repeats):
+            for query in raw_queries:
+                repos.conn.execute(query).fetchall()
+        raw = (time.perf_counter() - started) * 1000 / repeats
+        started = time.perf_counter()
+        for _ in range(repeats):
+            repos.deposits.statistics()
+            repos.deposits.monthly_counts()
+            repos.deposits.rollup("season")
+            repos.deposits.rollup("location")
+        rolled = (time.perf_counter() - started) * 1000 / repeats
+        rollup_rows = repos.conn.execute("SELECT COUNT(*) FROM deposit_rollups").fetchone()[0]
+        problems = check_rollups(repos.conn)
+        print(f"  agregaty po tabeli deposits {raw:8.1f} ms")
+        print(f"  zestawienia                 {rolled:8.2f} ms   ({rollup_rows} wierszy zestawień, "
+              f"rozbieżności: {len(problems)})")
+        repos.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_pagination(deposit_count, pages=10):
+    """Historia wydanych depozytów: całość jednym zapytaniem vs pierwsza i kolejne strony (keyset)."""
+    print(f"Stronicowanie historii wydanych depozytów ({deposit_count} depozytów, strona {PAGE_SIZE})")
+    work_dir = tempfile.mkdtemp(prefix="tdm_bench_")
+    try:
+        db_path = os.path.join(work_dir, "bench.db")
+        conn = open_connection(db_path)
+        seed(conn, deposit_count)
+        conn.close()
+        repos = Repositories.open(db_path)
+        started = time.perf_counter()
+        total = len(repos.deposits.list_issued())
+        print(f"  wszystkie wiersze ({total})     {(time.perf_counter() - started) * 1000:8.1f} ms")
+        after = None
+        for page in range(1, pages + 1):
+            started = time.perf_counter()
+            rows = repos.deposits.list_issued_page(after)
+            elapsed = (time.perf_counter() - started) * 1000
+            if page in (1, pages):
+                print(f"  strona {page:<22}{elapsed:8.1f} ms")
+            if len(rows) < PAGE_SIZE:
+                break
+            after = DepositRepository.issued_page_key(rows[-1])
+        repos.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_column_projection(deposit_count, repeats=5):
+    """Zakładka aktywnych depozytów: wszystkie kolumny vs tylko widoczne (typowy zestaw kilku kolumn)."""
+    print(f"Pobieranie tylko widocznych kolumn ({deposit_count} depozytów)")
+    work_dir = tempfile.mkdtemp(prefix="tdm_bench_")
+    try:
+        db_path = os.path.join(work_dir, "bench.db")
+        conn = open_connection(db_path)
+        seed(conn, deposit_count)
+        conn.close()
+        repos = Repositories.open(db_path)
+        visible = {"id", "client_name", "car_model", "registration_number", "tire_brand", "tire_size",
+                   "location", "deposit_date"}
+        hidden = {index for index, field in enumerate(ActiveDepositRow._fields) if field not in visible}
+        for label, hidden_columns in (("wszystkie kolumny", ()), (f"widoczne ({len(visible)})", hidden)):
+            started = time.perf_counter()
+            for _ in range(repeats):
+                repos.deposits.list_active("", hidden_columns)
+            elapsed = (time.perf_counter() - started) * 1000 / repeats
+            tracemalloc.start()
+            rows = repos.deposits.list_active("", hidden_columns)
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            print(f"  {label:<20}{elapsed:8.1f} ms {memory / 1024 / 1024:8.1f} MB   ({len(rows)} wierszy)")
+            del rows
+        repos.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_analytics(deposit_count, repeats=10):
+    """Zakładka analiz: osobne zapytanie dla każdego miesiąca i dnia vs funkcje okna vs AnalyticsCache."""
+    print(f"Analizy ({deposit_count} depozytów)")
+    work_dir = tempfile.mkdtemp(prefix="tdm_bench_")
+    try:
+        db_path = os.path.join(work_dir, "bench.db")
+        conn = open_connection(db_path)
+        seed(conn, deposit_count)
+        conn.close()
+        repos = Repositories.open(db_path)
+        # Szczyt jesienny w zakresie dat depozytów z seed()
+        start, end = "2023-10-01", "2023-12-16"
+        months = [row[0] for row in repos.conn.execute(
+            "SELECT DISTINCT strftime('%Y-%m', deposit_date) FROM deposits ORDER BY 1 DESC LIMIT 12")]
+        days = [(datetime(2023, 10, 1) + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(76)]
+
+        started = time.perf_counter()
+        for _ in range(repeats):
+            for month in months:
+                month_end = f"{month}-31 99"
+                repos.conn.execute('''
+                    SELECT location, COUNT(*) FROM deposits
+                    WHERE deposit_date <= ? AND (issue_date IS NULL OR issue_date > ?) GROUP BY location
+                ''', (month_end, month_end)).fetchall()
+                repos.conn.execute("SELECT SUM(price) FROM deposits WHERE strftime('%Y-%m', deposit_date) = ?",
+                                   (month,)).fetchone()
+            for day in days:
+                repos.conn.execute("SELECT COUNT(*) FROM deposits WHERE DATE(deposit_date) = ?", (day,)).fetchone()
+                repos.conn.execute("SELECT COUNT(*) FROM deposits WHERE DATE(issue_date) = ?", (day,)).fetchone()
+            repos.conn.execute(
+                "SELECT season, julianday(issue_date) - julianday(deposit_date) FROM deposits WHERE issue_date IS NOT NULL"
+            ).fetchall()
+        per_period = (time.perf_counter() - started) * 1000 / repeats
+
+        started = time.perf_counter()
+        for _ in range(repeats):
+            repos.analytics.occupancy()
+            repos.analytics.throughput(start, end)
+            repos.analytics.dwell_by_season(years=10)
+            repos.analytics.revenue_by_month()
+        windowed = (time.perf_counter() - started) * 1000 / repeats
+
+        repos.dashboard.dashboard(start, end)
+        started = time.perf_counter()
+        for _ in range(repeats):
+            repos.dashboard.dashboard(start, end)
+        cached = (time.perf_counter() - started) * 1000 / repeats
+
+        regressions = check_analytics_plans(repos.conn)
+        print(f"  zapytanie na miesiąc/dzień {per_period:8.1f} ms   ({len(months) * 2 + len(days) * 2 + 1} zapytań)")
+        print(f"  funkcje okna               {windowed:8.2f} ms   (4 zapytania)")
+        print(f"  z pamięci, bez zmian       {cached:8.3f} ms")
+        for name in ANALYTICS_QUERIES:
+            print(f"    {name:<24}{'PEŁNY SKAN: ' + ' | '.join(regressions[name]) if name in regressions else 'indeksy dat'}")
+        repos.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_reminders(deposit_count):
+    """
+    Przypomnienia o odbiorze: wszystkie aktywne depozyty i daty liczone w Pythonie (dawny przebieg)
+    vs przedziały terminów po indeksie. Drugi przebieg tego samego dnia nie może niczego powtórzyć.
+    """
+    print(f"Przypomnienia ({deposit_count} depozytów)")
+    work_dir = tempfile.mkdtemp(prefix="tdm_bench_")
+    try:
+        db_path = os.path.join(work_dir, "bench.db")
+        conn = open_connection(db_path)
+        seed(conn, deposit_count)
+        conn.close()
+        repos = Repositories.open(db_path)
+        active = repos.conn.execute("SELECT COUNT(*) FROM deposits WHERE status = 'Aktywny'").fetchone()[0]
+        # Dzień przebiegu: tydzień przed terminem odbioru depozytu ze środka danych
+        middle = repos.conn.execute("SELECT expected_return_date FROM deposits WHERE status = 'Aktywny' "
+                                    "ORDER BY expected_return_date LIMIT 1 OFFSET ?", (active // 2,)).fetchone()[0]
+        today = datetime.strptime(middle, '%Y-%m-%d').date() - timedelta(days=7)
+
+        started = time.perf_counter()
+        rows = repos.conn.execute('''
+            SELECT deposits.id, clients.name, clients.email, deposits.expected_return_date
+            FROM deposits
+            INNER JOIN clients ON deposits.client_id = clients.id
+            WHERE deposits.status = 'Aktywny'
+        ''').fetchall()
+        seven_days = [row[0] for row in rows
+                      if row[2] and row[3] and (datetime.strptime(row[3], '%Y-%m-%d').date() - today).days == 7]
+        python_scan = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        queued = queue_reminders(repos, "Serwis", today)
+        indexed = (time.perf_counter() - started) * 1000
+
+        # Oczekiwane przypomnienia: każdy depozyt w przedziale dokładnie jednego rodzaju
+        expected = set()
+        for row in rows:
+            days_left = (datetime.strptime(row[3], '%Y-%m-%d').date() - today).days
+            for reminder in REMINDERS:
+                if reminder.first_day <= days_left <= reminder.last_day:
+                    expected.add((row[0], reminder.name))
+        recorded = set(repos.conn.execute("SELECT deposit_id, reminder FROM deposit_reminders").fetchall())
+        outbox = repos.conn.execute("SELECT COUNT(*) FROM email_outbox").fetchone()[0]
+        complete = recorded == expected and outbox == len(expected) and set(seven_days) <= {
+            deposit_id for deposit_id, name in recorded if name == "days_7"}
+
+        started = time.perf_counter()
+        repeated = queue_reminders(repos, "Serwis", today)
+        second_run = (time.perf_counter() - started) * 1000
+
+        # Nowy termin odbioru - przypomnienia dla niego wychodzą od nowa
+        deposit_id = seven_days[0]
+        repos.conn.execute("UPDATE deposits SET expected_return_date = ? WHERE id = ?",
+                           ((today + timedelta(days=6)).isoformat(), deposit_id))
+        repos.conn.commit()
+        rearmed = queue_reminders(repos, "Serwis", today)
+
+        print(f"  wszystkie aktywne + daty w Pythonie {python_scan:8.1f} ms   ({active} aktywnych, "
+              f"{len(seven_days)} przypomnień 7 dni)")
+        print(f"  przedziały terminów po indeksie     {indexed:8.1f} ms   ({queued})")
+        print(f"  drugi przebieg                      {second_run:8.1f} ms   "
+              f"(powtórzone: {sum(repeated.values())}, zgodne z oczekiwanymi: {'tak' if complete else 'NIE'})")
+        print(f"  po zmianie terminu odbioru          ponownie {sum(rearmed.values())} przypomnienie")
+        repos.close()
+        return complete and not any(repeated.values()) and rearmed == {**repeated, "days_7": 1}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_query_plan_check():
+    """Kontrola EXPLAIN QUERY PLAN: zwraca False, jeśli gorące zapytanie lub zapytanie analiz spadło do SCAN."""
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    regressions = check_query_plans(conn)
+    print(f"Plany zapytań ({len(HOT_QUERIES)} zapytań)")
+    for name in HOT_QUERIES:
+        print(f"  {name:<32}{'REGRESJA: ' + ' | '.join(regressions[name]) if name in regressions else 'OK'}")
+    analytics_regressions = check_analytics_plans(conn)
+    print(f"Plany zapytań analiz ({len(ANALYTICS_QUERIES)} zapytań)")
+    for name in ANALYTICS_QUERIES:
+        print(f"  {name:<32}{'REGRESJA: ' + ' | '.join(analytics_regressions[name]) if name in analytics_regressions else 'OK'}")
+    conn.close()
+    return not regressions and not analytics_regressions
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    search_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+    plans_ok = run_query_plan_check()
+    run_profiles(count)
+    run_statement_cache(count)
+    run_unit_of_work(count)
+    search_ok = run_search_latency(search_count)
+    run_keystroke_latency(search_count)
+    run_targeted_refresh(count)
+    run_change_detection(count)
+    run_statistics_cache(count)
+    run_rollups(count)
+    run_analytics(count)
+    reminders_ok = run_reminders(search_count)
+    run_pagination(search_count)
+    run_column_projection(search_count)
+    sys.exit(0 if plans_ok and reminders_ok and search_ok else 1)
@@ -0,0 +1,238 @@
+# benchmark_mail.py
+#
+# Pomiar wysyłki e-maili (mailer.MailSender, kolejka outbox.OutboxSender) na lokalnym zastępczym serwerze SMTP, bez sieci
+# i bez interfejsu. Opóźnienie przy połączeniu udaje uzgadnianie TLS i logowanie prawdziwego serwera.
+# Uruchomienie: python benchmark_mail.py [liczba_wiadomości]
+
+import logging
+import os
+import shutil
+import smtplib
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+
+from PySide6.QtCore import QCoreApplication, QEvent
+
+from database import DEFAULT_PROFILE, migrate
+from mailer import MailSender, Message
+from outbox import OutboxSender, retry_delay
+from repositories import Repositories
+
+
+class StandInSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Minimalny serwer SMTP (EHLO, AUTH, MAIL, RCPT, DATA, RSET, QUIT) liczący doręczone wiadomości.
+    connect_delay - opóźnienie powitania [s]; drop_after - zrywa połączenie po tylu wiadomościach w sesji.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, connect_delay=0.0, drop_after=None):
+        super().__init__(("127.0.0.1", 0), StandInSMTPHandler)
+        self.connect_delay = connect_delay
+        self.drop_after = drop_after
+        self.delivered = []
+        self.sessions = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class StandInSMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        time.sleep(server.connect_delay)
+        with server.lock:
+            server.sessions += 1
+        self.reply("220 localhost ESMTP")
+        session_messages = 0
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.wfile.write(b"250-localhost\r\n250 AUTH PLAIN LOGIN\r\n")
+            elif command.startswith("AUTH"):
+                self.reply("235 Authentication successful")
+            elif command.startswith("MAIL"):
+                recipients = []
+                self.reply("250 OK")
+            elif command.startswith("RCPT"):
+                recipients.append(line.decode().split(":", 1)[1].strip().strip("<>"))
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                if server.drop_after is not None and session_messages >= server.drop_after:
+                    return  # zerwane połączenie przed potwierdzeniem - wiadomość nie została przyjęta
+                session_messages += 1
+                with server.lock:
+                    server.delivered.extend(recipients)
+                self.reply("250 OK")
+            elif command in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+def _dispose(sender):
+    """Usuwa zakończony wątek OutboxSender od razu, a nie przy zamykaniu interpretera."""
+    sender.wait()
+    sender.deleteLater()
+    QCoreApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+
+
+def _settings(server):
+    return {"email_address": "serwis@example.com", "email_password": "haslo",
+            "smtp_server": "127.0.0.1", "smtp_port": str(server.port)}
+
+
+def _messages(count):
+    return [Message(f"klient{i}@example.com", "Przypomnienie o odbiorze opon", f"Wiadomość {i}") for i in range(count)]
+
+
+def run_session_reuse(message_count, connect_delay=0.02):
+    """Połączenie i logowanie dla każdej wiadomości (dawna wysyłka) vs jedna sesja na paczkę."""
+    print(f"Wysyłka {message_count} wiadomości (opóźnienie połączenia {connect_delay * 1000:.0f} ms)")
+    messages = _messages(message_count)
+    with StandInSMTPServer(connect_delay) as server:
+        started = time.perf_counter()
+        for message in messages:
+            with MailSender(_settings(server), smtp_factory=smtplib.SMTP) as sender:
+                sender.send(message)
+        per_message = time.perf_counter() - started
+        per_message_sessions = server.sessions
+
+    with StandInSMTPServer(connect_delay) as server:
+        started = time.perf_counter()
+        with MailSender(_settings(server), smtp_factory=smtplib.SMTP) as sender:
+            reports = sender.send_all(messages)
+        batched = time.perf_counter() - started
+        complete = sorted(server.delivered) == sorted(message.to_address for message in messages)
+        print(f"  sesja na wiadomość    {per_message * 1000:9.1f} ms   ({per_message_sessions} połączeń, "
+              f"{message_count / per_message:7.1f} wiadomości/s)")
+        print(f"  sesja na paczkę       {batched * 1000:9.1f} ms   ({server.sessions} połączeń, "
+              f"{message_count / batched:7.1f} wiadomości/s, doręczone wszystkie: {'tak' if complete else 'NIE'})")
+        for number, report in enumerate(reports, 1):
+            print(f"    paczka {number:<3} wysłano {len(report.sent):4d}  błędów {len(report.failed):2d}  "
+                  f"logowań {report.connections}  {len(report.sent) / max(report.seconds, 1e-6):8.1f} wiadomości/s")
+    return complete
+
+
+def run_reconnect(message_count, drop_after=7):
+    """Serwer zrywa połączenie co drop_after wiadomości - każda wiadomość ma zostać doręczona dokładnie raz."""
+    print(f"Ponowne połączenie po zerwaniu sesji (co {drop_after} wiadomości)")
+    messages = _messages(message_count)
+    with StandInSMTPServer(drop_after=drop_after) as server:
+        with MailSender(_settings(server), smtp_factory=smtplib.SMTP) as sender:
+            reports = sender.send_all(messages)
+        delivered_once = sorted(server.delivered) == sorted(message.to_address for message in messages)
+        sent = sum(len(report.sent) for report in reports)
+        failed = sum(len(report.failed) for report in reports)
+        print(f"  wysłano {sent}, błędów {failed}, połączeń {server.sessions}, "
+              f"doręczone dokładnie raz: {'tak' if delivered_once else 'NIE'}")
+    return delivered_once and failed == 0
+
+
+def run_outbox(message_count, rate=40):
+    """
+    Kolejka email_outbox: wysyłka z historią, limit wiadomości na minutę, ponowienie po awarii serwera
+    i wątek OutboxSender budzony po dopisaniu wiadomości.
+    """
+    print(f"Kolejka wysyłki ({message_count} wiadomości, limit {rate}/min)")
+    work_dir = tempfile.mkdtemp(prefix="tdm_bench_")
+    try:
+        db_path = os.path.join(work_dir, "bench.db")
+        repos = Repositories.open(db_path)
+        migrate(repos.conn)
+        with StandInSMTPServer() as server:
+            repos.settings.save({**_settings(server), "email_rate_per_minute": str(rate)})
+            with repos.transaction():
+                for message in _messages(message_count):
+                    repos.emails.enqueue(*message)
+            sender = OutboxSender(db_path, DEFAULT_PROFILE, smtp_factory=smtplib.SMTP)
+            started = time.perf_counter()
+            wait = sender.drain(repos)
+            elapsed = time.perf_counter() - started
+            _dispose(sender)
+            counts = repos.emails.outbox_counts()
+            capped = len(server.delivered) == min(rate, message_count) and (message_count <= rate or wait > 0)
+            print(f"  pierwsza seria: wysłano {len(server.delivered)} w {elapsed * 1000:.1f} ms, "
+                  f"następna za {wait:.0f} s   (limit zachowany: {'tak' if capped else 'NIE'})")
+            history = len(repos.emails.history())
+            print(f"  stan kolejki {counts}, wpisów historii {history}")
+            ok = capped and history == counts.get("Wysłany", 0) == len(server.delivered)
+
+        # Serwer nieosiągalny: zajęta paczka wraca do kolejki bez liczenia próby, z przesuniętym terminem
+        repos.emails.enqueue("klient@example.com", "Przypomnienie o odbiorze opon", "Wiadomość po awarii")
+        pending_before = repos.emails.outbox_counts().get("Oczekuje", 0)
+        sender = OutboxSender(db_path, DEFAULT_PROFILE, smtp_factory=smtplib.SMTP)
+        wait = sender.drain(repos)
+        _dispose(sender)
+        released = repos.conn.execute(
+            "SELECT COUNT(*), SUM(attempts) FROM email_outbox WHERE status = 'Oczekuje' AND last_error IS NOT NULL"
+        ).fetchone()
+        backoff = released == (min(rate, pending_before), 0) and wait == retry_delay(1).total_seconds()
+        print(f"  serwer wyłączony: wstrzymanych {released[0]} z {pending_before} oczekujących, prób {released[1]}, "
+              f"ponowienie za {wait:.0f} s   (ponowienie z przerwą: {'tak' if backoff else 'NIE'})")
+        ok = ok and backoff
+
+        # Wątek w tle: nowa wiadomość wysłana po wake() bez czekania na kolejne sprawdzenie kolejki
+        repos.conn.execute("UPDATE email_outbox SET status = 'Wysłany' WHERE status = 'Oczekuje'")
+        repos.conn.commit()
+        with StandInSMTPServer() as server:
+            repos.settings.save(_settings(server))
+            sender = OutboxSender(db_path, DEFAULT_PROFILE, smtp_factory=smtplib.SMTP)
+            sender.start()
+            repos.emails.enqueue("klient@example.com", "Przypomnienie o odbiorze opon", "Wiadomość z wątku")
+            started = time.perf_counter()
+            sender.wake()
+            while not server.delivered and time.perf_counter() - started < 10:
+                time.sleep(0.01)
+            latency = time.perf_counter() - started
+            sender.stop()
+            _dispose(sender)
+        delivered = server.delivered == ["klient@example.com"]
+        print(f"  wątek w tle: doręczono po {latency * 1000:.0f} ms   ({'tak' if delivered else 'NIE'})")
+        repos.close()
+        return ok and delivered
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    # Ostrzeżenia o zerwanych połączeniach są tu oczekiwane - bez wypisywania na konsolę
+    logging.getLogger("TireDepositManager").addHandler(logging.NullHandler())
+    # Wątek OutboxSender jak w programie - przy istniejącej aplikacji Qt
+    app = QCoreApplication(sys.argv)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    ok = run_session_reuse(count)
+    ok = run_reconnect(count) and ok
+    ok = run_outbox(count) and ok
+    app.shutdown()
+    del app
+    sys.exit(0 if ok else 1)
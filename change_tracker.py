@@ -0,0 +1,49 @@
+# change_tracker.py
+#
+# Wykrywanie zmian w bazie bez czytania danych. PRAGMA data_version zmienia się po zapisie
+# z innego połączenia (wątek bazy, druga instancja programu), a conn.total_changes po zapisie
+# z własnego - dopiero wtedy czytane są liczniki zapisów table_versions, podbijane wyzwalaczami.
+# Timery i zakładki porównują je ze stanem z ostatniego przebiegu i pomijają pracę bez zmian.
+
+
+class ChangeTracker:
+    """
+    Wersje tabel widziane przez jedno połączenie.
+
+    mark(klucz, tabele) zapamiętuje wersje tabel (i opcjonalny stan, np. datę) z chwili
+    wykonania pracy, changed(klucz, tabele) mówi, czy od tamtej pory coś się zmieniło.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._token = None
+        self._versions = {}
+        self._marks = {}  # klucz -> (wersje tabel, stan)
+
+    def versions(self):
+        """Liczniki zapisów {tabela: wersja}; bez zmian w bazie nie są ponownie czytane."""
+        token = (self.conn.execute("PRAGMA data_version").fetchone()[0], self.conn.total_changes)
+        if token != self._token:
+            self._versions = dict(self.conn.execute("SELECT table_name, version FROM table_versions"))
+            self._token = token
+        return self._versions
+
+    def snapshot(self, tables):
+        versions = self.versions()
+        return tuple(versions.get(table) for table in tables)
+
+    def changed(self, key, tables, state=None):
+        """Czy tabele (lub stan) zmieniły się od ostatniego mark(key); bez mark - zawsze True."""
+        return self._marks.get(key) != (self.snapshot(tables), state)
+
+    def mark(self, key, tables, state=None):
+        self._marks[key] = (self.snapshot(tables), state)
+
+    def run_if_changed(self, key, tables, work, state=None):
+        """Wykonuje work() tylko po zmianie tabel lub stanu od poprzedniego przebiegu (pominięcie zwraca None)."""
+        if not self.changed(key, tables, state):
+            return None
+        result = work()
+        # Wersje po pracy - własne zapisy work() nie wymuszą kolejnego przebiegu
+        self.mark(key, tables, state)
+        return result
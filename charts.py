@@ -0,0 +1,124 @@
+# charts.py
+#
+# Wykres słupkowy zakładki statystyk rysowany bezpośrednio przez QPainter z zagregowanych danych -
+# bez pliku PNG pośredniczącego i bez matplotlib przy starcie programu. matplotlib jest tylko
+# opcjonalnym backendem eksportu wykresu do pliku i jest importowany dopiero przy eksporcie.
+
+import math
+
+from PySide6.QtCore import Qt, QRectF, QPointF
+from PySide6.QtGui import QColor, QPainter, QPen
+from PySide6.QtWidgets import QSizePolicy, QWidget
+
+BAR_COLOR = QColor("#1f77b4")
+GRID_COLOR = QColor("#e0e0e0")
+
+# Orientacyjna liczba linii siatki na osi wartości
+Y_TICKS = 5
+
+
+def nice_step(max_value, ticks=Y_TICKS):
+    """Krok osi wartości z szeregu 1, 2, 5 * 10^n, dający około `ticks` linii siatki."""
+    if max_value <= 0:
+        return 1
+    raw = max_value / ticks
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for factor in (1, 2, 5, 10):
+        if raw <= factor * magnitude:
+            return max(1, factor * magnitude)
+    return 10 * magnitude
+
+
+class BarChart(QWidget):
+    """Wykres słupkowy: set_data(etykiety, wartości). Przerysowywany tylko przy zmianie danych lub rozmiaru."""
+
+    def __init__(self, title="", x_label="", y_label="", parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.x_label = x_label
+        self.y_label = y_label
+        self.labels = []
+        self.values = []
+        self.setMinimumSize(400, 250)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+    def set_data(self, labels, values):
+        self.labels = [str(label) for label in labels]
+        self.values = list(values)
+        self.update()
+
+    def paintEvent(self, _event):
+        painter = QPainter(self)
+        try:
+            self._paint(painter)
+        finally:
+            painter.end()
+
+    def _paint(self, painter):
+        painter.fillRect(self.rect(), Qt.white)
+        metrics = painter.fontMetrics()
+        line = metrics.height()
+        step = nice_step(max(self.values, default=0))
+        top_value = step * max(1, math.ceil(max(self.values, default=0) / step))
+
+        left = metrics.horizontalAdvance(str(top_value)) + line * 2
+        plot = QRectF(left, line * 2, self.width() - left - line, self.height() - line * 5)
+        if plot.width() <= 0 or plot.height() <= 0:
+            return
+
+        painter.setPen(Qt.black)
+        painter.drawText(QRectF(0, 0, self.width(), line * 2), Qt.AlignCenter, self.title)
+        painter.drawText(QRectF(plot.left(), self.height() - line * 1.5, plot.width(), line), Qt.AlignCenter,
+                         self.x_label)
+        painter.save()
+        painter.translate(line * 0.5, plot.center().y())
+        painter.rotate(-90)
+        painter.drawText(QRectF(-plot.height() / 2, 0, plot.height(), line), Qt.AlignCenter, self.y_label)
+        painter.restore()
+
+        # Siatka i etykiety osi wartości
+        for value in range(0, top_value + 1, step):
+            y = plot.bottom() - plot.height() * value / top_value
+            painter.setPen(QPen(GRID_COLOR))
+            painter.drawLine(QPointF(plot.left(), y), QPointF(plot.right(), y))
+            painter.setPen(Qt.black)
+            painter.drawText(QRectF(0, y - line / 2, left - line * 0.3, line), Qt.AlignRight | Qt.AlignVCenter,
+                             str(value))
+
+        if self.values:
+            slot = plot.width() / len(self.values)
+            # Co która etykieta osi X mieści się bez nachodzenia na sąsiednie
+            label_width = max(metrics.horizontalAdvance(label) for label in self.labels) + line
+            label_every = max(1, math.ceil(label_width / slot))
+            for index, (label, value) in enumerate(zip(self.labels, self.values)):
+                x = plot.left() + slot * index
+                height = plot.height() * value / top_value
+                painter.fillRect(QRectF(x + slot * 0.1, plot.bottom() - height, slot * 0.8, height), BAR_COLOR)
+                if index % label_every == 0:
+                    painter.drawText(QRectF(x + slot / 2 - label_width / 2, plot.bottom() + line * 0.3, label_width, line),
+                                     Qt.AlignCenter, label)
+
+        painter.drawLine(QPointF(plot.left(), plot.bottom()), QPointF(plot.right(), plot.bottom()))
+        painter.drawLine(QPointF(plot.left(), plot.top()), QPointF(plot.left(), plot.bottom()))
+
+
+def export_chart(chart, file_path):
+    """
+    Zapisuje wykres do pliku. Z zainstalowanym matplotlib - przez matplotlib (także PDF/SVG),
+    bez niego - obraz wykresu z ekranu (formaty obsługiwane przez QImage, np. PNG, JPG).
+    """
+    try:
+        from matplotlib.figure import Figure
+    except ImportError:
+        if not chart.grab().save(file_path):
+            raise OSError(f"Nie można zapisać wykresu do {file_path} (zapis PDF/SVG wymaga pakietu matplotlib).")
+        return
+    # Figure bez pyplot - bez globalnego stanu i bez backendu okienkowego
+    figure = Figure(figsize=(8, 4))
+    axes = figure.add_subplot()
+    axes.bar(chart.labels, chart.values)
+    axes.set_xlabel(chart.x_label)
+    axes.set_ylabel(chart.y_label)
+    axes.set_title(chart.title)
+    figure.tight_layout()
+    figure.savefig(file_path)
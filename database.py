@@ -0,0 +1,1368 @@
+# database.py
+
+import logging
+import sqlite3
+from contextlib import contextmanager
+
+from tire_sizes import SIZE_COLUMNS, size_columns
+
+logger = logging.getLogger("TireDepositManager")
+
+
+# Profile silnika SQLite stosowane do każdego połączenia otwieranego przez aplikację.
+# cache_size < 0 oznacza rozmiar w KiB, mmap_size podawany jest w bajtach, busy_timeout w ms.
+CONNECTION_PROFILES = {
+    # Jedno stanowisko przy ladzie: WAL + NORMAL, czytelnicy nie blokują zapisu
+    "desktop": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 128 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # Kilka instancji programu na tym samym komputerze: pełny fsync i dłuższe czekanie na blokadę
+    "shared-workstation": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -8000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+    # Import dużych plików: bez fsync przy commit, duży cache stron
+    "bulk-import": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+
+DEFAULT_PROFILE = "desktop"
+
+
+def apply_profile(conn, profile=DEFAULT_PROFILE):
+    """Ustawia parametry silnika SQLite (PRAGMA) zgodnie z wybranym profilem."""
+    if profile not in CONNECTION_PROFILES:
+        logger.warning(f"Nieznany profil bazy danych '{profile}', używam '{DEFAULT_PROFILE}'.")
+        profile = DEFAULT_PROFILE
+    settings = CONNECTION_PROFILES[profile]
+
+    # busy_timeout jako pierwszy, żeby zmiana trybu dziennika poczekała na inne połączenia
+    conn.execute(f"PRAGMA busy_timeout = {int(settings['busy_timeout'])}")
+    journal_mode = conn.execute(f"PRAGMA journal_mode = {settings['journal_mode']}").fetchone()[0]
+    if journal_mode.upper() != settings["journal_mode"].upper():
+        logger.warning(f"Nie udało się włączyć trybu dziennika {settings['journal_mode']} (aktywny: {journal_mode}).")
+    conn.execute(f"PRAGMA synchronous = {settings['synchronous']}")
+    conn.execute(f"PRAGMA cache_size = {int(settings['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(settings['mmap_size'])}")
+    conn.execute(f"PRAGMA temp_store = {settings['temp_store']}")
+    return profile
+
+
+def open_connection(db_path, profile=DEFAULT_PROFILE, **connect_kwargs):
+    """Otwiera połączenie SQLite i stosuje do niego profil silnika."""
+    conn = sqlite3.connect(db_path, **connect_kwargs)
+    apply_profile(conn, profile)
+    return conn
+
+
+@contextmanager
+def temporary_profile(conn, profile, restore_profile=DEFAULT_PROFILE):
+    """Tymczasowo przełącza połączenie na inny profil (np. 'bulk-import' na czas importu)."""
+    if conn.in_transaction:
+        conn.commit()
+    apply_profile(conn, profile)
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        apply_profile(conn, restore_profile)
+
+
+def backup_database(conn, backup_path):
+    """Tworzy spójną kopię bazy (również z zawartością pliku WAL) przez API backup SQLite."""
+    target = sqlite3.connect(backup_path)
+    try:
+        conn.backup(target)
+    finally:
+        target.close()
+    return backup_path
+
+
+# Czas trwania depozytu liczony przy odczycie (do dnia wydania albo do dziś) - bez okresowego zapisu kolumny
+DEPOSIT_DURATION_SQL = "ROUND(julianday(COALESCE(deposits.issue_date, DATE('now'))) - julianday(deposits.deposit_date))"
+
+# Kolumny zakładki aktywnych depozytów - kolejność jak w ActiveDepositRow i w tabeli
+ACTIVE_DEPOSITS_COLUMNS = (
+    "deposits.id", "clients.name", "clients.phone_number", "clients.email",
+    "deposits.car_model", "deposits.registration_number",
+    "deposits.tire_brand", "deposits.tire_size", "deposits.quantity", "deposits.location",
+    "deposits.washing", "deposits.conservation", "deposits.deposit_date",
+    "deposits.season", "deposits.status", f"{DEPOSIT_DURATION_SQL} AS duration",
+    "deposits.technical_condition", "deposits.storage_date", "deposits.price",
+)
+ACTIVE_DEPOSITS_SELECT = ", ".join(ACTIVE_DEPOSITS_COLUMNS)
+
+
+def project_columns(query, columns, hidden_columns):
+    """
+    Zapytanie pobierające tylko widoczne kolumny: ukryte kolumny listy SELECT (indeksy z hidden_columns)
+    są zastępowane przez NULL, więc kształt wiersza się nie zmienia, a baza ich nie czyta ani nie konwertuje.
+    """
+    if not hidden_columns:
+        return query
+    projected = ", ".join(
+        f"NULL AS c{index}" if index in hidden_columns else column for index, column in enumerate(columns)
+    )
+    return query.replace(", ".join(columns), projected, 1)
+
+
+# Zapytania zakładek depozytów - wspólne dla interfejsu, benchmarku i kontroli planów zapytań
+ACTIVE_DEPOSITS_QUERY = f'''
+    SELECT {ACTIVE_DEPOSITS_SELECT}
+    FROM deposits
+    INNER JOIN clients ON deposits.client_id = clients.id
+    WHERE (clients.name LIKE ? OR deposits.registration_number LIKE ?)
+      AND deposits.status = 'Aktywny'
+    ORDER BY deposits.deposit_date DESC
+'''
+
+ISSUED_DEPOSITS_QUERY = f'''
+    SELECT deposits.id, clients.name, clients.phone_number, clients.email,
+           deposits.car_model, deposits.registration_number,
+           deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
+           deposits.washing, deposits.conservation, deposits.deposit_date,
+           deposits.issue_date, deposits.season, deposits.status, {DEPOSIT_DURATION_SQL} AS duration,
+           deposits.technical_condition, deposits.storage_date, deposits.price
+    FROM deposits
+    INNER JOIN clients ON deposits.client_id = clients.id
+    WHERE (clients.name LIKE ? OR deposits.registration_number LIKE ?)
+      AND deposits.status = 'Wydany'
+    ORDER BY deposits.issue_date DESC
+'''
+
+OVERDUE_DEPOSITS_QUERY = '''
+    SELECT deposits.id, clients.name, clients.phone_number, clients.email,
+           deposits.car_model, deposits.registration_number,
+           deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
+           deposits.deposit_date, deposits.expected_return_date, deposits.season, deposits.status,
+           ROUND(julianday(DATE('now')) - julianday(deposits.expected_return_date)) as overdue_days,
+           clients.phone_number, deposits.price
+    FROM deposits
+    INNER JOIN clients ON deposits.client_id = clients.id
+    WHERE (clients.name LIKE ? OR deposits.registration_number LIKE ?)
+      AND deposits.status = 'Aktywny' AND deposits.expected_return_date < DATE('now')
+    ORDER BY deposits.expected_return_date ASC
+'''
+
+# Wersje zapytań zakładek dla paska wyszukiwania: indeks pełnotekstowy deposits_fts
+# zamiast LIKE '%tekst%', wyniki uporządkowane według trafności (rank)
+ACTIVE_DEPOSITS_SEARCH_QUERY = f'''
+    SELECT {ACTIVE_DEPOSITS_SELECT}
+    FROM deposits_fts
+    INNER JOIN deposits ON deposits.id = deposits_fts.rowid
+    INNER JOIN clients ON deposits.client_id = clients.id
+    WHERE deposits_fts MATCH ?
+      AND deposits.status = 'Aktywny'
+    ORDER BY deposits_fts.rank
+'''
+
+ISSUED_DEPOSITS_SEARCH_QUERY = f'''
+    SELECT deposits.id, clients.name, clients.phone_number, clients.email,
+           deposits.car_model, deposits.registration_number,
+           deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
+           deposits.washing, deposits.conservation, deposits.deposit_date,
+           deposits.issue_date, deposits.season, deposits.status, {DEPOSIT_DURATION_SQL} AS duration,
+           deposits.technical_condition, deposits.storage_date, deposits.price
+    FROM deposits_fts
+    INNER JOIN deposits ON deposits.id = deposits_fts.rowid
+    INNER JOIN clients ON deposits.client_id = clients.id
+    WHERE deposits_fts MATCH ?
+      AND deposits.status = 'Wydany'
+    ORDER BY deposits_fts.rank
+'''
+
+OVERDUE_DEPOSITS_SEARCH_QUERY = '''
+    SELECT deposits.id, clients.name, clients.phone_number, clients.email,
+           deposits.car_model, deposits.registration_number,
+           deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
+           deposits.deposit_date, deposits.expected_return_date, deposits.season, deposits.status,
+           ROUND(julianday(DATE('now')) - julianday(deposits.expected_return_date)) as overdue_days,
+           clients.phone_number, deposits.price
+    FROM deposits_fts
+    INNER JOIN deposits ON deposits.id = deposits_fts.rowid
+    INNER JOIN clients ON deposits.client_id = clients.id
+    WHERE deposits_fts MATCH ?
+      AND deposits.status = 'Aktywny' AND deposits.expected_return_date < DATE('now')
+    ORDER BY deposits_fts.rank
+'''
+
+# Wersje zapytań zakładek dla numeru rejestracyjnego wpisanego w dowolnym formacie
+# ("wa-12345", "WA 12345") - wyszukiwanie po znormalizowanym kluczu plate_key
+ACTIVE_DEPOSITS_PLATE_QUERY = f'''
+    SELECT {ACTIVE_DEPOSITS_SELECT}
+    FROM deposits
+    INNER JOIN clients ON deposits.client_id = clients.id
+    WHERE deposits.plate_key = ?
+      AND deposits.status = 'Aktywny'
+    ORDER BY deposits.deposit_date DESC
+'''
+
+ISSUED_DEPOSITS_PLATE_QUERY = f'''
+    SELECT deposits.id, clients.name, clients.phone_number, clients.email,
+           deposits.car_model, deposits.registration_number,
+           deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
+           deposits.washing, deposits.conservation, deposits.deposit_date,
+           deposits.issue_date, deposits.season, deposits.status, {DEPOSIT_DURATION_SQL} AS duration,
+           deposits.technical_condition, deposits.storage_date, deposits.price
+    FROM deposits
+    INNER JOIN clients ON deposits.client_id = clients.id
+    WHERE deposits.plate_key = ?
+      AND deposits.status = 'Wydany'
+    ORDER BY deposits.issue_date DESC
+'''
+
+OVERDUE_DEPOSITS_PLATE_QUERY = '''
+    SELECT deposits.id, clients.name, clients.phone_number, clients.email,
+           deposits.car_model, deposits.registration_number,
+           deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
+           deposits.deposit_date, deposits.expected_return_date, deposits.season, deposits.status,
+           ROUND(julianday(DATE('now')) - julianday(deposits.expected_return_date)) as overdue_days,
+           clients.phone_number, deposits.price
+    FROM deposits
+    INNER JOIN clients ON deposits.client_id = clients.id
+    WHERE deposits.plate_key = ?
+      AND deposits.status = 'Aktywny' AND deposits.expected_return_date < DATE('now')
+    ORDER BY deposits.expected_return_date ASC
+'''
+
+# Wersje zapytań zakładek dla wybranych depozytów (lista ID jako tablica JSON) - odświeżenie
+# tylko wierszy zmienionych przez ostatnią akcję zamiast przeładowania całej tabeli.
+# CROSS JOIN wymusza wyszukiwanie po kluczu głównym dla każdego ID; kolejność nie ma znaczenia.
+ACTIVE_DEPOSITS_BY_ID_QUERY = f'''
+    SELECT {ACTIVE_DEPOSITS_SELECT}
+    FROM json_each(?) AS changed
+    CROSS JOIN deposits ON deposits.id = changed.value
+    INNER JOIN clients ON deposits.client_id = clients.id
+    WHERE deposits.status = 'Aktywny'
+'''
+
+ISSUED_DEPOSITS_BY_ID_QUERY = f'''
+    SELECT deposits.id, clients.name, clients.phone_number, clients.email,
+           deposits.car_model, deposits.registration_number,
+           deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
+           deposits.washing, deposits.conservation, deposits.deposit_date,
+           deposits.issue_date, deposits.season, deposits.status, {DEPOSIT_DURATION_SQL} AS duration,
+           deposits.technical_condition, deposits.storage_date, deposits.price
+    FROM json_each(?) AS changed
+    CROSS JOIN deposits ON deposits.id = changed.value
+    INNER JOIN clients ON deposits.client_id = clients.id
+    WHERE deposits.status = 'Wydany'
+'''
+
+OVERDUE_DEPOSITS_BY_ID_QUERY = '''
+    SELECT deposits.id, clients.name, clients.phone_number, clients.email,
+           deposits.car_model, deposits.registration_number,
+           deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
+           deposits.deposit_date, deposits.expected_return_date, deposits.season, deposits.status,
+           ROUND(julianday(DATE('now')) - julianday(deposits.expected_return_date)) as overdue_days,
+           clients.phone_number, deposits.price
+    FROM json_each(?) AS changed
+    CROSS JOIN deposits ON deposits.id = changed.value
+    INNER JOIN clients ON deposits.client_id = clients.id
+    WHERE deposits.status = 'Aktywny' AND deposits.expected_return_date < DATE('now')
+'''
+
+# Stronicowanie kluczem (keyset) historii wydanych depozytów i zamówień: kolejna strona zaczyna się
+# za ostatnim wierszem poprzedniej - (data, id) < (?, ?) - zamiast OFFSET, więc koszt strony nie rośnie
+# z historią. Wiersze bez daty (NULL) są na końcu listy i mają własne zapytanie stronicowane po samym id.
+ISSUED_DEPOSITS_PAGE_QUERY = f'''
+    SELECT deposits.id, clients.name, clients.phone_number, clients.email,
+           deposits.car_model, deposits.registration_number,
+           deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
+           deposits.washing, deposits.conservation, deposits.deposit_date,
+           deposits.issue_date, deposits.season, deposits.status, {DEPOSIT_DURATION_SQL} AS duration,
+           deposits.technical_condition, deposits.storage_date, deposits.price
+    FROM deposits
+    INNER JOIN clients ON deposits.client_id = clients.id
+    WHERE deposits.status = 'Wydany' AND (deposits.issue_date, deposits.id) < (?, ?)
+    ORDER BY deposits.issue_date DESC, deposits.id DESC
+    LIMIT ?
+'''
+
+ISSUED_DEPOSITS_UNDATED_PAGE_QUERY = f'''
+    SELECT deposits.id, clients.name, clients.phone_number, clients.email,
+           deposits.car_model, deposits.registration_number,
+           deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
+           deposits.washing, deposits.conservation, deposits.deposit_date,
+           deposits.issue_date, deposits.season, deposits.status, {DEPOSIT_DURATION_SQL} AS duration,
+           deposits.technical_condition, deposits.storage_date, deposits.price
+    FROM deposits
+    INNER JOIN clients ON deposits.client_id = clients.id
+    WHERE deposits.status = 'Wydany' AND deposits.issue_date IS NULL AND deposits.id < ?
+    ORDER BY deposits.id DESC
+    LIMIT ?
+'''
+
+ORDERS_PAGE_QUERY = '''
+    SELECT orders.id, clients.name, orders.order_date, orders.expected_delivery_date, orders.status, orders.notes
+    FROM orders
+    INNER JOIN clients ON orders.client_id = clients.id
+    WHERE (orders.order_date, orders.id) < (?, ?)
+    ORDER BY orders.order_date DESC, orders.id DESC
+    LIMIT ?
+'''
+
+ORDERS_UNDATED_PAGE_QUERY = '''
+    SELECT orders.id, clients.name, orders.order_date, orders.expected_delivery_date, orders.status, orders.notes
+    FROM orders
+    INNER JOIN clients ON orders.client_id = clients.id
+    WHERE orders.order_date IS NULL AND orders.id < ?
+    ORDER BY orders.id DESC
+    LIMIT ?
+'''
+
+# Klucz numeru rejestracyjnego: bez spacji, myślników i kropek, wielkie litery.
+# Wyrażenie SQL (kolumna generowana deposits.plate_key) i normalize_plate() muszą dawać ten sam wynik.
+PLATE_SEPARATORS = (" ", "-", ".")
+PLATE_KEY_SQL = "UPPER(REPLACE(REPLACE(REPLACE(registration_number, ' ', ''), '-', ''), '.', ''))"
+
+# Krótszy tekst z paska wyszukiwania nie jest traktowany jako numer rejestracyjny
+PLATE_MIN_LENGTH = 4
+
+
+def normalize_plate(registration_number):
+    """Klucz numeru rejestracyjnego, np. "wa-123 45" -> "WA12345" (UPPER w SQLite zmienia tylko ASCII)."""
+    key = registration_number or ""
+    for separator in PLATE_SEPARATORS:
+        key = key.replace(separator, "")
+    return "".join(char.upper() if "a" <= char <= "z" else char for char in key)
+
+
+def plate_search_key(search_text):
+    """Klucz do wyszukania po numerze rejestracyjnym albo None, gdy tekst nie wygląda na numer."""
+    key = normalize_plate(search_text.strip())
+    if len(key) < PLATE_MIN_LENGTH or not any(char.isdigit() for char in key) or not key.isalnum():
+        return None
+    return key
+
+
+# Tokenizer trigram indeksuje trójki znaków - krótszy tekst nie może skorzystać z indeksu
+FTS_MIN_LENGTH = 3
+
+
+def fts_phrase(search_text):
+    """
+    Zamienia tekst z paska wyszukiwania na frazę MATCH (dopasowanie podciągu, jak LIKE '%tekst%').
+
+    Zwraca None, gdy tekst jest krótszy niż FTS_MIN_LENGTH - wtedy używamy zapytania z LIKE.
+    """
+    search_text = search_text.strip()
+    if len(search_text) < FTS_MIN_LENGTH:
+        return None
+    return '"' + search_text.replace('"', '""') + '"'
+
+
+# Najstarsze wiadomości kolejki wysyłki (najwyżej ?2), których termin próby już minął
+OUTBOX_DUE_QUERY = '''
+    SELECT id, to_address, subject, body, attempts
+    FROM email_outbox
+    WHERE status = 'Oczekuje' AND next_attempt_at <= ?1
+    ORDER BY next_attempt_at, id
+    LIMIT ?2
+'''
+
+# Aktywne depozyty klientów z adresem e-mail z terminem odbioru w przedziale [?1, ?2), którym
+# przypomnienie ?3 dla bieżącego terminu nie zostało jeszcze wysłane. Przedział po indeksie
+# idx_deposits_active_expected_return, a nie po wszystkich aktywnych depozytach.
+REMINDER_DUE_QUERY = '''
+    SELECT deposits.id, clients.name, clients.email, deposits.expected_return_date
+    FROM deposits
+    INNER JOIN clients ON deposits.client_id = clients.id
+    WHERE deposits.status = 'Aktywny'
+      AND deposits.expected_return_date >= ?1 AND deposits.expected_return_date < ?2
+      AND clients.email != ''
+      AND NOT EXISTS (
+          SELECT 1 FROM deposit_reminders
+          WHERE deposit_reminders.deposit_id = deposits.id AND deposit_reminders.reminder = ?3
+            AND deposit_reminders.expected_return_date = deposits.expected_return_date
+      )
+    ORDER BY deposits.expected_return_date, deposits.id
+'''
+
+# Zapytania, których plan wykonania nie może spaść do pełnego skanowania tabeli
+HOT_QUERIES = {
+    "load_active_deposits": (ACTIVE_DEPOSITS_QUERY, ("%%", "%%")),
+    "load_issued_deposits": (ISSUED_DEPOSITS_QUERY, ("%%", "%%")),
+    "load_overdue_deposits": (OVERDUE_DEPOSITS_QUERY, ("%%", "%%")),
+    "search_active_deposits": (ACTIVE_DEPOSITS_SEARCH_QUERY, ('"abc"',)),
+    "search_issued_deposits": (ISSUED_DEPOSITS_SEARCH_QUERY, ('"abc"',)),
+    "search_overdue_deposits": (OVERDUE_DEPOSITS_SEARCH_QUERY, ('"abc"',)),
+    "plate_active_deposits": (ACTIVE_DEPOSITS_PLATE_QUERY, ("WA12345",)),
+    "plate_issued_deposits": (ISSUED_DEPOSITS_PLATE_QUERY, ("WA12345",)),
+    "plate_overdue_deposits": (OVERDUE_DEPOSITS_PLATE_QUERY, ("WA12345",)),
+    "refresh_active_deposits": (ACTIVE_DEPOSITS_BY_ID_QUERY, ("[1, 2]",)),
+    "refresh_issued_deposits": (ISSUED_DEPOSITS_BY_ID_QUERY, ("[1, 2]",)),
+    "refresh_overdue_deposits": (OVERDUE_DEPOSITS_BY_ID_QUERY, ("[1, 2]",)),
+    "page_issued_deposits": (ISSUED_DEPOSITS_PAGE_QUERY, ("2024-01-01", 100, 200)),
+    "page_issued_deposits_undated": (ISSUED_DEPOSITS_UNDATED_PAGE_QUERY, (100, 200)),
+    "page_orders": (ORDERS_PAGE_QUERY, ("2024-01-01", 100, 200)),
+    "page_orders_undated": (ORDERS_UNDATED_PAGE_QUERY, (100, 200)),
+    "outbox_due": (OUTBOX_DUE_QUERY, ("2024-01-01 12:00:00", 50)),
+    "reminders_due": (REMINDER_DUE_QUERY, ("2024-01-02", "2024-01-08", "days_7")),
+}
+
+# Indeksy zakładek depozytów (migracja 2)
+DEPOSIT_TAB_INDEXES = {
+    "idx_deposits_status_deposit_date":
+        "CREATE INDEX IF NOT EXISTS idx_deposits_status_deposit_date ON deposits (status, deposit_date)",
+    "idx_deposits_status_issue_date":
+        "CREATE INDEX IF NOT EXISTS idx_deposits_status_issue_date ON deposits (status, issue_date)",
+    "idx_deposits_active_expected_return":
+        "CREATE INDEX IF NOT EXISTS idx_deposits_active_expected_return ON deposits (status, expected_return_date) "
+        "WHERE status = 'Aktywny'",
+    "idx_deposits_client_id":
+        "CREATE INDEX IF NOT EXISTS idx_deposits_client_id ON deposits (client_id)",
+    "idx_clients_barcode":
+        "CREATE INDEX IF NOT EXISTS idx_clients_barcode ON clients (barcode)",
+    "idx_history_deposit_id":
+        "CREATE INDEX IF NOT EXISTS idx_history_deposit_id ON history (deposit_id, change_date)",
+    "idx_orders_client_id":
+        "CREATE INDEX IF NOT EXISTS idx_orders_client_id ON orders (client_id)",
+    "idx_order_items_order_id":
+        "CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items (order_id)",
+}
+
+# Indeksy rozmiarów opon (migracja 4): średnica felgi + szerokość dla "R16, 195-215" oraz
+# szerokość + profil dla zapytań bez średnicy
+TIRE_SIZE_INDEXES = {
+    "idx_deposits_tire_rim_width":
+        "CREATE INDEX IF NOT EXISTS idx_deposits_tire_rim_width "
+        "ON deposits (tire_rim_diameter, tire_width, tire_aspect_ratio, tire_construction)",
+    "idx_deposits_tire_width":
+        "CREATE INDEX IF NOT EXISTS idx_deposits_tire_width ON deposits (tire_width, tire_aspect_ratio)",
+    "idx_inventory_tire_rim_width":
+        "CREATE INDEX IF NOT EXISTS idx_inventory_tire_rim_width "
+        "ON inventory (tire_rim_diameter, tire_width, tire_aspect_ratio)",
+    "idx_inventory_tire_width":
+        "CREATE INDEX IF NOT EXISTS idx_inventory_tire_width ON inventory (tire_width, tire_aspect_ratio)",
+    "idx_order_items_tire_rim_width":
+        "CREATE INDEX IF NOT EXISTS idx_order_items_tire_rim_width "
+        "ON order_items (tire_rim_diameter, tire_width, tire_aspect_ratio)",
+}
+
+# Indeksy numeru rejestracyjnego (migracja 5). Indeks unikalny nie pozwala na dwa aktywne depozyty
+# tego samego auta w tym samym sezonie; depozyty bez sezonu (NULL) się nie wykluczają.
+PLATE_UNIQUE_INDEX = "idx_deposits_active_plate_season"
+PLATE_INDEXES = {
+    "idx_deposits_plate_key":
+        "CREATE INDEX IF NOT EXISTS idx_deposits_plate_key ON deposits (plate_key, status)",
+    "idx_deposits_active_plate_season":
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_deposits_active_plate_season ON deposits (plate_key, season) "
+        "WHERE status = 'Aktywny' AND plate_key != ''",
+}
+
+# Indeksy stronicowania historii (migracja 6); wydane depozyty korzystają z idx_deposits_status_issue_date
+# (status, issue_date, rowid)
+PAGINATION_INDEXES = {
+    "idx_orders_order_date":
+        "CREATE INDEX IF NOT EXISTS idx_orders_order_date ON orders (order_date)",
+}
+
+# Indeksy dat przyjęcia i wydania (migracja 11) - zakresy dat analiz bez względu na status depozytu
+ANALYTICS_INDEXES = {
+    "idx_deposits_deposit_date":
+        "CREATE INDEX IF NOT EXISTS idx_deposits_deposit_date ON deposits (deposit_date)",
+    "idx_deposits_issue_date":
+        "CREATE INDEX IF NOT EXISTS idx_deposits_issue_date ON deposits (issue_date)",
+}
+
+# Indeks wiadomości czekających w kolejce wysyłki (migracja 12)
+OUTBOX_INDEXES = {
+    "idx_email_outbox_pending":
+        "CREATE INDEX IF NOT EXISTS idx_email_outbox_pending ON email_outbox (next_attempt_at) "
+        "WHERE status = 'Oczekuje'",
+}
+
+# Zarządzany zestaw indeksów pomocniczych. Indeksy z prefiksem "idx_" spoza tej listy są usuwane.
+INDEXES = {
+    **DEPOSIT_TAB_INDEXES, **TIRE_SIZE_INDEXES, **PLATE_INDEXES, **PAGINATION_INDEXES, **ANALYTICS_INDEXES,
+    **OUTBOX_INDEXES,
+}
+
+
+def ensure_indexes(conn, indexes=None):
+    """
+    Tworzy brakujące indeksy (domyślnie wszystkie z INDEXES) i usuwa przestarzałe
+    indeksy zarządzane przez aplikację.
+
+    Migracje przekazują tylko własne indeksy, bo kolumny dla późniejszych jeszcze nie istnieją.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx\\_%' ESCAPE '\\'")
+    existing = {row[0] for row in cursor.fetchall()}
+    for name in existing - INDEXES.keys():
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+        logger.info(f"Usunięto przestarzały indeks: {name}")
+    for name, sql in (indexes or INDEXES).items():
+        if name not in existing:
+            try:
+                cursor.execute(sql)
+                logger.info(f"Utworzono indeks: {name}")
+            except sqlite3.IntegrityError as e:
+                # Indeks unikalny przy zdublowanych danych - ponawiany przy starcie i konserwacji bazy
+                # (ensure_plate_index)
+                logger.warning(f"Nie utworzono indeksu {name}: {e}")
+
+
+# Aktywne depozyty, przez które nie da się utworzyć PLATE_UNIQUE_INDEX
+ACTIVE_PLATE_DUPLICATES_QUERY = '''
+    SELECT plate_key, season, COUNT(*) FROM deposits
+    WHERE status = 'Aktywny' AND plate_key != '' AND season IS NOT NULL
+    GROUP BY plate_key, season
+    HAVING COUNT(*) > 1
+    ORDER BY plate_key, season
+'''
+
+
+def ensure_plate_index(conn):
+    """
+    Tworzy indeks unikalny aktywnych numerów rejestracyjnych, jeśli go jeszcze nie ma.
+
+    Zwraca listę duplikatów [(plate_key, sezon, liczba depozytów)], przez które indeksu nie da się
+    utworzyć; pusta lista - indeks istnieje.
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (PLATE_UNIQUE_INDEX,)).fetchone():
+        return []
+    try:
+        conn.execute(PLATE_INDEXES[PLATE_UNIQUE_INDEX])
+        conn.commit()
+    except sqlite3.IntegrityError:
+        return conn.execute(ACTIVE_PLATE_DUPLICATES_QUERY).fetchall()
+    logger.info(f"Utworzono indeks: {PLATE_UNIQUE_INDEX}")
+    return []
+
+
+def explain_query_plan(conn, query, parameters=()):
+    """Zwraca listę kroków planu wykonania (kolumna 'detail' z EXPLAIN QUERY PLAN)."""
+    cursor = conn.execute(f"EXPLAIN QUERY PLAN {query}", parameters)
+    return [row[3] for row in cursor.fetchall()]
+
+
+def check_query_plans(conn, queries=None):
+    """
+    Sprawdza plany wykonania gorących zapytań.
+
+    Zwraca słownik {nazwa zapytania: [kroki planu]} tylko dla zapytań, które
+    pełnym skanem (SCAN) czytają tabelę lub sortują wynik w tymczasowym B-drzewie.
+    Odczyt indeksu FTS5 ("SCAN ... VIRTUAL TABLE INDEX") nie jest pełnym skanem.
+    """
+    regressions = {}
+    for name, (query, parameters) in (queries or HOT_QUERIES).items():
+        plan = explain_query_plan(conn, query, parameters)
+        bad_steps = [
+            step for step in plan
+            if (step.startswith("SCAN") and "VIRTUAL TABLE" not in step) or "TEMP B-TREE" in step
+        ]
+        if bad_steps:
+            regressions[name] = plan
+    return regressions
+
+
+# Migracje schematu
+
+def _add_missing_columns(cursor, table, columns):
+    """Dodaje do tabeli kolumny, których brakuje w starszych wersjach bazy."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing_columns = [column[1] for column in cursor.fetchall()]
+    for column_name, column_def in columns.items():
+        if column_name not in existing_columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column_name} {column_def}")
+
+
+def _migration_1_base_schema(cursor):
+    """Schemat bazowy oraz uzupełnienie kolumn w bazach sprzed wersjonowania."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS clients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone_number TEXT,
+            email TEXT,
+            additional_info TEXT,
+            discount REAL DEFAULT 0,
+            barcode TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS deposits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER,
+            car_model TEXT,
+            registration_number TEXT,
+            tire_brand TEXT,
+            tire_size TEXT,
+            quantity INTEGER,
+            location TEXT,
+            washing BOOLEAN,
+            conservation BOOLEAN,
+            deposit_date TEXT,
+            issue_date TEXT,
+            status TEXT,
+            duration INTEGER,
+            season TEXT,
+            expected_return_date TEXT,
+            technical_condition TEXT,
+            storage_date TEXT,
+            price REAL,
+            FOREIGN KEY(client_id) REFERENCES clients(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            deposit_id INTEGER,
+            change_date TEXT,
+            user TEXT,
+            description TEXT,
+            FOREIGN KEY(deposit_id) REFERENCES deposits(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS client_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER,
+            interaction_date TEXT,
+            notes TEXT,
+            FOREIGN KEY(client_id) REFERENCES clients(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            to_address TEXT,
+            subject TEXT,
+            body TEXT,
+            sent_date TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS locations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            is_default BOOLEAN DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            subject TEXT,
+            body TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER,
+            order_date TEXT,
+            expected_delivery_date TEXT,
+            status TEXT,
+            notes TEXT,
+            FOREIGN KEY(client_id) REFERENCES clients(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            brand_model TEXT,
+            size TEXT,
+            quantity INTEGER,
+            price REAL,
+            FOREIGN KEY(order_id) REFERENCES orders(id)
+        )
+    ''')
+    # Tabela 'inventory' (Opony na stanie)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS inventory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            brand_model TEXT NOT NULL,
+            size TEXT NOT NULL,
+            quantity INTEGER DEFAULT 0,
+            price REAL DEFAULT 0.0,
+            dot TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS column_settings (
+            id INTEGER PRIMARY KEY,
+            tab_name TEXT NOT NULL,
+            column_index INTEGER NOT NULL,
+            visible BOOLEAN NOT NULL
+        )
+    ''')
+
+    # Kolumny dodane w kolejnych wersjach programu
+    _add_missing_columns(cursor, "clients", {
+        "email": "TEXT",
+        "discount": "REAL DEFAULT 0",
+        "barcode": "TEXT"
+    })
+    _add_missing_columns(cursor, "deposits", {
+        "technical_condition": "TEXT",
+        "storage_date": "TEXT",
+        "price": "REAL",
+        "season": "TEXT",
+        "expected_return_date": "TEXT"
+    })
+    _add_missing_columns(cursor, "inventory", {
+        "brand_model": "TEXT NOT NULL DEFAULT ''",
+        "size": "TEXT NOT NULL DEFAULT ''",
+        "quantity": "INTEGER DEFAULT 0",
+        "price": "REAL DEFAULT 0.0",
+        "dot": "TEXT",
+        "notes": "TEXT DEFAULT ''",
+        "season_type": "TEXT DEFAULT 'Letnia'"
+    })
+    _add_missing_columns(cursor, "order_items", {
+        "tire_brand": "TEXT",
+        "tire_size": "TEXT",
+        "quantity": "INTEGER DEFAULT 0",
+        "price": "REAL DEFAULT 0.0",
+        "notes": "TEXT DEFAULT ''",
+    })
+    _add_missing_columns(cursor, "column_settings", {
+        "visible": "BOOLEAN NOT NULL DEFAULT 1"
+    })
+
+    # Domyślny szablon e-mail
+    cursor.execute("SELECT COUNT(*) FROM email_templates")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute('''
+            INSERT INTO email_templates (name, subject, body)
+            VALUES (?, ?, ?)
+        ''', (
+            "Przypomnienie o zwrocie",
+            "Przypomnienie o zwrocie opon",
+            "Szanowny/a {client_name},\n\nPrzypominamy o oczekiwanym zwrocie opon do dnia {expected_return_date}.\n\nPozdrawiamy,\n{company_name}"
+        ))
+
+
+def _migration_2_indexes(cursor):
+    """Indeksy pomocnicze dla zakładek depozytów."""
+    ensure_indexes(cursor.connection, DEPOSIT_TAB_INDEXES)
+
+
+# Indeks pełnotekstowy pasków wyszukiwania: {tabela FTS5: (CREATE, wypełnienie z tabel źródłowych)}.
+# Tabele przechowują kopię przeszukiwanych kolumn (deposits_fts i orders_fts także nazwę klienta).
+SEARCH_INDEX_TABLES = {
+    "deposits_fts": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS deposits_fts USING fts5("
+        "registration_number, client_name, car_model, tire_brand, tire_size, tokenize = 'trigram')",
+        '''
+        INSERT INTO deposits_fts (rowid, registration_number, client_name, car_model, tire_brand, tire_size)
+        SELECT deposits.id, deposits.registration_number, clients.name,
+               deposits.car_model, deposits.tire_brand, deposits.tire_size
+        FROM deposits
+        LEFT JOIN clients ON deposits.client_id = clients.id
+        ''',
+    ),
+    "clients_fts": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS clients_fts USING fts5("
+        "name, phone_number, email, barcode, tokenize = 'trigram')",
+        '''
+        INSERT INTO clients_fts (rowid, name, phone_number, email, barcode)
+        SELECT id, name, phone_number, email, barcode FROM clients
+        ''',
+    ),
+    "orders_fts": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS orders_fts USING fts5("
+        "client_name, status, notes, tokenize = 'trigram')",
+        '''
+        INSERT INTO orders_fts (rowid, client_name, status, notes)
+        SELECT orders.id, clients.name, orders.status, orders.notes
+        FROM orders
+        LEFT JOIN clients ON orders.client_id = clients.id
+        ''',
+    ),
+    "inventory_fts": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS inventory_fts USING fts5("
+        "brand_model, size, dot, tokenize = 'trigram')",
+        '''
+        INSERT INTO inventory_fts (rowid, brand_model, size, dot)
+        SELECT id, brand_model, size, dot FROM inventory
+        ''',
+    ),
+}
+
+# Wyzwalacze synchronizujące tabele FTS. Reagują tylko na zmiany przeszukiwanych kolumn,
+# więc np. wydanie depozytu (zmiana statusu) nie dotyka indeksu.
+SEARCH_INDEX_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS deposits_fts_insert AFTER INSERT ON deposits BEGIN
+        INSERT INTO deposits_fts (rowid, registration_number, client_name, car_model, tire_brand, tire_size)
+        VALUES (new.id, new.registration_number, (SELECT name FROM clients WHERE id = new.client_id),
+                new.car_model, new.tire_brand, new.tire_size);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS deposits_fts_update
+    AFTER UPDATE OF id, client_id, registration_number, car_model, tire_brand, tire_size ON deposits BEGIN
+        DELETE FROM deposits_fts WHERE rowid = old.id;
+        INSERT INTO deposits_fts (rowid, registration_number, client_name, car_model, tire_brand, tire_size)
+        VALUES (new.id, new.registration_number, (SELECT name FROM clients WHERE id = new.client_id),
+                new.car_model, new.tire_brand, new.tire_size);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS deposits_fts_delete AFTER DELETE ON deposits BEGIN
+        DELETE FROM deposits_fts WHERE rowid = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS clients_fts_insert AFTER INSERT ON clients BEGIN
+        INSERT INTO clients_fts (rowid, name, phone_number, email, barcode)
+        VALUES (new.id, new.name, new.phone_number, new.email, new.barcode);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS clients_fts_update
+    AFTER UPDATE OF id, name, phone_number, email, barcode ON clients BEGIN
+        DELETE FROM clients_fts WHERE rowid = old.id;
+        INSERT INTO clients_fts (rowid, name, phone_number, email, barcode)
+        VALUES (new.id, new.name, new.phone_number, new.email, new.barcode);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS clients_fts_rename
+    AFTER UPDATE OF name ON clients WHEN new.name IS NOT old.name BEGIN
+        UPDATE deposits_fts SET client_name = new.name
+        WHERE rowid IN (SELECT id FROM deposits WHERE client_id = new.id);
+        UPDATE orders_fts SET client_name = new.name
+        WHERE rowid IN (SELECT id FROM orders WHERE client_id = new.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS clients_fts_delete AFTER DELETE ON clients BEGIN
+        DELETE FROM clients_fts WHERE rowid = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS orders_fts_insert AFTER INSERT ON orders BEGIN
+        INSERT INTO orders_fts (rowid, client_name, status, notes)
+        VALUES (new.id, (SELECT name FROM clients WHERE id = new.client_id), new.status, new.notes);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS orders_fts_update AFTER UPDATE OF id, client_id, status, notes ON orders BEGIN
+        DELETE FROM orders_fts WHERE rowid = old.id;
+        INSERT INTO orders_fts (rowid, client_name, status, notes)
+        VALUES (new.id, (SELECT name FROM clients WHERE id = new.client_id), new.status, new.notes);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS orders_fts_delete AFTER DELETE ON orders BEGIN
+        DELETE FROM orders_fts WHERE rowid = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS inventory_fts_insert AFTER INSERT ON inventory BEGIN
+        INSERT INTO inventory_fts (rowid, brand_model, size, dot)
+        VALUES (new.id, new.brand_model, new.size, new.dot);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS inventory_fts_update AFTER UPDATE OF id, brand_model, size, dot ON inventory BEGIN
+        DELETE FROM inventory_fts WHERE rowid = old.id;
+        INSERT INTO inventory_fts (rowid, brand_model, size, dot)
+        VALUES (new.id, new.brand_model, new.size, new.dot);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS inventory_fts_delete AFTER DELETE ON inventory BEGIN
+        DELETE FROM inventory_fts WHERE rowid = old.id;
+    END
+    ''',
+]
+
+
+def rebuild_search_index(conn):
+    """Odbudowuje od zera zawartość tabel FTS, np. gdy indeks rozjechał się z danymi."""
+    cursor = conn.cursor()
+    for table, (_, populate_sql) in SEARCH_INDEX_TABLES.items():
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(populate_sql)
+        cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+    conn.commit()
+
+
+def optimize_database(conn):
+    """Okresowa konserwacja: statystyki planisty, scalenie segmentów FTS i przycięcie pliku WAL."""
+    conn.execute("PRAGMA optimize")
+    for table in SEARCH_INDEX_TABLES:
+        conn.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def _migration_3_search_index(cursor):
+    """Indeks pełnotekstowy FTS5 (trigram) dla pasków wyszukiwania."""
+    for create_sql, populate_sql in SEARCH_INDEX_TABLES.values():
+        cursor.execute(create_sql)
+        cursor.execute(populate_sql)
+    for trigger_sql in SEARCH_INDEX_TRIGGERS:
+        cursor.execute(trigger_sql)
+
+
+def _migration_4_tire_sizes(cursor):
+    """Rozbity rozmiar opony (szerokość, profil, konstrukcja, felga) w depozytach, magazynie i zamówieniach."""
+    size_column_types = dict(zip(SIZE_COLUMNS, ("INTEGER", "INTEGER", "TEXT", "INTEGER")))
+    for table, text_column in (("deposits", "tire_size"), ("inventory", "size"), ("order_items", "tire_size")):
+        _add_missing_columns(cursor, table, size_column_types)
+        # Uzupełnienie po jednym UPDATE na każdy różny zapis rozmiaru, a nie na każdy wiersz
+        cursor.execute(f"SELECT DISTINCT {text_column} FROM {table} WHERE {text_column} IS NOT NULL")
+        for (size_text,) in cursor.fetchall():
+            parts = size_columns(size_text)
+            if parts[0] is None:
+                continue
+            cursor.execute(f'''
+                UPDATE {table}
+                SET tire_width = ?, tire_aspect_ratio = ?, tire_construction = ?, tire_rim_diameter = ?
+                WHERE {text_column} = ?
+            ''', parts + (size_text,))
+    ensure_indexes(cursor.connection, TIRE_SIZE_INDEXES)
+
+
+def _migration_5_plate_key(cursor):
+    """Znormalizowany numer rejestracyjny (kolumna generowana plate_key) z indeksami."""
+    cursor.execute("PRAGMA table_xinfo(deposits)")
+    if "plate_key" not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute(f"ALTER TABLE deposits ADD COLUMN plate_key TEXT GENERATED ALWAYS AS ({PLATE_KEY_SQL}) VIRTUAL")
+    cursor.execute(ACTIVE_PLATE_DUPLICATES_QUERY)
+    for plate_key, season, count in cursor.fetchall():
+        logger.warning(f"Zdublowany aktywny depozyt: {plate_key} ({season}) - {count} wpisy.")
+    ensure_indexes(cursor.connection, PLATE_INDEXES)
+
+
+def _migration_6_pagination_indexes(cursor):
+    """Indeks daty zamówienia dla stronicowania listy zamówień."""
+    ensure_indexes(cursor.connection, PAGINATION_INDEXES)
+
+
+# Liczniki zapisów tabel (table_versions) podbijane wyzwalaczami przy każdej zmianie wiersza.
+# Razem z PRAGMA data_version pozwalają stwierdzić bez czytania danych, czy tabela się zmieniła.
+CHANGE_TRACKED_TABLES = ("deposits", "clients", "orders", "inventory")
+
+CHANGE_COUNTER_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {table}_version_{operation.lower()} AFTER {operation} ON {table} BEGIN
+        UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';
+    END
+    '''
+    for table in CHANGE_TRACKED_TABLES
+    for operation in ("INSERT", "UPDATE", "DELETE")
+]
+
+
+def _migration_7_change_counters(cursor):
+    """Liczniki zapisów tabel dla wykrywania zmian bez przeładowywania danych."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.executemany("INSERT OR IGNORE INTO table_versions (table_name) VALUES (?)",
+                       [(table,) for table in CHANGE_TRACKED_TABLES])
+    for trigger_sql in CHANGE_COUNTER_TRIGGERS:
+        cursor.execute(trigger_sql)
+
+
+def _migration_8_computed_duration(cursor):
+    """Czas trwania liczony przy odczycie (DEPOSIT_DURATION_SQL) - usunięcie zapisywanej kolumny duration."""
+    cursor.execute("PRAGMA table_info(deposits)")
+    if "duration" not in [column[1] for column in cursor.fetchall()]:
+        return
+    if sqlite3.sqlite_version_info < (3, 35, 0):
+        # Starszy SQLite nie ma DROP COLUMN - kolumna zostaje, ale nic jej już nie czyta ani nie zapisuje
+        logger.warning(f"SQLite {sqlite3.sqlite_version} nie usuwa kolumn - deposits.duration pozostaje nieużywana.")
+        return
+    cursor.execute("ALTER TABLE deposits DROP COLUMN duration")
+
+
+def _migration_9_scheduled_jobs(cursor):
+    """Trwały harmonogram zadań okresowych (ostatnie i następne wykonanie, blokada trwającego wykonania)."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scheduled_jobs (
+            name TEXT PRIMARY KEY,
+            last_run TEXT,
+            next_run TEXT NOT NULL,
+            running_since TEXT,
+            last_error TEXT
+        )
+    ''')
+
+
+# Zestawienia depozytów (deposit_rollups) dla zakładki statystyk: sumy w podziale na wymiar
+# (miesiąc przyjęcia, sezon, lokalizacja) i status, aktualizowane wyzwalaczami przy każdej zmianie
+# depozytu. Statystyki czytają kilkadziesiąt wierszy zestawień zamiast całej tabeli deposits.
+ROLLUP_DIMENSIONS = {
+    "month": "strftime('%Y-%m', {row}.deposit_date)",
+    "season": "{row}.season",
+    "location": "{row}.location",
+}
+
+# Północ późniejsza niż każda data depozytu. Czas trwania aktywnego depozytu to (dziś - dzień odniesienia)
+# + ROUND(dzień odniesienia - data depozytu), więc drugi składnik można sumować bez zależności od daty.
+# (Wynik różni się od liczonego wprost tylko dla depozytu z datą od dziś wzwyż i godziną dokładnie 12:00,
+# bo ROUND zaokrągla połówki od zera.)
+ROLLUP_REFERENCE_DAY = "julianday('9999-12-31')"
+
+
+def _rollup_measures(row):
+    """Wkład jednego wiersza depozytu ({row}: new, old albo deposits) w sumy zestawienia."""
+    issued_days = f"ROUND(julianday({row}.issue_date) - julianday({row}.deposit_date))"
+    open_days = f"ROUND({ROLLUP_REFERENCE_DAY} - julianday({row}.deposit_date))"
+    return {
+        "deposit_count": "1",
+        "price_sum": f"COALESCE({row}.price, 0)",
+        "issued_days_count": f"{row}.issue_date IS NOT NULL AND {issued_days} IS NOT NULL",
+        "issued_days_sum": f"CASE WHEN {row}.issue_date IS NOT NULL THEN COALESCE({issued_days}, 0) ELSE 0 END",
+        "open_count": f"{row}.issue_date IS NULL AND {open_days} IS NOT NULL",
+        "open_days_sum": f"CASE WHEN {row}.issue_date IS NULL THEN COALESCE({open_days}, 0) ELSE 0 END",
+    }
+
+
+ROLLUP_MEASURES = tuple(_rollup_measures("deposits"))
+
+# Średni czas trwania z sum zestawienia - to samo co AVG(DEPOSIT_DURATION_SQL) po całej tabeli
+ROLLUP_AVERAGE_DURATION_SQL = (
+    "(SUM(issued_days_sum) + SUM(open_days_sum) + SUM(open_count) * (julianday(DATE('now')) - "
+    f"{ROLLUP_REFERENCE_DAY})) / NULLIF(SUM(issued_days_count) + SUM(open_count), 0)"
+)
+
+
+def _rollup_upserts(row, sign):
+    measures = _rollup_measures(row)
+    columns = ", ".join(measures)
+    values = ", ".join(f"{sign} * ({expression})" for expression in measures.values())
+    updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in measures)
+    return "".join(f'''
+        INSERT INTO deposit_rollups (dimension, bucket, status, {columns})
+        VALUES ('{dimension}', COALESCE({bucket.format(row=row)}, ''), COALESCE({row}.status, ''), {values})
+        ON CONFLICT (dimension, bucket, status) DO UPDATE SET {updates};'''
+        for dimension, bucket in ROLLUP_DIMENSIONS.items())
+
+
+ROLLUP_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS deposits_rollup_insert AFTER INSERT ON deposits BEGIN{_rollup_upserts('new', 1)}\nEND",
+    f"CREATE TRIGGER IF NOT EXISTS deposits_rollup_delete AFTER DELETE ON deposits BEGIN{_rollup_upserts('old', -1)}\nEND",
+    "CREATE TRIGGER IF NOT EXISTS deposits_rollup_update "
+    "AFTER UPDATE OF deposit_date, issue_date, status, season, location, price ON deposits BEGIN"
+    f"{_rollup_upserts('old', -1)}{_rollup_upserts('new', 1)}\nEND",
+]
+
+
+def _rollup_select():
+    """Zestawienia policzone od zera z tabeli deposits: (wymiar, kubełek, status, sumy...)."""
+    measures = _rollup_measures("deposits")
+    sums = ", ".join(f"SUM({expression})" for expression in measures.values())
+    return " UNION ALL ".join(
+        f"SELECT '{dimension}', COALESCE({bucket.format(row='deposits')}, ''), COALESCE(deposits.status, ''), {sums} "
+        f"FROM deposits GROUP BY 2, 3"
+        for dimension, bucket in ROLLUP_DIMENSIONS.items())
+
+
+def _fill_rollups(cursor):
+    cursor.execute("DELETE FROM deposit_rollups")
+    cursor.execute(f"INSERT INTO deposit_rollups (dimension, bucket, status, {', '.join(ROLLUP_MEASURES)}) "
+                   f"{_rollup_select()}")
+
+
+def rebuild_rollups(conn):
+    """Liczy zestawienia od nowa z tabeli deposits (np. gdy check_rollups wykrył rozbieżność)."""
+    _fill_rollups(conn)
+    # Wyniki statystyk zapamiętane według wersji tabeli deposits muszą zostać policzone ponownie
+    conn.execute("UPDATE table_versions SET version = version + 1 WHERE table_name = 'deposits'")
+    conn.commit()
+
+
+def check_rollups(conn):
+    """Porównuje zestawienia z sumami policzonymi z tabeli deposits; zwraca listę rozbieżności (pusta - zgodne)."""
+    expected = {row[:3]: row[3:] for row in conn.execute(_rollup_select())}
+    stored = {
+        row[:3]: row[3:] for row in conn.execute(
+            f"SELECT dimension, bucket, status, {', '.join(ROLLUP_MEASURES)} FROM deposit_rollups WHERE deposit_count != 0")
+    }
+    problems = []
+    for key in sorted(expected.keys() | stored.keys()):
+        expected_values = expected.get(key, (0,) * len(ROLLUP_MEASURES))
+        stored_values = stored.get(key, (0,) * len(ROLLUP_MEASURES))
+        # Sumy cen są zmiennoprzecinkowe - dopuszczalna różnica zaokrągleń
+        if any(abs(a - b) > 0.005 for a, b in zip(expected_values, stored_values)):
+            problems.append(f"{'/'.join(key)}: zestawienie {stored_values}, tabela deposits {expected_values}")
+    return problems
+
+
+def _migration_10_rollups(cursor):
+    """Zestawienia depozytów dla statystyk, utrzymywane wyzwalaczami."""
+    measure_columns = ", ".join(f"{column} {'REAL' if column == 'price_sum' else 'INTEGER'} NOT NULL DEFAULT 0"
+                                for column in ROLLUP_MEASURES)
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS deposit_rollups (
+            dimension TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            status TEXT NOT NULL,
+            {measure_columns},
+            PRIMARY KEY (dimension, bucket, status)
+        ) WITHOUT ROWID
+    ''')
+    for trigger_sql in ROLLUP_TRIGGERS:
+        cursor.execute(trigger_sql)
+    _fill_rollups(cursor)
+
+
+# Zapytania zakładki analiz. Zakresy dat czytają indeksy ANALYTICS_INDEXES, a przebiegi w czasie
+# (stan magazynu, średnia krocząca, narastająco od początku roku) liczą funkcje okna na kilkudziesięciu
+# zagregowanych wierszach zamiast osobnych zapytań dla każdego dnia lub miesiąca.
+
+# Stan magazynu na koniec każdego miesiąca w lokalizacjach. Parametr: początek okresu jako modyfikator
+# daty (np. '-11 months'). Punktem wyjścia jest dzisiejszy stan z zestawień (open_count), od którego
+# odejmujemy ruch (przyjęcia - wydania) z miesięcy późniejszych niż dany.
+OCCUPANCY_QUERY = '''
+    WITH RECURSIVE bounds(start) AS (
+        SELECT DATE('now', 'start of month', ?)
+    ),
+    months(month) AS (
+        SELECT strftime('%Y-%m', start) FROM bounds
+        UNION ALL
+        SELECT strftime('%Y-%m', month || '-01', '+1 month') FROM months WHERE month < strftime('%Y-%m', 'now')
+    ),
+    stored(location, deposits) AS (
+        SELECT bucket, SUM(open_count) FROM deposit_rollups
+        WHERE dimension = 'location'
+        GROUP BY bucket
+        HAVING SUM(deposit_count) != 0
+    ),
+    movements(location, month, net) AS (
+        SELECT COALESCE(location, ''), strftime('%Y-%m', deposit_date), 1 FROM deposits
+        WHERE deposit_date >= (SELECT start FROM bounds)
+        UNION ALL
+        SELECT COALESCE(location, ''), strftime('%Y-%m', issue_date), -1 FROM deposits
+        WHERE issue_date >= (SELECT start FROM bounds) AND deposit_date IS NOT NULL
+    ),
+    monthly(location, month, net) AS (
+        SELECT location, month, SUM(net) FROM movements GROUP BY location, month
+    )
+    SELECT NULLIF(stored.location, ''), months.month,
+           stored.deposits - COALESCE(SUM(COALESCE(monthly.net, 0)) OVER (
+               PARTITION BY stored.location ORDER BY months.month DESC
+               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), 0)
+    FROM stored
+    CROSS JOIN months
+    LEFT JOIN monthly ON monthly.location = stored.location AND monthly.month = months.month
+    ORDER BY stored.location, months.month
+'''
+
+# Przyjęcia i wydania w kolejnych dniach okresu [początek, koniec) ze średnią kroczącą z 7 dni.
+# Dni bez ruchu pochodzą z kalendarza, więc okno zawsze obejmuje 7 dni kalendarzowych.
+THROUGHPUT_QUERY = '''
+    WITH RECURSIVE calendar(day) AS (
+        SELECT DATE(?1)
+        UNION ALL
+        SELECT DATE(day, '+1 day') FROM calendar WHERE day < DATE(?2, '-1 day')
+    ),
+    check_ins(day, count) AS (
+        SELECT DATE(deposit_date), COUNT(*) FROM deposits
+        WHERE deposit_date >= ?1 AND deposit_date < ?2
+        GROUP BY 1
+    ),
+    check_outs(day, count) AS (
+        SELECT DATE(issue_date), COUNT(*) FROM deposits
+        WHERE issue_date >= ?1 AND issue_date < ?2
+        GROUP BY 1
+    )
+    SELECT calendar.day, COALESCE(check_ins.count, 0), COALESCE(check_outs.count, 0),
+           ROUND(AVG(COALESCE(check_ins.count, 0) + COALESCE(check_outs.count, 0)) OVER (
+               ORDER BY calendar.day ROWS BETWEEN 6 PRECEDING AND CURRENT ROW), 1)
+    FROM calendar
+    LEFT JOIN check_ins ON check_ins.day = calendar.day
+    LEFT JOIN check_outs ON check_outs.day = calendar.day
+    ORDER BY calendar.day
+'''
+
+# Czas przechowania wydanych depozytów w sezonach: liczba, średnia, mediana i maksimum [dni].
+# Parametr: początek okresu (data wydania) jako modyfikator daty, np. '-2 years'.
+DWELL_QUERY = '''
+    WITH dwell(season, days) AS (
+        SELECT COALESCE(season, ''), julianday(issue_date) - julianday(deposit_date) FROM deposits
+        WHERE issue_date >= DATE('now', ?) AND julianday(issue_date) - julianday(deposit_date) IS NOT NULL
+    ),
+    ranked(season, days, position, total) AS (
+        SELECT season, days,
+               ROW_NUMBER() OVER (PARTITION BY season ORDER BY days),
+               COUNT(*) OVER (PARTITION BY season)
+        FROM dwell
+    )
+    SELECT NULLIF(season, ''), total, ROUND(AVG(days), 1),
+           ROUND(AVG(CASE WHEN position IN ((total + 1) / 2, (total + 2) / 2) THEN days END), 1),
+           ROUND(MAX(days))
+    FROM ranked
+    GROUP BY season
+    ORDER BY season
+'''
+
+# Przychód z przyjętych depozytów w miesiącach (z zestawień), ze zmianą względem poprzedniego
+# miesiąca i sumą od początku roku. Parametr: początek okresu, np. '-11 months'.
+REVENUE_QUERY = '''
+    WITH monthly(month, deposits, revenue) AS (
+        SELECT bucket, SUM(deposit_count), ROUND(SUM(price_sum), 2) FROM deposit_rollups
+        WHERE dimension = 'month' AND bucket >= strftime('%Y-%m', 'now', 'start of month', ?)
+        GROUP BY bucket
+        HAVING SUM(deposit_count) != 0
+    )
+    SELECT month, deposits, revenue,
+           ROUND(revenue - LAG(revenue) OVER (ORDER BY month), 2),
+           ROUND(SUM(revenue) OVER (PARTITION BY substr(month, 1, 4) ORDER BY month), 2)
+    FROM monthly
+    ORDER BY month
+'''
+
+# Zapytania analiz nie mogą czytać całej tabeli deposits - zakresy dat muszą iść przez indeksy.
+# (Sortowanie w tymczasowym B-drzewie jest tu dopuszczalne: dotyczy zagregowanych wierszy funkcji okna.)
+ANALYTICS_QUERIES = {
+    "analytics_occupancy": (OCCUPANCY_QUERY, ("-11 months",)),
+    "analytics_throughput": (THROUGHPUT_QUERY, ("2024-10-01", "2024-12-16")),
+    "analytics_dwell": (DWELL_QUERY, ("-2 years",)),
+    "analytics_revenue": (REVENUE_QUERY, ("-11 months",)),
+}
+
+
+def check_analytics_plans(conn):
+    """Zwraca {nazwa: [kroki planu]} dla zapytań analiz, które pełnym skanem czytają tabelę depozytów."""
+    regressions = {}
+    for name, (query, parameters) in ANALYTICS_QUERIES.items():
+        plan = explain_query_plan(conn, query, parameters)
+        if any(step.startswith("SCAN deposits") for step in plan):
+            regressions[name] = plan
+    return regressions
+
+
+def _migration_11_analytics_indexes(cursor):
+    """Indeksy dat przyjęcia i wydania dla zapytań analiz."""
+    ensure_indexes(cursor.connection, ANALYTICS_INDEXES)
+
+
+def _migration_12_email_outbox(cursor):
+    """Kolejka wychodzących e-maili wysyłana w tle z ponawianiem."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            to_address TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Oczekuje',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            sent_at TEXT,
+            last_error TEXT
+        )
+    ''')
+    ensure_indexes(cursor.connection, OUTBOX_INDEXES)
+
+
+def _migration_13_deposit_reminders(cursor):
+    """Wysłane przypomnienia o odbiorze - każde raz na depozyt i termin odbioru."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS deposit_reminders (
+            deposit_id INTEGER NOT NULL,
+            reminder TEXT NOT NULL,
+            expected_return_date TEXT NOT NULL,
+            queued_at TEXT NOT NULL,
+            outbox_id INTEGER,
+            PRIMARY KEY (deposit_id, reminder, expected_return_date)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS deposits_reminders_delete AFTER DELETE ON deposits BEGIN
+            DELETE FROM deposit_reminders WHERE deposit_id = old.id;
+        END
+    ''')
+    # Dotychczasowe przypomnienie wychodziło dokładnie 7 dni przed terminem - depozyty z terminem
+    # za 2-6 dni już je dostały, nie wysyłamy go drugi raz (nazwa jak w reminders.REMINDERS)
+    cursor.execute('''
+        INSERT OR IGNORE INTO deposit_reminders (deposit_id, reminder, expected_return_date, queued_at)
+        SELECT deposits.id, 'days_7', deposits.expected_return_date, DATETIME('now', 'localtime')
+        FROM deposits
+        INNER JOIN clients ON deposits.client_id = clients.id
+        WHERE deposits.status = 'Aktywny' AND clients.email != ''
+          AND deposits.expected_return_date >= DATE('now', 'localtime', '+2 days')
+          AND deposits.expected_return_date < DATE('now', 'localtime', '+7 days')
+    ''')
+
+
+# Numerowane migracje: (wersja, opis, funkcja). Nowe migracje dopisujemy wyłącznie na końcu listy.
+MIGRATIONS = [
+    (1, "Schemat bazowy", _migration_1_base_schema),
+    (2, "Indeksy zakładek depozytów", _migration_2_indexes),
+    (3, "Indeks pełnotekstowy wyszukiwania", _migration_3_search_index),
+    (4, "Rozbity rozmiar opony", _migration_4_tire_sizes),
+    (5, "Znormalizowany numer rejestracyjny", _migration_5_plate_key),
+    (6, "Indeksy stronicowania historii", _migration_6_pagination_indexes),
+    (7, "Liczniki zapisów tabel", _migration_7_change_counters),
+    (8, "Wyliczany czas trwania depozytu", _migration_8_computed_duration),
+    (9, "Harmonogram zadań", _migration_9_scheduled_jobs),
+    (10, "Zestawienia statystyk depozytów", _migration_10_rollups),
+    (11, "Indeksy analiz", _migration_11_analytics_indexes),
+    (12, "Kolejka wysyłki e-maili", _migration_12_email_outbox),
+    (13, "Wysłane przypomnienia o odbiorze", _migration_13_deposit_reminders),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """Zwraca wersję schematu zapisaną w PRAGMA user_version."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Stosuje brakujące migracje w jednej transakcji.
+
+    Na aktualnej bazie kosztuje jedno odczytanie PRAGMA user_version.
+    Zwraca listę numerów zastosowanych migracji.
+    """
+    current_version = get_schema_version(conn)
+    if current_version >= SCHEMA_VERSION:
+        if current_version > SCHEMA_VERSION:
+            logger.warning(f"Baza danych ma nowszy schemat ({current_version}) niż obsługiwany ({SCHEMA_VERSION}).")
+        return []
+
+    pending = [migration for migration in MIGRATIONS if migration[0] > current_version]
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cursor = conn.cursor()
+        for version, description, apply_migration in pending:
+            apply_migration(cursor)
+            logger.info(f"Zastosowano migrację {version}: {description}")
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return [migration[0] for migration in pending]
@@ -0,0 +1,232 @@
+# db_worker.py
+#
+# Zapytania poza wątkiem interfejsu: QThread z własnym połączeniem SQLite (WAL - odczyty
+# nie blokują zapisów z okna). Wyniki wracają do GUI paczkami przez sygnały Qt, a nowsze
+# zapytanie o tym samym kluczu (np. "deposits.active") anuluje poprzednie - także w trakcie
+# wykonywania, przez sqlite3.Connection.interrupt(). Zdarzenia domenowe z zapisów wykonanych
+# w wątku (np. import) trafiają na szynę zdarzeń okna.
+
+import itertools
+import logging
+import queue
+import sqlite3
+import threading
+import traceback
+
+from PySide6.QtCore import QObject, QThread, Signal
+
+from repositories import Repositories
+
+logger = logging.getLogger("TireDepositManager")
+
+# Liczba wierszy w jednej paczce wysyłanej do tabeli
+BATCH_SIZE = 500
+
+
+class DatabaseWorker(QThread):
+    """Wątek wykonujący zadania job(repos) po kolei na własnym obiekcie Repositories."""
+
+    batch_ready = Signal(int, object, bool)  # id zadania, paczka wierszy, czy pierwsza paczka
+    job_finished = Signal(int, object)  # id zadania, wynik (None dla zadań zwracających wiersze)
+    job_failed = Signal(int, str)  # id zadania, opis błędu
+    event_published = Signal(object)  # zdarzenie domenowe po commicie w wątku
+
+    def __init__(self, db_path, profile, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.profile = profile
+        self.repos = None
+        self.stats = None
+        self.statistics = None
+        self.dashboard = None
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._cancelled = set()
+        self._current_id = None
+
+    def submit(self, request_id, job, batch_size=None):
+        """Kolejkuje zadanie; batch_size=None oznacza jeden wynik zamiast paczek wierszy."""
+        self._jobs.put((request_id, job, batch_size))
+
+    def cancel(self, request_id):
+        """Anuluje zadanie oczekujące w kolejce albo przerywa właśnie wykonywane zapytanie."""
+        with self._lock:
+            self._cancelled.add(request_id)
+            if request_id == self._current_id and self.repos is not None:
+                self.repos.conn.interrupt()
+
+    def stop(self):
+        """Kończy wątek po bieżącym zadaniu (anulowanym) i czeka na zamknięcie połączenia."""
+        with self._lock:
+            if self._current_id is not None:
+                self._cancelled.add(self._current_id)
+                if self.repos is not None:
+                    self.repos.conn.interrupt()
+        self._jobs.put(None)
+        self.wait()
+
+    def _is_cancelled(self, request_id):
+        with self._lock:
+            return request_id in self._cancelled
+
+    def run(self):
+        self.repos = Repositories.open(self.db_path, self.profile)
+        self.repos.events.subscribe(None, self.event_published.emit)
+        self.stats = self.repos.stats
+        self.statistics = self.repos.statistics
+        self.dashboard = self.repos.dashboard
+        try:
+            while True:
+                item = self._jobs.get()
+                if item is None:
+                    break
+                request_id, job, batch_size = item
+                with self._lock:
+                    if request_id in self._cancelled:
+                        self._cancelled.discard(request_id)
+                        continue
+                    self._current_id = request_id
+                try:
+                    self._run_job(request_id, job, batch_size)
+                finally:
+                    with self._lock:
+                        self._current_id = None
+                        self._cancelled.discard(request_id)
+        finally:
+            self.repos.close()
+            self.repos = None
+
+    def _run_job(self, request_id, job, batch_size):
+        try:
+            result = job(self.repos)
+            if self.repos.conn.in_transaction:
+                self.repos.conn.rollback()
+            if batch_size is None:
+                if not self._is_cancelled(request_id):
+                    self.job_finished.emit(request_id, result)
+                return
+            rows = list(result)
+            for start in range(0, max(len(rows), 1), batch_size):
+                if self._is_cancelled(request_id):
+                    return
+                self.batch_ready.emit(request_id, rows[start:start + batch_size], start == 0)
+            self.job_finished.emit(request_id, None)
+        except sqlite3.OperationalError as e:
+            if self.repos.conn.in_transaction:
+                self.repos.conn.rollback()
+            if self._is_cancelled(request_id):
+                logger.debug(f"Przerwano zapytanie {request_id}: {e}")
+            else:
+                logger.error(f"Błąd zapytania w tle: {e}")
+                self.job_failed.emit(request_id, traceback.format_exc())
+        except Exception as e:
+            if self.repos.conn.in_transaction:
+                self.repos.conn.rollback()
+            logger.error(f"Błąd zapytania w tle: {e}")
+            self.job_failed.emit(request_id, traceback.format_exc())
+
+
+class QueryExecutor(QObject):
+    """
+    Strona GUI wątku bazy danych: przypisuje zadaniom identyfikatory i wywołuje
+    funkcje zwrotne w wątku interfejsu. Wyniki zadań zastąpionych nowszymi są pomijane.
+    Zdarzenia z wątku są publikowane na szynie events (EventBus okna), jeśli została podana.
+    """
+
+    def __init__(self, db_path, profile, events=None, parent=None):
+        super().__init__(parent)
+        self.events = events
+        self._ids = itertools.count(1)
+        self._requests = {}  # id zadania -> (klucz, on_batch, on_done, on_error)
+        self._latest = {}  # klucz -> id ostatniego zadania
+        self.worker = DatabaseWorker(db_path, profile)
+        self.worker.batch_ready.connect(self._on_batch)
+        self.worker.job_finished.connect(self._on_finished)
+        self.worker.job_failed.connect(self._on_failed)
+        self.worker.event_published.connect(self._on_event)
+        self.worker.start()
+
+    def fetch(self, key, job, on_batch, on_done=None, on_error=None, batch_size=BATCH_SIZE):
+        """
+        Wykonuje job(repos) zwracające listę wierszy; on_batch(wiersze, pierwsza) dostaje je paczkami.
+        Poprzednie zadanie o tym samym kluczu zostaje anulowane.
+        """
+        return self._submit(key, job, batch_size, on_batch, on_done, on_error)
+
+    def call(self, key, job, on_done=None, on_error=None):
+        """Wykonuje job(repos) w tle i przekazuje jego wynik do on_done(wynik)."""
+        return self._submit(key, job, None, None, on_done, on_error)
+
+    def cancel(self, key):
+        request_id = self._latest.pop(key, None)
+        if request_id is not None:
+            self._requests.pop(request_id, None)
+            self.worker.cancel(request_id)
+
+    @property
+    def stats(self):
+        """QueryStats połączenia wątku (None, dopóki wątek nie otworzył bazy)."""
+        return self.worker.stats
+
+    @property
+    def statistics(self):
+        """StatisticsCache połączenia wątku - wyniki i liczniki zakładki statystyk."""
+        return self.worker.statistics
+
+    @property
+    def dashboard(self):
+        """AnalyticsCache połączenia wątku - wyniki i liczniki zakładki analiz."""
+        return self.worker.dashboard
+
+    def is_pending(self, key):
+        return key in self._latest
+
+    def shutdown(self):
+        for key in list(self._latest):
+            self.cancel(key)
+        self.worker.stop()
+
+    def _submit(self, key, job, batch_size, on_batch, on_done, on_error):
+        self.cancel(key)
+        request_id = next(self._ids)
+        self._requests[request_id] = (key, on_batch, on_done, on_error)
+        self._latest[key] = request_id
+        self.worker.submit(request_id, job, batch_size)
+        return request_id
+
+    def _finish(self, request_id):
+        key = self._requests.pop(request_id)[0]
+        if self._latest.get(key) == request_id:
+            del self._latest[key]
+
+    def _on_batch(self, request_id, rows, first):
+        request = self._requests.get(request_id)
+        if request is None:
+            return
+        try:
+            request[1](rows, first)
+        except Exception as e:
+            logger.error(f"Błąd podczas wyświetlania wyników zapytania {request[0]}: {e}")
+
+    def _on_finished(self, request_id, result):
+        request = self._requests.get(request_id)
+        if request is None:
+            return
+        self._finish(request_id)
+        if request[2] is not None:
+            try:
+                request[2](result)
+            except Exception as e:
+                logger.error(f"Błąd podczas obsługi wyniku zapytania {request[0]}: {e}")
+
+    def _on_failed(self, request_id, error_code):
+        request = self._requests.get(request_id)
+        if request is None:
+            return
+        self._finish(request_id)
+        if request[3] is not None:
+            request[3](error_code)
+
+    def _on_event(self, event):
+        if self.events is not None:
+            self.events.publish(event)
@@ -0,0 +1,52 @@
+# events.py
+#
+# Zdarzenia domenowe publikowane po zatwierdzeniu zmian w bazie. Interfejs nie przeładowuje
+# po każdej akcji wszystkich tabel - subskrybenci odświeżają tylko wiersze o ID ze zdarzenia
+# (ids=None oznacza zmianę, której nie da się opisać listą ID, np. import - pełne przeładowanie).
+
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger("TireDepositManager")
+
+DepositChanged = namedtuple("DepositChanged", ["ids"])
+ClientChanged = namedtuple("ClientChanged", ["ids"])
+OrderChanged = namedtuple("OrderChanged", ["ids"])
+InventoryChanged = namedtuple("InventoryChanged", ["ids"])
+
+
+def merge_events(events):
+    """Łączy zdarzenia tego samego typu w jedno (suma ID; None pochłania wszystko)."""
+    merged = {}
+    for event in events:
+        event_type = type(event)
+        if event_type not in merged:
+            merged[event_type] = None if event.ids is None else set(event.ids)
+        elif merged[event_type] is not None:
+            if event.ids is None:
+                merged[event_type] = None
+            else:
+                merged[event_type].update(event.ids)
+    return [
+        event_type(None if ids is None else frozenset(ids))
+        for event_type, ids in merged.items()
+    ]
+
+
+class EventBus:
+    """Prosta szyna zdarzeń w obrębie procesu: subscribe(typ, funkcja), publish(zdarzenie)."""
+
+    def __init__(self):
+        self._handlers = {}
+
+    def subscribe(self, event_type, handler):
+        """Rejestruje funkcję dla typu zdarzenia (None - dla wszystkich zdarzeń)."""
+        self._handlers.setdefault(event_type, []).append(handler)
+
+    def publish(self, event):
+        # Błąd jednego subskrybenta nie może cofnąć zapisu ani zablokować pozostałych
+        for handler in self._handlers.get(type(event), []) + self._handlers.get(None, []):
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error(f"Błąd obsługi zdarzenia {type(event).__name__}: {e}")
@@ -0,0 +1,142 @@
+# mailer.py
+#
+# Wysyłanie e-maili przez SMTP. Seria wiadomości (np. przypomnienia z jednego przebiegu) idzie
+# jedną zalogowaną sesją na paczkę - połączenie TLS i logowanie raz na paczkę zamiast raz na
+# wiadomość. Po zerwaniu połączenia sesja jest otwierana ponownie, a wiadomość wysyłana jeszcze raz.
+
+import logging
+import smtplib
+import time
+from collections import namedtuple
+from email.mime.text import MIMEText
+
+logger = logging.getLogger("TireDepositManager")
+
+Message = namedtuple("Message", ["to_address", "subject", "body"])
+# Wynik paczki: wysłane i nieudane wiadomości (z opisem błędu), liczba logowań, czas [s]
+BatchReport = namedtuple("BatchReport", ["sent", "failed", "connections", "seconds"])
+
+# Wiadomości w jednej sesji SMTP - serwery pocztowe ograniczają liczbę wiadomości na połączenie
+BATCH_SIZE = 50
+
+# Próby wysłania jednej wiadomości (kolejne - po ponownym połączeniu)
+SEND_ATTEMPTS = 2
+
+SMTP_TIMEOUT = 30
+
+
+class MailSender:
+    """
+    Sesja SMTP dla serii wiadomości: `with MailSender(email_settings) as sender: sender.send_all(...)`.
+    settings - słownik ustawień e-mail (email_address, email_password, smtp_server, smtp_port);
+    smtp_factory(host, port, timeout=...) tworzy połączenie (domyślnie SMTP_SSL).
+    """
+
+    def __init__(self, settings, smtp_factory=smtplib.SMTP_SSL, batch_size=BATCH_SIZE):
+        self.from_address = settings.get('email_address', '')
+        self.password = settings.get('email_password', '')
+        self.smtp_server = settings.get('smtp_server', '')
+        self.smtp_port = int(settings.get('smtp_port') or 465)
+        self.smtp_factory = smtp_factory
+        self.batch_size = batch_size
+        self.connections = 0
+        self._server = None
+        self._session_sent = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
+    @property
+    def connected(self):
+        """Czy sesja jest otwarta - po błędzie wysyłki False oznacza brak połączenia, nie odrzuconą wiadomość."""
+        return self._server is not None
+
+    def _connect(self):
+        server = self.smtp_factory(self.smtp_server, self.smtp_port, timeout=SMTP_TIMEOUT)
+        try:
+            server.login(self.from_address, self.password)
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+        self._session_sent = 0
+        self.connections += 1
+
+    def _drop(self):
+        # Połączenie zerwane - bez QUIT, tylko zamknięcie gniazda
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    def close(self):
+        """Kończy sesję (QUIT); błąd przy zamykaniu nie unieważnia wysłanych wiadomości."""
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                self._server.close()
+            self._server = None
+
+    def send(self, message):
+        """Wysyła wiadomość bieżącą sesją (otwiera ją w razie potrzeby); po zerwaniu połączenia - ponownie."""
+        msg = MIMEText(message.body)
+        msg['Subject'] = message.subject
+        msg['From'] = self.from_address
+        msg['To'] = message.to_address
+        for attempt in range(1, SEND_ATTEMPTS + 1):
+            if self._server is None:
+                self._connect()
+            try:
+                self._server.sendmail(self.from_address, [message.to_address], msg.as_string())
+                break
+            except smtplib.SMTPException as e:
+                # SMTPException dziedziczy po OSError - odrzucona wiadomość nie oznacza zerwanej sesji
+                if not isinstance(e, smtplib.SMTPServerDisconnected):
+                    raise
+                error = e
+            except OSError as e:
+                error = e
+            self._drop()
+            if attempt == SEND_ATTEMPTS:
+                raise error
+            logger.warning(f"Zerwane połączenie SMTP ({error}) - ponowne połączenie.")
+        self._session_sent += 1
+        if self._session_sent >= self.batch_size:
+            self.close()
+
+    def send_all(self, messages, on_sent=None):
+        """
+        Wysyła wiadomości paczkami po batch_size (jedna sesja na paczkę), on_sent(wiadomość) po każdej
+        wysłanej. Brak połączenia lub logowania przerywa wysyłkę, odrzucenie pojedynczej wiadomości - nie.
+        Zwraca [BatchReport].
+        """
+        messages = list(messages)
+        reports = []
+        for start in range(0, len(messages), self.batch_size):
+            started = time.perf_counter()
+            connections = self.connections
+            sent, failed = [], []
+            for message in messages[start:start + self.batch_size]:
+                try:
+                    self.send(message)
+                except (smtplib.SMTPException, OSError) as e:
+                    if not self.connected:
+                        # Sesji nie da się otworzyć - pozostałe wiadomości też by nie wyszły
+                        raise
+                    logger.error(f"Błąd podczas wysyłania e-maila do {message.to_address}: {e}")
+                    failed.append((message, str(e)))
+                    continue
+                sent.append(message)
+                if on_sent is not None:
+                    on_sent(message)
+            self.close()
+            report = BatchReport(sent, failed, self.connections - connections, time.perf_counter() - started)
+            logger.info(f"Paczka e-maili {len(reports) + 1}: wysłano {len(report.sent)}, błędów {len(report.failed)}, "
+                        f"logowań {report.connections}, {report.seconds:.1f} s "
+                        f"({len(report.sent) / max(report.seconds, 1e-6):.1f} wiadomości/s)")
+            reports.append(report)
+        return reports
@@ -1,5 +1,4 @@
 import os
-import sqlite3
 from PySide6.QtWidgets import QMessageBox, QDialog, QVBoxLayout, QLabel, QPushButton
 from niimprint.printer import PrinterClient
 from niimprint import SerialTransport
@@ -10,8 +9,7 @@ import logging
 logger = logging.getLogger("TireDepositManager")
 
 class NiimbotPrinterManager:
-    def __init__(self, db_path, serial_port='COM3'):
-        self.conn = sqlite3.connect(db_path)
+    def __init__(self, serial_port='COM3'):
         self.serial_port = serial_port
 
     def print_label_with_niimbot(self, file_path):
@@ -105,8 +103,7 @@ class NiimbotPrinterManager:
 
 # Przykład użycia
 if __name__ == "__main__":
-    db_path = "tire_deposits.db"
-    printer_manager = NiimbotPrinterManager(db_path=db_path, serial_port="COM3")
+    printer_manager = NiimbotPrinterManager(serial_port="COM3")
     label_text = (
         "Klient: Jan Kowalski\n"
         "Marka: Michelin\n"
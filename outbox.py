@@ -0,0 +1,171 @@
+# outbox.py
+#
+# Kolejka wychodzących e-maili (tabela email_outbox). Akcja, która wysyła wiadomość, tylko dopisuje
+# ją do kolejki - w tej samej transakcji co własne zapisy - a wątek OutboxSender wysyła ją w tle
+# paczkami (MailSender.send_all, jedna sesja SMTP na paczkę). Odrzucona wiadomość jest ponawiana
+# po wykładniczo rosnącej przerwie, a przy niedostępnym serwerze cała paczka czeka bez liczenia
+# próby. Liczbę wiadomości na minutę ogranicza ustawienie email_rate_per_minute, a wysłana
+# wiadomość trafia do historii e-maili w tej samej transakcji co zmiana jej statusu.
+
+import collections
+import logging
+import smtplib
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from PySide6.QtCore import QMetaMethod, QThread, Signal
+
+from mailer import MailSender
+from repositories import Repositories
+from scheduler import TIME_FORMAT
+
+logger = logging.getLogger("TireDepositManager")
+
+# Domyślny limit wiadomości na minutę (ustawienie email_rate_per_minute)
+DEFAULT_RATE_PER_MINUTE = 20
+
+# Próby wysłania jednej wiadomości, zanim dostanie status 'Nieudany'
+MAX_ATTEMPTS = 8
+
+# Przerwa przed ponowieniem: RETRY_BASE * 2^(próba - 1), najwyżej RETRY_MAX
+RETRY_BASE = timedelta(minutes=1)
+RETRY_MAX = timedelta(hours=6)
+
+# Czas zajęcia wiadomości przez wysyłkę - po przerwanym programie wiadomość wraca do kolejki
+LEASE = timedelta(minutes=10)
+
+# Najdłuższa przerwa między sprawdzeniami kolejki (wiadomości dopisane przez inną instancję programu)
+IDLE_INTERVAL = 60
+
+
+def retry_delay(attempts):
+    """Przerwa przed kolejną próbą po `attempts` nieudanych."""
+    return min(RETRY_BASE * 2 ** min(attempts - 1, 16), RETRY_MAX)
+
+
+def rate_per_minute(settings):
+    try:
+        return max(1, int(settings.get('email_rate_per_minute') or DEFAULT_RATE_PER_MINUTE))
+    except ValueError:
+        return DEFAULT_RATE_PER_MINUTE
+
+
+class OutboxSender(QThread):
+    """
+    Wątek opróżniający kolejkę email_outbox na własnym połączeniu. wake() - nowa wiadomość w kolejce,
+    stop() - zakończenie po bieżącej wiadomości. Ustawienia SMTP i limit są czytane z bazy przy każdej serii.
+    """
+
+    message_sent = Signal(int, str)  # ID wiadomości, adres
+    message_failed = Signal(int, str, bool)  # ID wiadomości, błąd, czy ostatnia próba
+
+    def __init__(self, db_path, profile, smtp_factory=smtplib.SMTP_SSL, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.profile = profile
+        self.smtp_factory = smtp_factory
+        self._wake = threading.Event()
+        self._stopping = False
+        self._sent_times = collections.deque()  # time.monotonic() wysłanych w ostatniej minucie
+        self._connection_failures = 0
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout_ms=30000):
+        self._stopping = True
+        self._wake.set()
+        if not self.wait(timeout_ms):
+            logger.warning("Wysyłka e-maili nie zakończyła się przed zamknięciem programu.")
+
+    def run(self):
+        try:
+            repos = Repositories.open(self.db_path, self.profile)
+        except Exception as e:
+            logger.error(f"Kolejka e-maili: nie można otworzyć bazy danych: {e}")
+            return
+        try:
+            while not self._stopping:
+                try:
+                    delay = self.drain(repos)
+                except Exception as e:
+                    if repos.conn.in_transaction:
+                        repos.conn.rollback()
+                    logger.error(f"Błąd kolejki e-maili: {e}\n{traceback.format_exc()}")
+                    delay = IDLE_INTERVAL
+                self._wake.wait(delay)
+                self._wake.clear()
+        finally:
+            repos.close()
+
+    def _rate_wait(self, limit):
+        """Sekundy do zwolnienia miejsca w limicie wiadomości na minutę (0 - można wysyłać)."""
+        now = time.monotonic()
+        while self._sent_times and now - self._sent_times[0] >= 60:
+            self._sent_times.popleft()
+        if len(self._sent_times) < limit:
+            return 0
+        return 60 - (now - self._sent_times[0])
+
+    def _emit(self, signal, *args):
+        # Tylko przy podłączonych odbiorcach: emit() w PySide6 6.12 przy każdym wywołaniu gubi referencję
+        # do True, a po kilkudziesięciu wywołaniach interpreter przerywa pracę przy zamykaniu
+        if self.isSignalConnected(QMetaMethod.fromSignal(signal)):
+            signal.emit(*args)
+
+    def _on_sent(self, repos, message):
+        self._sent_times.append(time.monotonic())
+        repos.emails.mark_sent(message.id, datetime.now().strftime(TIME_FORMAT))
+        logger.info(f"Wysłano e-mail do {message.to_address}")
+        self._emit(self.message_sent, message.id, message.to_address)
+
+    def drain(self, repos):
+        """
+        Wysyła paczkami wiadomości, których termin minął, w granicach limitu; zwraca sekundy do kolejnego
+        sprawdzenia. Paczka (OutboxRow - pola jak mailer.Message) idzie jedną sesją SMTP.
+        """
+        settings = repos.settings.all()
+        limit = rate_per_minute(settings)
+        with MailSender(settings, self.smtp_factory) as sender:
+            while not self._stopping:
+                wait = self._rate_wait(limit)
+                if wait > 0:
+                    return wait
+                now = datetime.now()
+                messages = repos.emails.claim_due(now.strftime(TIME_FORMAT), (now + LEASE).strftime(TIME_FORMAT),
+                                                  min(sender.batch_size, limit - len(self._sent_times)))
+                if not messages:
+                    break
+                sent_ids = set()
+
+                def on_sent(message):
+                    sent_ids.add(message.id)
+                    self._on_sent(repos, message)
+
+                try:
+                    reports = sender.send_all(messages, on_sent)
+                except (smtplib.SMTPException, OSError) as e:
+                    # Serwer nieosiągalny albo odrzuca logowanie - niewysłane wiadomości czekają bez liczenia próby
+                    self._connection_failures += 1
+                    delay = retry_delay(self._connection_failures)
+                    unsent = [message.id for message in messages if message.id not in sent_ids]
+                    repos.emails.release(unsent, (datetime.now() + delay).strftime(TIME_FORMAT), str(e))
+                    logger.error(f"Brak połączenia z serwerem SMTP ({e}) - {len(unsent)} wiadomości czeka "
+                                 f"{delay.total_seconds():.0f} s.")
+                    return delay.total_seconds()
+                self._connection_failures = 0
+                for report in reports:
+                    for message, error in report.failed:
+                        attempts = message.attempts + 1
+                        final = attempts >= MAX_ATTEMPTS
+                        next_attempt = datetime.now() + retry_delay(attempts)
+                        repos.emails.mark_failed(message.id, next_attempt.strftime(TIME_FORMAT), error, final)
+                        logger.error(f"Nieudana wysyłka e-maila do {message.to_address} (próba {attempts}): {error}")
+                        self._emit(self.message_failed, message.id, error, final)
+        next_attempt = repos.emails.next_attempt()
+        if next_attempt is None:
+            return IDLE_INTERVAL
+        delay = (datetime.strptime(next_attempt, TIME_FORMAT) - datetime.now()).total_seconds() + 1
+        return min(max(delay, 1), IDLE_INTERVAL)
@@ -0,0 +1,53 @@
+# reminders.py
+#
+# Przypomnienia o odbiorze opon. Każdy rodzaj przypomnienia obejmuje przedział dni do terminu
+# odbioru; depozyty wybiera zapytanie po indeksie (status, expected_return_date), więc przebieg nie
+# przegląda wszystkich aktywnych depozytów. Wysłane przypomnienie trafia do deposit_reminders w tej
+# samej transakcji co wiadomość do kolejki wysyłki - ponowny przebieg (także po przerwie w pracy
+# programu) go nie powtórzy, a po zmianie terminu odbioru przypomnienia wychodzą od nowa.
+
+from collections import namedtuple
+from datetime import date, timedelta
+
+# first_day/last_day - dni do terminu odbioru, włącznie (ujemne - po terminie)
+Reminder = namedtuple("Reminder", ["name", "first_day", "last_day", "subject", "body"])
+
+# Przypomnienia po terminie wysyłamy najwyżej tyle dni po nim
+OVERDUE_DAYS = 30
+
+UPCOMING_BODY = ("Szanowny {client_name},\n\nPrzypominamy o zbliżającym się terminie odbioru opon: {expected_return_date}."
+                 "\n\nPozdrawiamy,\n{company_name}")
+OVERDUE_BODY = ("Szanowny {client_name},\n\nTermin odbioru opon minął {expected_return_date}. "
+                "Prosimy o kontakt w sprawie odbioru.\n\nPozdrawiamy,\n{company_name}")
+
+# Przedziały się nie nakładają - po przegapionym przebiegu depozyt dostaje tylko przypomnienie
+# najbliższe terminowi, a nie kilka naraz. Nazwy są zapisane w bazie - nie zmieniamy ich.
+REMINDERS = (
+    Reminder("days_14", 8, 14, "Przypomnienie o odbiorze opon", UPCOMING_BODY),
+    Reminder("days_7", 2, 7, "Przypomnienie o odbiorze opon", UPCOMING_BODY),
+    Reminder("days_1", 0, 1, "Zbliża się termin odbioru opon", UPCOMING_BODY),
+    Reminder("overdue", -OVERDUE_DAYS, -1, "Minął termin odbioru opon", OVERDUE_BODY),
+)
+
+
+def reminder_range(reminder, today):
+    """Przedział terminów odbioru [od, do) przypomnienia dla dnia today - daty lokalne jak w expected_return_date."""
+    return ((today + timedelta(days=reminder.first_day)).isoformat(),
+            (today + timedelta(days=reminder.last_day + 1)).isoformat())
+
+
+def queue_reminders(repos, company_name, today=None, reminders=REMINDERS):
+    """Dopisuje należne przypomnienia do kolejki wysyłki w jednej transakcji. Zwraca {rodzaj: liczba}."""
+    today = today or date.today()
+    queued = {}
+    with repos.transaction():
+        for reminder in reminders:
+            first_date, end_date = reminder_range(reminder, today)
+            rows = repos.deposits.due_reminders(reminder.name, first_date, end_date)
+            for row in rows:
+                body = reminder.body.format(client_name=row.client_name, expected_return_date=row.expected_return_date,
+                                            company_name=company_name)
+                outbox_id = repos.emails.enqueue(row.email, reminder.subject, body)
+                repos.deposits.record_reminder(row.id, reminder.name, row.expected_return_date, outbox_id)
+            queued[reminder.name] = len(rows)
+    return queued
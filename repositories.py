@@ -0,0 +1,1261 @@
+# repositories.py
+#
+# Warstwa dostępu do danych. Interfejs nie wykonuje SQL samodzielnie - wszystkie zapytania
+# przechodzą przez repozytoria poniżej, które korzystają z jednego wspólnego połączenia.
+
+import json
+import logging
+import sqlite3
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from change_tracker import ChangeTracker
+from events import EventBus, DepositChanged, ClientChanged, OrderChanged, InventoryChanged, merge_events
+from tire_sizes import TireSize, size_columns, size_filter_sql, parse_size_filter, format_tire_size
+from database import (
+    DEFAULT_PROFILE, open_connection, migrate, temporary_profile, backup_database, optimize_database, fts_phrase, project_columns,
+    check_rollups, rebuild_rollups, ensure_plate_index, ROLLUP_AVERAGE_DURATION_SQL,
+    ACTIVE_DEPOSITS_COLUMNS, DEPOSIT_DURATION_SQL,
+    OCCUPANCY_QUERY, THROUGHPUT_QUERY, DWELL_QUERY, REVENUE_QUERY, OUTBOX_DUE_QUERY, REMINDER_DUE_QUERY,
+    normalize_plate, plate_search_key,
+    ACTIVE_DEPOSITS_QUERY, ISSUED_DEPOSITS_QUERY, OVERDUE_DEPOSITS_QUERY,
+    ACTIVE_DEPOSITS_SEARCH_QUERY, ISSUED_DEPOSITS_SEARCH_QUERY, OVERDUE_DEPOSITS_SEARCH_QUERY,
+    ACTIVE_DEPOSITS_PLATE_QUERY, ISSUED_DEPOSITS_PLATE_QUERY, OVERDUE_DEPOSITS_PLATE_QUERY,
+    ACTIVE_DEPOSITS_BY_ID_QUERY, ISSUED_DEPOSITS_BY_ID_QUERY, OVERDUE_DEPOSITS_BY_ID_QUERY,
+    ISSUED_DEPOSITS_PAGE_QUERY, ISSUED_DEPOSITS_UNDATED_PAGE_QUERY, ORDERS_PAGE_QUERY, ORDERS_UNDATED_PAGE_QUERY
+)
+
+logger = logging.getLogger("TireDepositManager")
+
+# Rozmiar pamięci podręcznej przygotowanych zapytań (sqlite3.connect(cached_statements=...)).
+# Każde zapytanie repozytoriów ma stały tekst, więc po pierwszym wykonaniu nie jest ponownie kompilowane.
+STATEMENT_CACHE_SIZE = 256
+
+# Domyślna liczba wierszy jednej strony historii (ustawienie "page_size")
+PAGE_SIZE = 200
+# Początek listy stronicowanej: data większa od każdej daty w formacie ISO
+_PAGE_START_DATE = "9999"
+_MAX_ID = 2 ** 63 - 1
+
+
+# Typowane wiersze zwracane przez repozytoria (zgodne z krotkami, więc działa też indeksowanie)
+ActiveDepositRow = namedtuple("ActiveDepositRow", [
+    "id", "client_name", "phone_number", "email", "car_model", "registration_number",
+    "tire_brand", "tire_size", "quantity", "location", "washing", "conservation", "deposit_date",
+    "season", "status", "duration", "technical_condition", "storage_date", "price",
+])
+IssuedDepositRow = namedtuple("IssuedDepositRow", [
+    "id", "client_name", "phone_number", "email", "car_model", "registration_number",
+    "tire_brand", "tire_size", "quantity", "location", "washing", "conservation", "deposit_date",
+    "issue_date", "season", "status", "duration", "technical_condition", "storage_date", "price",
+])
+OverdueDepositRow = namedtuple("OverdueDepositRow", [
+    "id", "client_name", "phone_number", "email", "car_model", "registration_number",
+    "tire_brand", "tire_size", "quantity", "location", "deposit_date", "expected_return_date",
+    "season", "status", "overdue_days", "contact", "price",
+])
+DepositDetails = namedtuple("DepositDetails", [
+    "id", "client_id", "car_model", "registration_number", "tire_brand", "tire_size", "quantity",
+    "location", "washing", "conservation", "deposit_date", "issue_date", "status", "duration",
+    "season", "expected_return_date", "technical_condition", "storage_date", "price",
+    "client_name", "phone_number", "email",
+])
+ClientDepositRow = namedtuple("ClientDepositRow", [
+    "id", "car_model", "registration_number", "tire_brand", "tire_size", "quantity",
+    "location", "washing", "conservation", "deposit_date", "issue_date", "season", "status",
+    "duration", "technical_condition", "storage_date", "price",
+])
+ExportDepositRow = namedtuple("ExportDepositRow", [
+    "id", "client_name", "phone_number", "email", "car_model", "registration_number",
+    "tire_brand", "tire_size", "quantity", "location", "washing", "conservation", "deposit_date",
+    "status", "duration", "technical_condition", "storage_date", "price",
+])
+ReminderRow = namedtuple("ReminderRow", ["id", "client_name", "email", "expected_return_date"])
+HistoryRow = namedtuple("HistoryRow", ["change_date", "user", "description", "id"])
+DepositStatistics = namedtuple("DepositStatistics", ["active_count", "issued_count", "avg_duration", "active_income"])
+MonthlyCount = namedtuple("MonthlyCount", ["month", "count"])
+RollupRow = namedtuple("RollupRow", ["bucket", "active_count", "issued_count", "active_income"])
+OccupancyRow = namedtuple("OccupancyRow", ["location", "month", "deposits"])
+ThroughputRow = namedtuple("ThroughputRow", ["day", "check_ins", "check_outs", "moving_average"])
+DwellRow = namedtuple("DwellRow", ["season", "count", "average_days", "median_days", "max_days"])
+RevenueRow = namedtuple("RevenueRow", ["month", "deposits", "revenue", "change", "year_to_date"])
+ClientRow = namedtuple("ClientRow", [
+    "id", "name", "phone_number", "email", "additional_info", "discount", "barcode",
+])
+OrderRow = namedtuple("OrderRow", [
+    "id", "client_name", "order_date", "expected_delivery_date", "status", "notes",
+])
+OrderDetails = namedtuple("OrderDetails", [
+    "id", "client_id", "order_date", "expected_delivery_date", "status", "notes",
+    "client_name", "phone_number", "email",
+])
+OrderItemRow = namedtuple("OrderItemRow", ["tire_brand", "tire_size", "price", "quantity"])
+InventoryRow = namedtuple("InventoryRow", [
+    "id", "brand_model", "size", "quantity", "price", "dot", "notes", "season_type",
+])
+EmailTemplate = namedtuple("EmailTemplate", ["name", "subject", "body"])
+EmailHistoryRow = namedtuple("EmailHistoryRow", ["sent_date", "to_address", "subject", "body"])
+OutboxRow = namedtuple("OutboxRow", ["id", "to_address", "subject", "body", "attempts"])
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _id_list(ids):
+    """Lista ID jako tablica JSON dla zapytań z json_each(?)."""
+    return json.dumps(sorted(ids))
+
+
+class QueryStats:
+    """Liczba wykonań i łączny czas zapytań repozytoriów, pogrupowane po nazwie zapytania."""
+
+    def __init__(self):
+        self.calls = {}
+
+    def record(self, name, elapsed):
+        count, total = self.calls.get(name, (0, 0.0))
+        self.calls[name] = (count + 1, total + elapsed)
+
+    def report(self):
+        """Zwraca listę (nazwa, liczba wykonań, łączny czas [ms], średni czas [ms]) od najdroższych."""
+        rows = [
+            (name, count, total * 1000, total * 1000 / count)
+            for name, (count, total) in self.calls.items()
+        ]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def reset(self):
+        self.calls.clear()
+
+
+class UnitOfWork:
+    """
+    Transakcja obejmująca wszystkie zapisy jednej akcji użytkownika.
+
+    Każda metoda zapisu repozytorium jest blokiem `with unit_of_work`. Bloki można zagnieżdżać:
+    commit (albo rollback po wyjątku) wykonuje dopiero najbardziej zewnętrzny, więc akcja
+    złożona z kilku zapisów, np. zmiana depozytu z wpisem historii, to dokładnie jeden commit.
+
+    Zapisy zgłaszają zdarzenia (record), które trafiają na szynę dopiero po commicie - połączone
+    w jedno zdarzenie na typ; rollback je odrzuca.
+    """
+
+    def __init__(self, conn, events=None):
+        self.conn = conn
+        self.events = events
+        self.depth = 0
+        self.commits = 0
+        self._pending_events = []
+
+    @property
+    def active(self):
+        return self.depth > 0
+
+    def __enter__(self):
+        if self.depth == 0 and not self.conn.in_transaction:
+            # Blokada zapisu od razu - bez ryzyka SQLITE_BUSY przy podnoszeniu blokady odczytu
+            self.conn.execute("BEGIN IMMEDIATE")
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.depth -= 1
+        if self.depth == 0:
+            events, self._pending_events = self._pending_events, []
+            if exc_type is None:
+                self.conn.commit()
+                self.commits += 1
+                if self.events is not None:
+                    for event in merge_events(events):
+                        self.events.publish(event)
+            else:
+                self.conn.rollback()
+        return False
+
+    def record(self, event):
+        """Zgłasza zdarzenie do opublikowania po zatwierdzeniu bieżącej transakcji."""
+        self._pending_events.append(event)
+
+
+class BaseRepository:
+    """Wspólne metody wykonywania zapytań z pomiarem czasu."""
+
+    # Pola wierszy list, które indeks FTS przeszukuje dla paska wyszukiwania
+    SEARCH_FIELDS = ()
+
+    def __init__(self, conn, stats, unit_of_work):
+        self.conn = conn
+        self.stats = stats
+        self.unit_of_work = unit_of_work
+
+    def _execute(self, name, query, parameters=()):
+        started = time.perf_counter()
+        cursor = self.conn.execute(query, parameters)
+        self.stats.record(name, time.perf_counter() - started)
+        return cursor
+
+    def _fetchall(self, name, query, parameters=(), row_type=None):
+        started = time.perf_counter()
+        rows = self.conn.execute(query, parameters).fetchall()
+        self.stats.record(name, time.perf_counter() - started)
+        return list(map(row_type._make, rows)) if row_type else rows
+
+    def _fetchone(self, name, query, parameters=(), row_type=None):
+        started = time.perf_counter()
+        row = self.conn.execute(query, parameters).fetchone()
+        self.stats.record(name, time.perf_counter() - started)
+        if row is None or row_type is None:
+            return row
+        return row_type._make(row)
+
+    def _column(self, name, query, parameters=()):
+        return [row[0] for row in self._fetchall(name, query, parameters)]
+
+    def _page(self, name, dated_query, undated_query, after, limit, row_type):
+        """
+        Strona listy uporządkowanej malejąco według (data, id), wiersze bez daty na końcu.
+        after to pozycja ostatniego wiersza poprzedniej strony (ma_datę, data, id) albo None.
+        """
+        has_date, date, row_id = after if after is not None else (True, _PAGE_START_DATE, 0)
+        rows = []
+        if has_date:
+            rows = self._fetchall(name, dated_query, (date, row_id, limit), row_type)
+            row_id = _MAX_ID
+        if len(rows) < limit:
+            rows += self._fetchall(f"{name}_undated", undated_query, (row_id, limit - len(rows)), row_type)
+        return rows
+
+    def _special_search(self, search_text):
+        """Czy tekst uruchamia wyszukiwanie innego rodzaju niż FTS (np. numer rejestracyjny, rozmiar)."""
+        return False
+
+    def narrow(self, rows, previous_text, search_text):
+        """
+        Zawęża w pamięci wynik wyszukiwania previous_text do search_text.
+
+        Działa tylko, gdy oba teksty idą przez FTS, a nowy rozszerza poprzedni - wtedy
+        dopasowanie podciągu w SEARCH_FIELDS daje te same wiersze co zapytanie do bazy
+        (w kolejności poprzedniego wyniku). W pozostałych przypadkach zwraca None.
+        """
+        previous_text = previous_text.strip()
+        search_text = search_text.strip()
+        if (fts_phrase(previous_text) is None or not search_text.startswith(previous_text)
+                or self._special_search(previous_text)):
+            return None
+        return self.matching(rows, search_text)
+
+    def matching(self, rows, search_text):
+        """
+        Wiersze listy, które zwróciłoby wyszukiwanie search_text (pusty tekst - wszystkie).
+        None, gdy nie da się tego rozstrzygnąć w pamięci (krótki tekst, wyszukiwanie specjalne).
+        """
+        search_text = search_text.strip()
+        if not search_text:
+            return list(rows)
+        if not self.SEARCH_FIELDS or fts_phrase(search_text) is None or self._special_search(search_text):
+            return None
+        needle = search_text.casefold()
+
+        def matches(row):
+            for field in self.SEARCH_FIELDS:
+                value = getattr(row, field)
+                if value is not None and needle in str(value).casefold():
+                    return True
+            return False
+
+        return [row for row in rows if matches(row)]
+
+
+class DepositRepository(BaseRepository):
+    """Depozyty opon i ich historia zmian."""
+
+    SEARCH_FIELDS = ("registration_number", "client_name", "car_model", "tire_brand", "tire_size")
+
+    # Jedno zapytanie "depozyt + klient" dla etykiet, potwierdzeń, kontaktu, e-maili i szczegółów
+    DETAILS_QUERY = f'''
+        SELECT deposits.id, deposits.client_id, deposits.car_model, deposits.registration_number,
+               deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
+               deposits.washing, deposits.conservation, deposits.deposit_date, deposits.issue_date,
+               deposits.status, {DEPOSIT_DURATION_SQL} AS duration, deposits.season, deposits.expected_return_date,
+               deposits.technical_condition, deposits.storage_date, deposits.price,
+               clients.name, clients.phone_number, clients.email
+        FROM deposits
+        LEFT JOIN clients ON deposits.client_id = clients.id
+        WHERE deposits.id = ?
+    '''
+    PLATE_QUERY = f'''
+        SELECT deposits.id, deposits.client_id, deposits.car_model, deposits.registration_number,
+               deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
+               deposits.washing, deposits.conservation, deposits.deposit_date, deposits.issue_date,
+               deposits.status, {DEPOSIT_DURATION_SQL} AS duration, deposits.season, deposits.expected_return_date,
+               deposits.technical_condition, deposits.storage_date, deposits.price,
+               clients.name, clients.phone_number, clients.email
+        FROM deposits
+        LEFT JOIN clients ON deposits.client_id = clients.id
+        WHERE deposits.plate_key = ?
+        ORDER BY deposits.status = 'Aktywny' DESC, deposits.deposit_date DESC
+    '''
+    ACTIVE_DUPLICATE_QUERY = '''
+        SELECT id FROM deposits
+        WHERE plate_key = ? AND season = ? AND status = 'Aktywny' AND id IS NOT ?
+    '''
+    CLIENT_DEPOSITS_QUERY = f'''
+        SELECT id, car_model, registration_number, tire_brand, tire_size, quantity,
+               location, washing, conservation, deposit_date, issue_date, season, status,
+               {DEPOSIT_DURATION_SQL} AS duration,
+               technical_condition, storage_date, price
+        FROM deposits
+        WHERE client_id = ?
+        ORDER BY deposit_date DESC
+    '''
+    EXPORT_QUERY = f'''
+        SELECT deposits.id, clients.name, clients.phone_number, clients.email,
+               deposits.car_model, deposits.registration_number,
+               deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
+               deposits.washing, deposits.conservation, deposits.deposit_date,
+               deposits.status, {DEPOSIT_DURATION_SQL} AS duration, deposits.technical_condition,
+               deposits.storage_date, deposits.price
+        FROM deposits
+        INNER JOIN clients ON deposits.client_id = clients.id
+    '''
+    HISTORY_QUERY = '''
+        SELECT change_date, user, description, id
+        FROM history
+        WHERE deposit_id = ?
+        ORDER BY change_date DESC
+    '''
+    INSERT_QUERY = '''
+        INSERT INTO deposits (
+            client_id, car_model, registration_number, tire_brand, tire_size,
+            quantity, location, washing, conservation, deposit_date, status, season, expected_return_date,
+            technical_condition, storage_date, price,
+            tire_width, tire_aspect_ratio, tire_construction, tire_rim_diameter
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    UPDATE_QUERY = '''
+        UPDATE deposits
+        SET client_id = ?, car_model = ?, registration_number = ?, tire_brand = ?, tire_size = ?,
+            quantity = ?, location = ?, washing = ?, conservation = ?, status = ?, season = ?, expected_return_date = ?,
+            technical_condition = ?, storage_date = ?, price = ?,
+            tire_width = ?, tire_aspect_ratio = ?, tire_construction = ?, tire_rim_diameter = ?
+        WHERE id = ?
+    '''
+    IMPORT_QUERY = '''
+        INSERT INTO deposits (
+            client_id, car_model, registration_number, tire_brand, tire_size,
+            quantity, location, washing, conservation, deposit_date, status,
+            technical_condition, storage_date, price,
+            tire_width, tire_aspect_ratio, tire_construction, tire_rim_diameter
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    # Rozmiary w postaci kanonicznej, od najmniejszej felgi; korzysta z idx_deposits_tire_rim_width
+    TIRE_SIZES_QUERY = '''
+        SELECT tire_width, tire_aspect_ratio, tire_construction, tire_rim_diameter
+        FROM deposits
+        WHERE {conditions}
+        GROUP BY tire_rim_diameter, tire_width, tire_aspect_ratio, tire_construction
+        ORDER BY tire_rim_diameter, tire_width, tire_aspect_ratio, tire_construction
+    '''
+    # Kolumny, dla których formularz depozytu podpowiada wcześniej wpisane wartości
+    SUGGESTION_COLUMNS = ("tire_size", "car_model", "registration_number", "tire_brand")
+
+    def list_active(self, search_text="", hidden_columns=()):
+        """
+        Aktywne depozyty. Kolumny o indeksach z hidden_columns (ukryte w tabeli) nie są pobierane
+        i mają wartość None - poza id i polami wyszukiwania, które są potrzebne zawsze.
+        """
+        plate_query = self._active_query(ACTIVE_DEPOSITS_PLATE_QUERY, hidden_columns)
+        rows = self._list_by_plate("deposits.plate_active", plate_query, search_text, ActiveDepositRow)
+        if rows:
+            return rows
+        phrase = fts_phrase(search_text)
+        if phrase:
+            search_query = self._active_query(ACTIVE_DEPOSITS_SEARCH_QUERY, hidden_columns)
+            return self._fetchall("deposits.search_active", search_query, (phrase,), ActiveDepositRow)
+        pattern = f'%{search_text}%'
+        list_query = self._active_query(ACTIVE_DEPOSITS_QUERY, hidden_columns)
+        return self._fetchall("deposits.list_active", list_query, (pattern, pattern), ActiveDepositRow)
+
+    def _active_query(self, query, hidden_columns):
+        required = {ActiveDepositRow._fields.index(field) for field in ("id",) + self.SEARCH_FIELDS}
+        return project_columns(query, ACTIVE_DEPOSITS_COLUMNS, set(hidden_columns) - required)
+
+    def list_issued(self, search_text=""):
+        rows = self._list_by_plate("deposits.plate_issued", ISSUED_DEPOSITS_PLATE_QUERY, search_text, IssuedDepositRow)
+        if rows:
+            return rows
+        phrase = fts_phrase(search_text)
+        if phrase:
+            return self._fetchall("deposits.search_issued", ISSUED_DEPOSITS_SEARCH_QUERY, (phrase,), IssuedDepositRow)
+        pattern = f'%{search_text}%'
+        return self._fetchall("deposits.list_issued", ISSUED_DEPOSITS_QUERY, (pattern, pattern), IssuedDepositRow)
+
+    def list_issued_page(self, after=None, limit=PAGE_SIZE):
+        """Strona historii wydanych depozytów (od najnowszych) za pozycją after z issued_page_key()."""
+        return self._page("deposits.page_issued", ISSUED_DEPOSITS_PAGE_QUERY, ISSUED_DEPOSITS_UNDATED_PAGE_QUERY,
+                          after, limit, IssuedDepositRow)
+
+    @staticmethod
+    def issued_page_key(row):
+        """Pozycja wiersza na liście wydanych: większa wartość - wyżej na liście."""
+        return (row.issue_date is not None, row.issue_date or "", row.id)
+
+    def list_overdue(self, search_text=""):
+        rows = self._list_by_plate("deposits.plate_overdue", OVERDUE_DEPOSITS_PLATE_QUERY, search_text,
+                                   OverdueDepositRow)
+        if rows:
+            return rows
+        phrase = fts_phrase(search_text)
+        if phrase:
+            return self._fetchall("deposits.search_overdue", OVERDUE_DEPOSITS_SEARCH_QUERY, (phrase,),
+                                  OverdueDepositRow)
+        pattern = f'%{search_text}%'
+        return self._fetchall("deposits.list_overdue", OVERDUE_DEPOSITS_QUERY, (pattern, pattern), OverdueDepositRow)
+
+    def list_active_by_ids(self, ids, hidden_columns=()):
+        """Aktualne wiersze zakładki aktywnych depozytów dla podanych ID (pozostałe ID nie są aktywne)."""
+        query = self._active_query(ACTIVE_DEPOSITS_BY_ID_QUERY, hidden_columns)
+        return self._fetchall("deposits.refresh_active", query, (_id_list(ids),), ActiveDepositRow)
+
+    def list_issued_by_ids(self, ids):
+        return self._fetchall("deposits.refresh_issued", ISSUED_DEPOSITS_BY_ID_QUERY, (_id_list(ids),),
+                              IssuedDepositRow)
+
+    def list_overdue_by_ids(self, ids):
+        return self._fetchall("deposits.refresh_overdue", OVERDUE_DEPOSITS_BY_ID_QUERY, (_id_list(ids),),
+                              OverdueDepositRow)
+
+    def _special_search(self, search_text):
+        # Tekst wygląda na numer rejestracyjny i taki numer istnieje - listy zwracają wtedy trafienia plate_key
+        key = plate_search_key(search_text)
+        return key is not None and self._fetchone(
+            "deposits.plate_exists", "SELECT 1 FROM deposits WHERE plate_key = ? LIMIT 1", (key,)) is not None
+
+    def _list_by_plate(self, name, query, search_text, row_type):
+        """Dokładne trafienie numeru rejestracyjnego (w dowolnym formacie) przez indeks plate_key."""
+        key = plate_search_key(search_text)
+        if key is None:
+            return []
+        return self._fetchall(name, query, (key,), row_type)
+
+    def find_by_plate(self, registration_number):
+        """Depozyty auta o podanym numerze rejestracyjnym (najpierw aktywne), jako DepositDetails."""
+        return self._fetchall("deposits.find_by_plate", self.PLATE_QUERY, (normalize_plate(registration_number),),
+                              DepositDetails)
+
+    def find_active_duplicate(self, registration_number, season, exclude_id=None):
+        """
+        ID innego aktywnego depozytu tego samego auta w tym samym sezonie albo None.
+        Depozyt bez sezonu nie jest duplikatem - tak samo jak w indeksie unikalnym.
+        """
+        key = normalize_plate(registration_number)
+        if not key:
+            return None
+        row = self._fetchone("deposits.find_active_duplicate", self.ACTIVE_DUPLICATE_QUERY, (key, season, exclude_id))
+        return row[0] if row else None
+
+    def list_for_client(self, client_id):
+        return self._fetchall("deposits.list_for_client", self.CLIENT_DEPOSITS_QUERY, (client_id,), ClientDepositRow)
+
+    def get(self, deposit_id):
+        """Zwraca DepositDetails (depozyt z danymi klienta) albo None."""
+        return self._fetchone("deposits.get", self.DETAILS_QUERY, (deposit_id,), DepositDetails)
+
+    def suggestions(self, column):
+        """Różne wartości kolumny do autouzupełniania w formularzu depozytu."""
+        if column not in self.SUGGESTION_COLUMNS:
+            raise ValueError(f"Nieobsługiwana kolumna podpowiedzi: {column}")
+        values = self._column(f"deposits.suggestions.{column}", f"SELECT DISTINCT {column} FROM deposits")
+        return [value for value in values if value]
+
+    def tire_sizes(self, size_filter=None):
+        """
+        Rozmiary opon z depozytów w postaci kanonicznej ("205/55 R16"), opcjonalnie zawężone
+        filtrem SizeFilter (np. wszystkie R16 o szerokości 195-215).
+
+        Bez filtra dołącza też zapisy, których nie udało się rozebrać na części.
+        """
+        conditions, parameters = size_filter_sql(size_filter, "deposits")
+        rows = self._fetchall("deposits.tire_sizes", self.TIRE_SIZES_QUERY.format(conditions=conditions),
+                              parameters, TireSize)
+        sizes = [format_tire_size(size) for size in rows]
+        if size_filter is None:
+            sizes += self._column("deposits.unparsed_tire_sizes", '''
+                SELECT DISTINCT tire_size FROM deposits
+                WHERE tire_width IS NULL AND tire_size IS NOT NULL AND tire_size != ''
+            ''')
+        return sizes
+
+    def create(self, client_id, car_model, registration_number, tire_brand, tire_size, quantity, location,
+               washing, conservation, status, season, expected_return_date, technical_condition,
+               storage_date, price):
+        with self.unit_of_work:
+            cursor = self._execute("deposits.create", self.INSERT_QUERY, (
+                client_id, car_model, registration_number, tire_brand, tire_size,
+                quantity, location, washing, conservation, _now(),
+                status, season, expected_return_date,
+                technical_condition, storage_date, price
+            ) + size_columns(tire_size))
+            self.unit_of_work.record(DepositChanged((cursor.lastrowid,)))
+            return cursor.lastrowid
+
+    def update(self, deposit_id, client_id, car_model, registration_number, tire_brand, tire_size, quantity,
+               location, washing, conservation, status, season, expected_return_date, technical_condition,
+               storage_date, price):
+        with self.unit_of_work:
+            self._execute("deposits.update", self.UPDATE_QUERY, (
+                client_id, car_model, registration_number, tire_brand, tire_size,
+                quantity, location, washing, conservation, status, season, expected_return_date,
+                technical_condition, storage_date, price
+            ) + size_columns(tire_size) + (deposit_id,))
+            self.unit_of_work.record(DepositChanged((deposit_id,)))
+
+    def import_row(self, client_id, car_model, registration_number, tire_brand, tire_size, quantity, location,
+                   washing, conservation, deposit_date, status, technical_condition, storage_date, price):
+        with self.unit_of_work:
+            cursor = self._execute("deposits.import_row", self.IMPORT_QUERY, (
+                client_id, car_model, registration_number, tire_brand, tire_size,
+                quantity, location, washing, conservation, deposit_date, status,
+                technical_condition, storage_date, price
+            ) + size_columns(tire_size))
+            self.unit_of_work.record(DepositChanged((cursor.lastrowid,)))
+
+    def mark_issued(self, deposit_id):
+        with self.unit_of_work:
+            self._execute("deposits.mark_issued",
+                          "UPDATE deposits SET status = 'Wydany', issue_date = ? WHERE id = ?", (_now(), deposit_id))
+            self.unit_of_work.record(DepositChanged((deposit_id,)))
+
+    def mark_active(self, deposit_id):
+        with self.unit_of_work:
+            self._execute("deposits.mark_active",
+                          "UPDATE deposits SET status = 'Aktywny', issue_date = NULL WHERE id = ?", (deposit_id,))
+            self.unit_of_work.record(DepositChanged((deposit_id,)))
+
+    def toggle_status(self, deposit_id):
+        """Przełącza status między 'Aktywny' a 'Wydany'. Zwraca nowy status albo None, gdy brak depozytu."""
+        with self.unit_of_work:
+            row = self._fetchone("deposits.get_status", "SELECT status FROM deposits WHERE id = ?", (deposit_id,))
+            if row is None:
+                return None
+            new_status = "Aktywny" if row[0] == "Wydany" else "Wydany"
+            self._execute("deposits.set_status", "UPDATE deposits SET status = ? WHERE id = ?", (new_status, deposit_id))
+            self.unit_of_work.record(DepositChanged((deposit_id,)))
+            return new_status
+
+    def delete(self, deposit_id):
+        with self.unit_of_work:
+            self._execute("deposits.delete", "DELETE FROM deposits WHERE id = ?", (deposit_id,))
+            self.unit_of_work.record(DepositChanged((deposit_id,)))
+
+    def export_rows(self):
+        return self._fetchall("deposits.export_rows", self.EXPORT_QUERY, (), ExportDepositRow)
+
+    def due_reminders(self, reminder, first_date, end_date):
+        """Depozyty z terminem odbioru od first_date do end_date (bez niego), bez przypomnienia `reminder`."""
+        return self._fetchall("deposits.due_reminders", REMINDER_DUE_QUERY, (first_date, end_date, reminder), ReminderRow)
+
+    def record_reminder(self, deposit_id, reminder, expected_return_date, outbox_id):
+        with self.unit_of_work:
+            self._execute("deposits.record_reminder", '''
+                INSERT OR IGNORE INTO deposit_reminders (deposit_id, reminder, expected_return_date, queued_at, outbox_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (deposit_id, reminder, expected_return_date, _now(), outbox_id))
+
+    def statistics(self):
+        active_count, issued_count, active_income = self.status_totals()
+        return DepositStatistics(active_count, issued_count, self.average_duration(), active_income)
+
+    # Statystyki czytają zestawienia deposit_rollups (database.ROLLUP_DIMENSIONS), nie całą tabelę
+    def status_totals(self):
+        """(liczba aktywnych, liczba wydanych, przychód z aktywnych) - niezależne od daty."""
+        active_count, issued_count, active_income = self._fetchone("deposits.status_totals", '''
+            SELECT SUM(CASE WHEN status = 'Aktywny' THEN deposit_count END),
+                   SUM(CASE WHEN status = 'Wydany' THEN deposit_count END),
+                   ROUND(SUM(CASE WHEN status = 'Aktywny' THEN price_sum END), 2)
+            FROM deposit_rollups
+            WHERE dimension = 'month'
+        ''')
+        return active_count or 0, issued_count or 0, active_income or 0
+
+    def average_duration(self):
+        """Średni czas trwania - zależy od dzisiejszej daty (aktywne depozyty)."""
+        return self._fetchone("deposits.avg_duration",
+                              f"SELECT {ROLLUP_AVERAGE_DURATION_SQL} FROM deposit_rollups WHERE dimension = 'month'")[0] or 0
+
+    def monthly_counts(self):
+        return self._fetchall("deposits.monthly_counts", '''
+            SELECT NULLIF(bucket, '') AS month, SUM(deposit_count) FROM deposit_rollups
+            WHERE dimension = 'month'
+            GROUP BY bucket
+            HAVING SUM(deposit_count) != 0
+            ORDER BY bucket
+        ''', (), MonthlyCount)
+
+    def rollup(self, dimension):
+        """Aktywne i wydane depozyty w podziale na sezon albo lokalizację ("season", "location")."""
+        return self._fetchall(f"deposits.rollup_{dimension}", '''
+            SELECT NULLIF(bucket, ''),
+                   SUM(CASE WHEN status = 'Aktywny' THEN deposit_count ELSE 0 END),
+                   SUM(CASE WHEN status = 'Wydany' THEN deposit_count ELSE 0 END),
+                   ROUND(SUM(CASE WHEN status = 'Aktywny' THEN price_sum ELSE 0 END), 2)
+            FROM deposit_rollups
+            WHERE dimension = ?
+            GROUP BY bucket
+            HAVING SUM(deposit_count) != 0
+            ORDER BY bucket
+        ''', (dimension,), RollupRow)
+
+    def history(self, deposit_id):
+        return self._fetchall("deposits.history", self.HISTORY_QUERY, (deposit_id,), HistoryRow)
+
+    def record_history(self, deposit_id, description, user="Użytkownik"):
+        with self.unit_of_work:
+            self._execute("deposits.record_history", '''
+                INSERT INTO history (deposit_id, change_date, user, description)
+                VALUES (?, ?, ?, ?)
+            ''', (deposit_id, _now(), user, description))
+
+
+class ClientRepository(BaseRepository):
+    """Klienci serwisu."""
+
+    SEARCH_FIELDS = ("name", "phone_number", "email", "barcode")
+
+    LIST_QUERY = '''
+        SELECT id, name, phone_number, email, additional_info, discount, barcode
+        FROM clients
+        WHERE name LIKE ?
+        ORDER BY name ASC
+    '''
+    SEARCH_QUERY = '''
+        SELECT clients.id, clients.name, clients.phone_number, clients.email,
+               clients.additional_info, clients.discount, clients.barcode
+        FROM clients_fts
+        INNER JOIN clients ON clients.id = clients_fts.rowid
+        WHERE clients_fts MATCH ?
+        ORDER BY clients_fts.rank
+    '''
+    GET_QUERY = '''
+        SELECT id, name, phone_number, email, additional_info, discount, barcode
+        FROM clients
+        WHERE id = ?
+    '''
+    BY_ID_QUERY = '''
+        SELECT clients.id, clients.name, clients.phone_number, clients.email,
+               clients.additional_info, clients.discount, clients.barcode
+        FROM json_each(?) AS changed
+        CROSS JOIN clients ON clients.id = changed.value
+    '''
+
+    def list(self, search_text=""):
+        phrase = fts_phrase(search_text)
+        if phrase:
+            return self._fetchall("clients.search", self.SEARCH_QUERY, (phrase,), ClientRow)
+        return self._fetchall("clients.list", self.LIST_QUERY, (f'%{search_text}%',), ClientRow)
+
+    def list_by_ids(self, ids):
+        """Aktualne wiersze listy klientów dla podanych ID (usuniętych klientów brak w wyniku)."""
+        return self._fetchall("clients.refresh", self.BY_ID_QUERY, (_id_list(ids),), ClientRow)
+
+    def get(self, client_id):
+        return self._fetchone("clients.get", self.GET_QUERY, (client_id,), ClientRow)
+
+    def _deposit_ids(self, client_id):
+        return self._column("clients.deposit_ids", "SELECT id FROM deposits WHERE client_id = ?", (client_id,))
+
+    def choices(self):
+        """Lista (id, nazwa) dla pól wyboru klienta."""
+        return self._fetchall("clients.choices", "SELECT id, name FROM clients")
+
+    def names(self):
+        return self._column("clients.names", "SELECT name FROM clients")
+
+    def find_by_barcode(self, barcode):
+        return self._fetchone("clients.find_by_barcode", "SELECT id, name, phone_number, email, additional_info, "
+                              "discount, barcode FROM clients WHERE barcode = ?", (barcode,), ClientRow)
+
+    def find_id_by_name(self, name):
+        row = self._fetchone("clients.find_id_by_name", "SELECT id FROM clients WHERE name = ?", (name,))
+        return row[0] if row else None
+
+    def phone_by_name(self, name):
+        row = self._fetchone("clients.phone_by_name", "SELECT phone_number FROM clients WHERE name = ?", (name,))
+        return row[0] if row else None
+
+    def get_or_create(self, name, phone_number=None, email=None):
+        """Zwraca ID klienta o podanej nazwie, dodając go, jeśli nie istnieje."""
+        with self.unit_of_work:
+            client_id = self.find_id_by_name(name)
+            if client_id is None:
+                cursor = self._execute("clients.create_minimal",
+                                       "INSERT INTO clients (name, phone_number, email) VALUES (?, ?, ?)",
+                                       (name, phone_number, email))
+                client_id = cursor.lastrowid
+                self.unit_of_work.record(ClientChanged((client_id,)))
+            return client_id
+
+    def save(self, client_id, name, phone_number, email, discount, additional_info, barcode):
+        """Dodaje (client_id=None) lub aktualizuje klienta. Zwraca ID klienta."""
+        with self.unit_of_work:
+            if client_id:
+                self._execute("clients.update", '''
+                    UPDATE clients
+                    SET name = ?, phone_number = ?, email = ?, discount = ?, additional_info = ?, barcode = ?
+                    WHERE id = ?
+                ''', (name, phone_number, email, discount, additional_info, barcode, client_id))
+                # Dane klienta są też w wierszach jego depozytów
+                self.unit_of_work.record(DepositChanged(self._deposit_ids(client_id)))
+            else:
+                cursor = self._execute("clients.create", '''
+                    INSERT INTO clients (name, phone_number, email, discount, additional_info, barcode)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (name, phone_number, email, discount, additional_info, barcode))
+                client_id = cursor.lastrowid
+            self.unit_of_work.record(ClientChanged((client_id,)))
+            return client_id
+
+    def set_barcode(self, client_id, barcode):
+        with self.unit_of_work:
+            self._execute("clients.set_barcode", "UPDATE clients SET barcode = ? WHERE id = ?", (barcode, client_id))
+            self.unit_of_work.record(ClientChanged((client_id,)))
+
+    def delete(self, client_id):
+        """Usuwa klienta razem z jego depozytami."""
+        with self.unit_of_work:
+            self.unit_of_work.record(DepositChanged(self._deposit_ids(client_id)))
+            self._execute("clients.delete_deposits", "DELETE FROM deposits WHERE client_id = ?", (client_id,))
+            self._execute("clients.delete", "DELETE FROM clients WHERE id = ?", (client_id,))
+            self.unit_of_work.record(ClientChanged((client_id,)))
+
+
+class OrderRepository(BaseRepository):
+    """Zamówienia klientów i ich pozycje."""
+
+    SEARCH_FIELDS = ("client_name", "status", "notes")
+
+    LIST_QUERY = '''
+        SELECT orders.id, clients.name, orders.order_date, orders.expected_delivery_date, orders.status, orders.notes
+        FROM orders
+        INNER JOIN clients ON orders.client_id = clients.id
+        WHERE clients.name LIKE ? OR orders.status LIKE ?
+        ORDER BY orders.order_date DESC
+    '''
+    SEARCH_QUERY = '''
+        SELECT orders.id, clients.name, orders.order_date, orders.expected_delivery_date, orders.status, orders.notes
+        FROM orders_fts
+        INNER JOIN orders ON orders.id = orders_fts.rowid
+        INNER JOIN clients ON orders.client_id = clients.id
+        WHERE orders_fts MATCH ?
+        ORDER BY orders_fts.rank
+    '''
+    GET_QUERY = '''
+        SELECT orders.id, orders.client_id, orders.order_date, orders.expected_delivery_date,
+               orders.status, orders.notes, clients.name, clients.phone_number, clients.email
+        FROM orders
+        LEFT JOIN clients ON orders.client_id = clients.id
+        WHERE orders.id = ?
+    '''
+    ITEMS_QUERY = '''
+        SELECT tire_brand, tire_size, price, quantity
+        FROM order_items WHERE order_id = ?
+    '''
+    BY_ID_QUERY = '''
+        SELECT orders.id, clients.name, orders.order_date, orders.expected_delivery_date, orders.status, orders.notes
+        FROM json_each(?) AS changed
+        CROSS JOIN orders ON orders.id = changed.value
+        INNER JOIN clients ON orders.client_id = clients.id
+    '''
+
+    def list(self, search_text=""):
+        phrase = fts_phrase(search_text)
+        if phrase:
+            return self._fetchall("orders.search", self.SEARCH_QUERY, (phrase,), OrderRow)
+        pattern = f'%{search_text}%'
+        return self._fetchall("orders.list", self.LIST_QUERY, (pattern, pattern), OrderRow)
+
+    def list_by_ids(self, ids):
+        """Aktualne wiersze listy zamówień dla podanych ID (usuniętych zamówień brak w wyniku)."""
+        return self._fetchall("orders.refresh", self.BY_ID_QUERY, (_id_list(ids),), OrderRow)
+
+    def list_page(self, after=None, limit=PAGE_SIZE):
+        """Strona zamówień (od najnowszych) za pozycją after z page_key()."""
+        return self._page("orders.page", ORDERS_PAGE_QUERY, ORDERS_UNDATED_PAGE_QUERY, after, limit, OrderRow)
+
+    @staticmethod
+    def page_key(row):
+        """Pozycja wiersza na liście zamówień: większa wartość - wyżej na liście."""
+        return (row.order_date is not None, row.order_date or "", row.id)
+
+    def get(self, order_id):
+        return self._fetchone("orders.get", self.GET_QUERY, (order_id,), OrderDetails)
+
+    def items(self, order_id):
+        return self._fetchall("orders.items", self.ITEMS_QUERY, (order_id,), OrderItemRow)
+
+    def save(self, order_id, client_id, order_date, expected_delivery_date, status, notes, items):
+        """Zapisuje zamówienie i zastępuje jego pozycje (lista krotek: marka, rozmiar, cena, ilość)."""
+        with self.unit_of_work:
+            if order_id:
+                self._execute("orders.update", '''
+                    UPDATE orders
+                    SET client_id = ?, order_date = ?, expected_delivery_date = ?, status = ?, notes = ?
+                    WHERE id = ?
+                ''', (client_id, order_date, expected_delivery_date, status, notes, order_id))
+            else:
+                cursor = self._execute("orders.create", '''
+                    INSERT INTO orders (client_id, order_date, expected_delivery_date, status, notes)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (client_id, order_date, expected_delivery_date, status, notes))
+                order_id = cursor.lastrowid
+
+            self._execute("orders.delete_items", "DELETE FROM order_items WHERE order_id = ?", (order_id,))
+            for tire_brand, tire_size, price, quantity in items:
+                self._execute("orders.add_item", '''
+                    INSERT INTO order_items (
+                        order_id, tire_brand, tire_size, price, quantity,
+                        tire_width, tire_aspect_ratio, tire_construction, tire_rim_diameter
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (order_id, tire_brand, tire_size, price, quantity) + size_columns(tire_size))
+            self.unit_of_work.record(OrderChanged((order_id,)))
+            return order_id
+
+    def delete(self, order_id):
+        with self.unit_of_work:
+            self._execute("orders.delete_items", "DELETE FROM order_items WHERE order_id = ?", (order_id,))
+            self._execute("orders.delete", "DELETE FROM orders WHERE id = ?", (order_id,))
+            self.unit_of_work.record(OrderChanged((order_id,)))
+
+
+class InventoryRepository(BaseRepository):
+    """Opony na stanie."""
+
+    COLUMNS = "id, brand_model, size, quantity, price, dot, notes, season_type"
+    SEARCH_FIELDS = ("brand_model", "size", "dot")
+
+    def _special_search(self, search_text):
+        return parse_size_filter(search_text) is not None
+
+    def list(self, search_text=""):
+        """Opony na stanie; tekst w postaci rozmiaru ("205/55R16", "R16 195-215") filtruje po rozmiarze."""
+        size_filter = parse_size_filter(search_text)
+        if size_filter:
+            return self.find_by_size(size_filter)
+        phrase = fts_phrase(search_text)
+        if phrase:
+            return self._fetchall("inventory.search", '''
+                SELECT inventory.id, inventory.brand_model, inventory.size, inventory.quantity,
+                       inventory.price, inventory.dot, inventory.notes, inventory.season_type
+                FROM inventory_fts
+                INNER JOIN inventory ON inventory.id = inventory_fts.rowid
+                WHERE inventory_fts MATCH ?
+                ORDER BY inventory_fts.rank
+            ''', (phrase,), InventoryRow)
+        if search_text:
+            pattern = f'%{search_text}%'
+            return self._fetchall("inventory.search_short", f'''
+                SELECT {self.COLUMNS}
+                FROM inventory
+                WHERE brand_model LIKE ? OR size LIKE ? OR dot LIKE ?
+            ''', (pattern, pattern, pattern), InventoryRow)
+        return self._fetchall("inventory.list", f"SELECT {self.COLUMNS} FROM inventory", (), InventoryRow)
+
+    def find_by_size(self, size_filter):
+        """Opony na stanie pasujące do SizeFilter, uporządkowane według rozmiaru."""
+        conditions, parameters = size_filter_sql(size_filter, "inventory")
+        return self._fetchall("inventory.find_by_size", f'''
+            SELECT {self.COLUMNS}
+            FROM inventory
+            WHERE {conditions}
+            ORDER BY tire_rim_diameter, tire_width, tire_aspect_ratio
+        ''', parameters, InventoryRow)
+
+    def get(self, inventory_id):
+        return self._fetchone("inventory.get", f"SELECT {self.COLUMNS} FROM inventory WHERE id = ?",
+                              (inventory_id,), InventoryRow)
+
+    def save(self, inventory_id, brand_model, size, quantity, price, dot, notes, season_type):
+        with self.unit_of_work:
+            if inventory_id:
+                self._execute("inventory.update", '''
+                    UPDATE inventory
+                    SET brand_model = ?, size = ?, quantity = ?, price = ?, dot = ?, notes = ?, season_type = ?,
+                        tire_width = ?, tire_aspect_ratio = ?, tire_construction = ?, tire_rim_diameter = ?
+                    WHERE id = ?
+                ''', (brand_model, size, quantity, price, dot, notes, season_type) + size_columns(size) + (inventory_id,))
+            else:
+                cursor = self._execute("inventory.create", '''
+                    INSERT INTO inventory (
+                        brand_model, size, quantity, price, dot, notes, season_type,
+                        tire_width, tire_aspect_ratio, tire_construction, tire_rim_diameter
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (brand_model, size, quantity, price, dot, notes, season_type) + size_columns(size))
+                inventory_id = cursor.lastrowid
+            self.unit_of_work.record(InventoryChanged((inventory_id,)))
+            return inventory_id
+
+    def delete(self, inventory_id):
+        with self.unit_of_work:
+            self._execute("inventory.delete", "DELETE FROM inventory WHERE id = ?", (inventory_id,))
+            self.unit_of_work.record(InventoryChanged((inventory_id,)))
+
+
+class SettingsRepository(BaseRepository):
+    """Ustawienia aplikacji, lokalizacje magazynowe i widoczność kolumn."""
+
+    def all(self):
+        return dict(self._fetchall("settings.all", "SELECT key, value FROM settings"))
+
+    def get(self, key, default=None):
+        row = self._fetchone("settings.get", "SELECT value FROM settings WHERE key = ?", (key,))
+        return row[0] if row else default
+
+    def save(self, values):
+        with self.unit_of_work:
+            for key, value in values.items():
+                self._execute("settings.save", '''
+                    INSERT INTO settings (key, value)
+                    VALUES (?, ?)
+                    ON CONFLICT(key) DO UPDATE SET value=excluded.value
+                ''', (key, value))
+
+    def column_visibility(self, tab_name):
+        """Lista (indeks kolumny, widoczna) zapisana dla zakładki."""
+        return self._fetchall("settings.column_visibility",
+                              "SELECT column_index, visible FROM column_settings WHERE tab_name = ?", (tab_name,))
+
+    def has_column_settings(self):
+        return self._fetchone("settings.count_columns", "SELECT COUNT(*) FROM column_settings")[0] > 0
+
+    def save_column_visibility(self, tab_name, columns):
+        """Zastępuje ustawienia kolumn zakładki listą (indeks kolumny, widoczna)."""
+        with self.unit_of_work:
+            self._execute("settings.delete_columns", "DELETE FROM column_settings WHERE tab_name = ?", (tab_name,))
+            for column_index, visible in columns:
+                self._execute("settings.add_column",
+                              "INSERT INTO column_settings (tab_name, column_index, visible) VALUES (?, ?, ?)",
+                              (tab_name, column_index, visible))
+
+    def location_names(self):
+        return self._column("settings.location_names", "SELECT name FROM locations ORDER BY name")
+
+    def add_location(self, name):
+        with self.unit_of_work:
+            self._execute("settings.add_location", "INSERT INTO locations (name) VALUES (?)", (name,))
+
+    def rename_location(self, old_name, new_name):
+        with self.unit_of_work:
+            self._execute("settings.rename_location", "UPDATE locations SET name = ? WHERE name = ?", (new_name, old_name))
+
+    def delete_location(self, name):
+        with self.unit_of_work:
+            self._execute("settings.delete_location", "DELETE FROM locations WHERE name = ?", (name,))
+
+    def set_default_location(self, name):
+        with self.unit_of_work:
+            self._execute("settings.clear_default_location", "UPDATE locations SET is_default = 0")
+            self._execute("settings.set_default_location", "UPDATE locations SET is_default = 1 WHERE name = ?", (name,))
+
+
+class EmailRepository(BaseRepository):
+    """Szablony wiadomości, kolejka wysyłki (email_outbox) i historia wysłanych e-maili."""
+
+    def template_names(self):
+        return self._column("emails.template_names", "SELECT name FROM email_templates")
+
+    def get_template(self, name):
+        return self._fetchone("emails.get_template", "SELECT name, subject, body FROM email_templates WHERE name = ?",
+                              (name,), EmailTemplate)
+
+    def save_template(self, name, subject, body):
+        with self.unit_of_work:
+            self._execute("emails.save_template", '''
+                INSERT INTO email_templates (name, subject, body)
+                VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET subject=excluded.subject, body=excluded.body
+            ''', (name, subject, body))
+
+    def delete_template(self, name):
+        with self.unit_of_work:
+            self._execute("emails.delete_template", "DELETE FROM email_templates WHERE name = ?", (name,))
+
+    def history(self):
+        return self._fetchall("emails.history", '''
+            SELECT sent_date, to_address, subject, body
+            FROM email_history
+            ORDER BY sent_date DESC
+        ''', (), EmailHistoryRow)
+
+    def record_sent(self, to_address, subject, body):
+        with self.unit_of_work:
+            self._execute("emails.record_sent", '''
+                INSERT INTO email_history (to_address, subject, body, sent_date)
+                VALUES (?, ?, ?, ?)
+            ''', (to_address, subject, body, _now()))
+
+    def enqueue(self, to_address, subject, body):
+        """Dopisuje wiadomość do kolejki wysyłki - w transakcji bieżącej akcji, jeśli trwa. Zwraca ID."""
+        now = _now()
+        with self.unit_of_work:
+            return self._execute("emails.enqueue", '''
+                INSERT INTO email_outbox (to_address, subject, body, next_attempt_at, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (to_address, subject, body, now, now)).lastrowid
+
+    def claim_due(self, now, lease_until, limit):
+        """
+        Zajmuje najwyżej `limit` najstarszych wiadomości do wysłania: przesuwa ich termin na lease_until,
+        więc druga instancja programu nie wyśle ich równolegle. Zwraca [OutboxRow].
+        """
+        with self.unit_of_work:
+            rows = self._fetchall("emails.outbox_due", OUTBOX_DUE_QUERY, (now, limit), OutboxRow)
+            if rows:
+                self._execute("emails.outbox_claim", '''
+                    UPDATE email_outbox SET next_attempt_at = ? WHERE id IN (SELECT value FROM json_each(?))
+                ''', (lease_until, _id_list(row.id for row in rows)))
+        return rows
+
+    def next_attempt(self):
+        """Najbliższy termin próby wysłania z kolejki (None - kolejka pusta)."""
+        return self._fetchone("emails.outbox_next",
+                              "SELECT MIN(next_attempt_at) FROM email_outbox WHERE status = 'Oczekuje'")[0]
+
+    def mark_sent(self, outbox_id, sent_at):
+        """Wysłana wiadomość kolejki - razem z wpisem do historii e-maili."""
+        with self.unit_of_work:
+            self._execute("emails.outbox_sent", '''
+                UPDATE email_outbox SET status = 'Wysłany', attempts = attempts + 1, sent_at = ?, last_error = NULL
+                WHERE id = ?
+            ''', (sent_at, outbox_id))
+            self._execute("emails.outbox_history", '''
+                INSERT INTO email_history (to_address, subject, body, sent_date)
+                SELECT to_address, subject, body, ? FROM email_outbox WHERE id = ?
+            ''', (sent_at, outbox_id))
+
+    def mark_failed(self, outbox_id, next_attempt_at, error, final=False):
+        """Nieudana próba: kolejna o next_attempt_at, a po ostatniej (final) - status 'Nieudany'."""
+        with self.unit_of_work:
+            self._execute("emails.outbox_failed", '''
+                UPDATE email_outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ?,
+                       status = CASE WHEN ? THEN 'Nieudany' ELSE status END
+                WHERE id = ?
+            ''', (next_attempt_at, error, final, outbox_id))
+
+    def release(self, outbox_ids, next_attempt_at, error):
+        """Zwraca niewysłane wiadomości do kolejki bez liczenia próby (serwer nieosiągalny, nie odrzucona wiadomość)."""
+        with self.unit_of_work:
+            self._execute("emails.outbox_release", '''
+                UPDATE email_outbox SET next_attempt_at = ?, last_error = ?
+                WHERE id IN (SELECT value FROM json_each(?))
+            ''', (next_attempt_at, error, _id_list(outbox_ids)))
+
+    def outbox_counts(self):
+        """Liczba wiadomości kolejki według statusu {status: liczba}."""
+        return dict(self._fetchall("emails.outbox_counts", "SELECT status, COUNT(*) FROM email_outbox GROUP BY status"))
+
+
+class JobRepository(BaseRepository):
+    """Terminy zadań harmonogramu i blokada zapobiegająca dwóm równoczesnym wykonaniom."""
+
+    def register(self, name, next_run):
+        """Dopisuje zadanie z pierwszym terminem; istniejącego nie zmienia."""
+        with self.unit_of_work:
+            self._execute("jobs.register", "INSERT OR IGNORE INTO scheduled_jobs (name, next_run) VALUES (?, ?)",
+                          (name, next_run))
+
+    def next_runs(self):
+        return dict(self._fetchall("jobs.next_runs", "SELECT name, next_run FROM scheduled_jobs"))
+
+    def claim(self, name, now, stale_before):
+        """
+        Zajmuje zadanie, jeśli wciąż jest do wykonania i nikt go nie wykonuje (blokada starsza
+        niż stale_before pochodzi z przerwanego wykonania). Zwraca True, gdy zadanie zostało zajęte.
+        """
+        with self.unit_of_work:
+            return self._execute("jobs.claim", '''
+                UPDATE scheduled_jobs SET running_since = ?
+                WHERE name = ? AND next_run <= ? AND (running_since IS NULL OR running_since < ?)
+            ''', (now, name, now, stale_before)).rowcount == 1
+
+    def finish(self, name, started, next_run, error=None):
+        with self.unit_of_work:
+            self._execute("jobs.finish", '''
+                UPDATE scheduled_jobs SET last_run = ?, next_run = ?, running_since = NULL, last_error = ?
+                WHERE name = ?
+            ''', (started, next_run, error, name))
+
+
+class AnalyticsRepository(BaseRepository):
+    """Analizy zakładki "Analizy": stan magazynu, ruch w szczycie sezonu, czas przechowania, przychód."""
+
+    def occupancy(self, months=12):
+        """Liczba przechowywanych depozytów na koniec każdego z ostatnich `months` miesięcy, w lokalizacjach."""
+        return self._fetchall("analytics.occupancy", OCCUPANCY_QUERY, (f"-{months - 1} months",), OccupancyRow)
+
+    def throughput(self, start, end):
+        """Przyjęcia i wydania w dniach od start do end (bez end, daty 'RRRR-MM-DD') ze średnią z 7 dni."""
+        return self._fetchall("analytics.throughput", THROUGHPUT_QUERY, (start, end), ThroughputRow)
+
+    def dwell_by_season(self, years=2):
+        """Czas przechowania depozytów wydanych w ostatnich `years` latach, w sezonach."""
+        return self._fetchall("analytics.dwell", DWELL_QUERY, (f"-{years} years",), DwellRow)
+
+    def revenue_by_month(self, months=12):
+        return self._fetchall("analytics.revenue", REVENUE_QUERY, (f"-{months - 1} months",), RevenueRow)
+
+
+class StatisticsCache:
+    """
+    Wyniki zakładki statystyk zapamiętane razem z wersjami tabel (ChangeTracker), z których je policzono.
+    Każda część jest liczona od nowa tylko po zapisie do swoich tabel (albo po zmianie daty, jeśli od
+    niej zależy), więc bez zmian w bazie odczyt statystyk nie wykonuje żadnego agregatu.
+    Liczniki: counters() - (część, z pamięci, przeliczeń, łączny czas przeliczeń [ms]).
+    """
+
+    # Nazwa w QueryStats: "<PREFIX>.<część>"
+    PREFIX = "statistics"
+
+    # Część -> (tabele, czy zależy od dzisiejszej daty, funkcja(źródło, *argumenty))
+    PARTS = {
+        "totals": (("deposits",), False, lambda deposits: deposits.status_totals()),
+        "avg_duration": (("deposits",), True, lambda deposits: deposits.average_duration()),
+        "monthly_counts": (("deposits",), False, lambda deposits: deposits.monthly_counts()),
+        "by_season": (("deposits",), False, lambda deposits: deposits.rollup("season")),
+        "by_location": (("deposits",), False, lambda deposits: deposits.rollup("location")),
+    }
+
+    def __init__(self, source, changes, stats):
+        self.source = source
+        self.changes = changes
+        self.stats = stats
+        self._values = {}  # (część, *argumenty) -> (wersje tabel, data, wartość)
+        self._counters = {name: [0, 0, 0.0] for name in self.PARTS}
+
+    def get(self, name, *args):
+        tables, date_dependent, compute = self.PARTS[name]
+        key = (name,) + args
+        # Wersje sprzed obliczenia - zapis w trakcie liczenia unieważni wynik przy następnym odczycie
+        versions = self.changes.snapshot(tables)
+        today = datetime.now(timezone.utc).date() if date_dependent else None
+        cached = self._values.get(key)
+        counters = self._counters[name]
+        if cached is not None and cached[:2] == (versions, today):
+            counters[0] += 1
+            return cached[2]
+        started = time.perf_counter()
+        value = compute(self.source, *args)
+        elapsed = time.perf_counter() - started
+        self.stats.record(f"{self.PREFIX}.{name}", elapsed)
+        counters[1] += 1
+        counters[2] += elapsed
+        self._values[key] = (versions, today, value)
+        return value
+
+    def summary(self):
+        """(DepositStatistics, liczby depozytów w miesiącach, podział na sezony, podział na lokalizacje)."""
+        active_count, issued_count, active_income = self.get("totals")
+        statistics = DepositStatistics(active_count, issued_count, self.get("avg_duration"), active_income)
+        return statistics, self.get("monthly_counts"), self.get("by_season"), self.get("by_location")
+
+    def counters(self):
+        return [(name, hits, misses, total * 1000) for name, (hits, misses, total) in self._counters.items()]
+
+
+class AnalyticsCache(StatisticsCache):
+    """Wyniki zakładki analiz (AnalyticsRepository) zapamiętane jak statystyki - według wersji tabel i daty."""
+
+    PREFIX = "analytics"
+
+    # Ruch w podanym okresie nie zależy od dzisiejszej daty, pozostałe okresy liczone są wstecz od dziś
+    PARTS = {
+        "occupancy": (("deposits",), True, lambda analytics: analytics.occupancy()),
+        "throughput": (("deposits",), False, lambda analytics, start, end: analytics.throughput(start, end)),
+        "dwell": (("deposits",), True, lambda analytics: analytics.dwell_by_season()),
+        "revenue": (("deposits",), True, lambda analytics: analytics.revenue_by_month()),
+    }
+
+    def dashboard(self, start, end):
+        """(stan magazynu, ruch w okresie [start, end), czas przechowania w sezonach, przychód w miesiącach)."""
+        return self.get("occupancy"), self.get("throughput", start, end), self.get("dwell"), self.get("revenue")
+
+
+class Repositories:
+    """Jedno połączenie z bazą danych i komplet repozytoriów korzystających z niego."""
+
+    def __init__(self, conn, profile=DEFAULT_PROFILE, events=None):
+        self.conn = conn
+        self.profile = profile
+        self.stats = QueryStats()
+        self.events = events if events is not None else EventBus()
+        self.unit_of_work = UnitOfWork(conn, self.events)
+        self.changes = ChangeTracker(conn)
+        self.deposits = DepositRepository(conn, self.stats, self.unit_of_work)
+        self.clients = ClientRepository(conn, self.stats, self.unit_of_work)
+        self.orders = OrderRepository(conn, self.stats, self.unit_of_work)
+        self.inventory = InventoryRepository(conn, self.stats, self.unit_of_work)
+        self.settings = SettingsRepository(conn, self.stats, self.unit_of_work)
+        self.emails = EmailRepository(conn, self.stats, self.unit_of_work)
+        self.jobs = JobRepository(conn, self.stats, self.unit_of_work)
+        self.analytics = AnalyticsRepository(conn, self.stats, self.unit_of_work)
+        self.statistics = StatisticsCache(self.deposits, self.changes, self.stats)
+        self.dashboard = AnalyticsCache(self.analytics, self.changes, self.stats)
+
+    @classmethod
+    def open(cls, db_path, profile=DEFAULT_PROFILE, cached_statements=STATEMENT_CACHE_SIZE):
+        """Otwiera połączenie z profilem silnika i pamięcią przygotowanych zapytań."""
+        return cls(open_connection(db_path, profile, cached_statements=cached_statements), profile)
+
+    def bulk_import(self):
+        """Kontekst importu masowego: profil 'bulk-import', po wyjściu powrót do profilu połączenia."""
+        return temporary_profile(self.conn, "bulk-import", self.profile)
+
+    def transaction(self):
+        """Jednostka pracy dla akcji użytkownika: `with repos.transaction(): ...` - jeden commit na całość."""
+        return self.unit_of_work
+
+    def backup(self, backup_path):
+        return backup_database(self.conn, backup_path)
+
+    def optimize(self):
+        optimize_database(self.conn)
+
+    def ensure_plate_index(self):
+        """Ponawia utworzenie indeksu unikalnego aktywnych numerów; zwraca blokujące go duplikaty."""
+        duplicates = ensure_plate_index(self.conn)
+        for plate_key, season, count in duplicates:
+            logger.warning(f"Zdublowany aktywny depozyt: {plate_key} ({season}) - {count} wpisy.")
+        return duplicates
+
+    def check_rollups(self, repair=False):
+        """Sprawdza zestawienia statystyk z tabelą deposits; repair=True przelicza je przy rozbieżności."""
+        problems = check_rollups(self.conn)
+        for problem in problems:
+            logger.warning(f"Rozbieżność zestawienia statystyk: {problem}")
+        if problems and repair:
+            rebuild_rollups(self.conn)
+            logger.info("Przeliczono zestawienia statystyk od nowa.")
+        return problems
+
+    def restore(self, backup_path):
+        """Nadpisuje bazę zawartością kopii zapasowej (przez API backup, bezpieczne w trybie WAL)."""
+        versions = dict(self.conn.execute("SELECT table_name, version FROM table_versions"))
+        source = sqlite3.connect(backup_path)
+        try:
+            source.backup(self.conn)
+        finally:
+            source.close()
+        # Kopia może pochodzić ze starszej wersji programu
+        migrate(self.conn)
+        # Liczniki zapisów nie mogą wrócić do wartości sprzed kopii - zapamiętane wyniki uznałyby je za aktualne
+        with self.unit_of_work:
+            for table, version in versions.items():
+                self.conn.execute("UPDATE table_versions SET version = MAX(version, ?) + 1 WHERE table_name = ?",
+                                  (version, table))
+        # Zmieniło się wszystko - subskrybenci przeładowują całe tabele
+        for event_type in (DepositChanged, ClientChanged, OrderChanged, InventoryChanged):
+            self.events.publish(event_type(None))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,205 @@
+# scheduler.py
+#
+# Harmonogram zadań okresowych (przypomnienia, kopia zapasowa, konserwacja bazy, zmiana dnia).
+# Terminy są zapisane w tabeli scheduled_jobs (last_run/next_run), więc zadanie przegapione
+# przy zamkniętym programie wykonuje się w tle zaraz po starcie. Każde wykonanie działa we
+# własnym wątku z własnym połączeniem i zajmuje zadanie blokadą running_since - to samo zadanie
+# nie wykona się dwa razy naraz, także gdy bazę otworzyła druga instancja programu.
+
+import logging
+import traceback
+from collections import namedtuple
+from datetime import datetime, time, timedelta, timezone
+
+from PySide6.QtCore import QObject, QThread, QTimer, Signal
+
+from repositories import Repositories
+
+logger = logging.getLogger("TireDepositManager")
+
+# work(repos) wykonuje się w wątku zadania, on_done(wynik) - w wątku interfejsu po udanym wykonaniu
+Job = namedtuple("Job", ["name", "description", "schedule", "work", "on_done"], defaults=(None,))
+
+# Najdłuższa przerwa między sprawdzeniami terminów (uśpienie komputera, zmiana zegara)
+CHECK_INTERVAL_MS = 60 * 1000
+
+# Blokada starsza niż ten czas pochodzi z wykonania przerwanego zamknięciem programu
+STALE_RUN = timedelta(hours=1)
+
+# Po błędzie zadanie jest ponawiane po tym czasie (najpóźniej w zwykłym kolejnym terminie)
+FAILED_RETRY = timedelta(minutes=30)
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def daily(hour, minute=0):
+    """Termin codziennie o podanej godzinie (czas lokalny)."""
+    def next_run(after):
+        candidate = datetime.combine(after.date(), time(hour, minute))
+        return candidate if candidate > after else candidate + timedelta(days=1)
+    return next_run
+
+
+def weekly(weekday, hour, minute=0):
+    """Termin raz w tygodniu (weekday: 0 - poniedziałek) o podanej godzinie."""
+    def next_run(after):
+        candidate = datetime.combine(after.date() + timedelta(days=(weekday - after.weekday()) % 7), time(hour, minute))
+        return candidate if candidate > after else candidate + timedelta(days=7)
+    return next_run
+
+
+def utc_midnight(after):
+    """Najbliższa północ UTC w czasie lokalnym - wtedy zmienia się DATE('now') w zapytaniach SQLite."""
+    tomorrow = after.astimezone(timezone.utc).date() + timedelta(days=1)
+    return datetime.combine(tomorrow, time(), timezone.utc).astimezone().replace(tzinfo=None)
+
+
+class JobRunner(QThread):
+    """Jedno wykonanie zadania: zajęcie w bazie, work(repos), zapis następnego terminu."""
+
+    job_done = Signal(str, object)  # nazwa zadania, wynik
+    job_skipped = Signal(str)  # zadanie wykonane albo wykonywane przez inną instancję
+    job_failed = Signal(str, str)  # nazwa zadania, opis błędu
+    event_published = Signal(object)  # zdarzenie domenowe po commicie w wątku zadania
+
+    def __init__(self, db_path, profile, job, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.profile = profile
+        self.job = job
+
+    def run(self):
+        job = self.job
+        try:
+            repos = Repositories.open(self.db_path, self.profile)
+        except Exception as e:
+            logger.error(f"Zadanie {job.name}: nie można otworzyć bazy danych: {e}")
+            self.job_failed.emit(job.name, traceback.format_exc())
+            return
+        repos.events.subscribe(None, self.event_published.emit)
+        try:
+            started = datetime.now()
+            now = started.strftime(TIME_FORMAT)
+            if not repos.jobs.claim(job.name, now, (started - STALE_RUN).strftime(TIME_FORMAT)):
+                self.job_skipped.emit(job.name)
+                return
+            logger.info(f"Uruchomiono zadanie: {job.description}")
+            error = None
+            result = None
+            try:
+                result = job.work(repos)
+            except Exception as e:
+                if repos.conn.in_transaction:
+                    repos.conn.rollback()
+                error = str(e)
+                logger.error(f"Błąd zadania {job.name}: {e}")
+                error_code = traceback.format_exc()
+            next_run = job.schedule(datetime.now())
+            if error is not None:
+                # Po błędzie ponowienie po FAILED_RETRY - bez ponawiania w pętli
+                next_run = min(next_run, datetime.now() + FAILED_RETRY)
+            repos.jobs.finish(job.name, now, next_run.strftime(TIME_FORMAT), error)
+            if error is None:
+                self.job_done.emit(job.name, result)
+            else:
+                self.job_failed.emit(job.name, error_code)
+        except Exception as e:
+            logger.error(f"Błąd harmonogramu przy zadaniu {job.name}: {e}")
+            self.job_failed.emit(job.name, traceback.format_exc())
+        finally:
+            repos.close()
+
+
+class JobScheduler(QObject):
+    """
+    Uruchamia zadania Job w terminach zapisanych w bazie; repos (połączenie okna) służy tylko
+    do odczytu terminów, zadania działają we własnych wątkach (db_path, profile).
+    Zdarzenia z zapisów zadań trafiają na szynę events, jeśli została podana.
+    """
+
+    job_failed = Signal(str, str)  # nazwa zadania, opis błędu
+
+    def __init__(self, repos, db_path, profile, jobs, events=None, parent=None):
+        super().__init__(parent)
+        self.repos = repos
+        self.db_path = db_path
+        self.profile = profile
+        self.jobs = {job.name: job for job in jobs}
+        self.events = events
+        self._next_runs = {}
+        self._runners = {}  # nazwa -> JobRunner trwającego wykonania
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.run_due_jobs)
+
+    def start(self):
+        """Zapisuje nowe zadania i od razu uruchamia zaległe (przegapione przy zamkniętym programie)."""
+        now = datetime.now()
+        for job in self.jobs.values():
+            self.repos.jobs.register(job.name, job.schedule(now).strftime(TIME_FORMAT))
+        self._next_runs = self.repos.jobs.next_runs()
+        self.run_due_jobs()
+
+    def run_due_jobs(self):
+        now = datetime.now().strftime(TIME_FORMAT)
+        for name, job in self.jobs.items():
+            if name not in self._runners and self._next_runs.get(name, now) <= now:
+                self._start_job(job)
+        self._schedule_check()
+
+    def shutdown(self, timeout_ms=30000):
+        """Zatrzymuje harmonogram; trwające zadania mają chwilę na zakończenie (przerwane zwolni blokada STALE_RUN)."""
+        self.timer.stop()
+        for name, runner in list(self._runners.items()):
+            if not runner.wait(timeout_ms):
+                logger.warning(f"Zadanie {name} nie zakończyło się przed zamknięciem programu.")
+
+    def _start_job(self, job):
+        runner = JobRunner(self.db_path, self.profile, job, self)
+        runner.job_done.connect(self._on_done)
+        runner.job_skipped.connect(self._on_skipped)
+        runner.job_failed.connect(self._on_failed)
+        if self.events is not None:
+            runner.event_published.connect(self.events.publish)
+        runner.finished.connect(runner.deleteLater)
+        self._runners[job.name] = runner
+        runner.start()
+
+    def _schedule_check(self):
+        # Trwające zadania nie przyspieszają sprawdzeń - ich nowy termin przyjdzie z _on_finished
+        waiting = [next_run for name, next_run in self._next_runs.items() if name in self.jobs and name not in self._runners]
+        delay_ms = CHECK_INTERVAL_MS
+        if waiting:
+            delay = datetime.strptime(min(waiting), TIME_FORMAT) - datetime.now()
+            delay_ms = min(int(delay.total_seconds() * 1000) + 1000, CHECK_INTERVAL_MS)
+        self.timer.start(max(1000, delay_ms))
+
+    def _on_finished(self, name):
+        self._runners.pop(name, None)
+        try:
+            # Termin zapisany przez zadanie (albo przez inną instancję, która je wykonała)
+            self._next_runs = self.repos.jobs.next_runs()
+        except Exception as e:
+            logger.error(f"Błąd odczytu terminów zadań: {e}")
+        self._schedule_check()
+
+    def _on_skipped(self, name):
+        self._on_finished(name)
+        # Zadanie zajęte przez inną instancję - ponowna próba najwcześniej przy kolejnym zwykłym sprawdzeniu
+        retry = (datetime.now() + timedelta(milliseconds=CHECK_INTERVAL_MS)).strftime(TIME_FORMAT)
+        if self._next_runs.get(name, retry) < retry:
+            self._next_runs[name] = retry
+            self._schedule_check()
+
+    def _on_done(self, name, result):
+        self._on_finished(name)
+        job = self.jobs[name]
+        if job.on_done is not None:
+            try:
+                job.on_done(result)
+            except Exception as e:
+                logger.error(f"Błąd po wykonaniu zadania {name}: {e}")
+
+    def _on_failed(self, name, error_code):
+        self._on_finished(name)
+        self.job_failed.emit(name, error_code)
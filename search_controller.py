@@ -0,0 +1,180 @@
+# search_controller.py
+#
+# Obsługa pasków wyszukiwania zakładek. Zapytanie rusza dopiero po przerwie w pisaniu,
+# zapytanie dla starszego tekstu jest anulowane, a gdy nowy tekst rozszerza poprzedni,
+# już pobrany wynik jest zawężany w pamięci (repozytorium.narrow) zamiast pytać bazę.
+# Po zmianie kilku rekordów refresh(ids) pobiera tylko ich wiersze zamiast całej listy.
+# Lista bez tekstu wyszukiwania może być stronicowana kluczem: next_page() dociąga kolejną stronę.
+
+from PySide6.QtCore import QObject, QTimer
+
+from repositories import PAGE_SIZE
+
+# Przerwa w pisaniu [ms], po której wykonywane jest wyszukiwanie
+SEARCH_DELAY_MS = 250
+
+# Przy większej liczbie zmienionych rekordów (np. import) taniej jest przeładować całą listę
+REFRESH_LIMIT = 500
+
+
+class SearchController(QObject):
+    """
+    Pasek wyszukiwania jednej zakładki.
+
+    repository(repos) wskazuje repozytorium zakładki, query(repozytorium, tekst) zwraca
+    wiersze; wyniki trafiają paczkami do on_batch(wiersze, pierwsza) przez QueryExecutor.
+    Opcjonalnie rows_by_ids(repozytorium, ids) zwraca aktualne wiersze wybranych rekordów,
+    a on_update(ids, wiersze) nanosi je na tabelę - bez nich refresh() przeładowuje listę.
+
+    Stronicowanie pustego wyszukiwania: page_query(repozytorium, pozycja, limit) zwraca stronę
+    za pozycją page_key(ostatni wiersz), a on_page(wiersze, są_kolejne, pierwsza) ją wyświetla.
+    """
+
+    def __init__(self, line_edit, executor, key, repository, query, on_batch, on_done=None, on_error=None,
+                 rows_by_ids=None, on_update=None, page_query=None, page_key=None, on_page=None,
+                 page_size=PAGE_SIZE, delay=SEARCH_DELAY_MS, parent=None):
+        super().__init__(parent)
+        self.line_edit = line_edit
+        self.executor = executor
+        self.key = key
+        self.repository = repository
+        self.query = query
+        self.on_batch = on_batch
+        self.on_done = on_done
+        self.on_error = on_error
+        self.rows_by_ids = rows_by_ids
+        self.on_update = on_update
+        self.page_query = page_query
+        self.page_key = page_key
+        self.on_page = on_page
+        self.page_size = page_size
+        self._after = None  # pozycja ostatniego wczytanego wiersza listy stronicowanej
+        self._has_more = False
+        self._refresh_ids = set()  # ID czekające na odświeżenie w zadaniu "<klucz>.refresh"
+        self._rows = None  # pełny wynik ostatniego zapytania (None - niekompletny albo nieaktualny)
+        self._rows_text = None
+        self._pending_rows = []
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.search)
+        self.line_edit.textChanged.connect(self._text_changed)
+
+    def _text_changed(self, _text):
+        # Wynik dla poprzedniego tekstu jest już niepotrzebny
+        self.executor.cancel(self.key)
+        self._cancel_refresh()
+        self.timer.start()
+
+    def reload(self):
+        """Pełne odświeżenie z bazy (dane mogły się zmienić) dla bieżącego tekstu."""
+        self.timer.stop()
+        self._rows = None
+        self._submit(self.line_edit.text(), None, None)
+
+    def refresh(self, ids):
+        """Odświeża tylko wiersze rekordów o podanych ID (ids=None - pełne przeładowanie)."""
+        self._rows = None  # zapamiętany wynik nie uwzględnia zmian - bez zawężania do następnego zapytania
+        if ids is None or self.rows_by_ids is None or self.executor.is_pending(self.key):
+            # Trwające pełne zapytanie i tak przyniesie aktualne dane
+            self._cancel_refresh()
+            self.reload()
+            return
+        # Poprzednie odświeżenie jest anulowane, więc nowe obejmuje także jego rekordy
+        self._refresh_ids.update(ids)
+        if len(self._refresh_ids) > REFRESH_LIMIT:
+            self._cancel_refresh()
+            self.reload()
+            return
+        ids = frozenset(self._refresh_ids)
+        search_text = self.line_edit.text()
+        repository = self.repository
+        rows_by_ids = self.rows_by_ids
+
+        def job(repos):
+            source = repository(repos)
+            # Wiersze, których nie pokazałoby bieżące wyszukiwanie, nie trafiają do tabeli
+            return source.matching(rows_by_ids(source, ids), search_text)
+
+        self.executor.call(f"{self.key}.refresh", job, on_done=lambda rows: self._refreshed(ids, rows),
+                           on_error=self.on_error)
+
+    def _cancel_refresh(self):
+        self._refresh_ids.clear()
+        self.executor.cancel(f"{self.key}.refresh")
+
+    def _refreshed(self, ids, rows):
+        self._refresh_ids.clear()
+        if rows is None:
+            # Wyszukiwanie, którego nie da się sprawdzić w pamięci - pełne zapytanie
+            self.reload()
+            return
+        if self._has_more and self._after is not None:
+            # Wiersze dalej niż ostatnia wczytana strona pojawią się przy przewijaniu
+            rows = [row for row in rows if self.page_key(row) >= self._after]
+        self.on_update(ids, rows)
+
+    def search(self):
+        """Wyszukiwanie po przerwie w pisaniu - z zawężeniem poprzedniego wyniku, jeśli to możliwe."""
+        self._submit(self.line_edit.text(), self._rows, self._rows_text)
+
+    def next_page(self):
+        """Zamawia kolejną stronę listy stronicowanej. Zwraca True, jeśli zapytanie zostało wysłane."""
+        if not self._has_more or self.executor.is_pending(self.key):
+            return False
+        self._submit_page(self._after)
+        return True
+
+    def _paged(self, search_text):
+        return self.page_query is not None and not search_text.strip()
+
+    def _submit_page(self, after):
+        repository = self.repository
+        page_query = self.page_query
+        limit = self.page_size
+        self.executor.call(self.key, lambda repos: page_query(repository(repos), after, limit),
+                           on_done=lambda rows: self._page_loaded(rows, after is None, limit), on_error=self.on_error)
+
+    def _page_loaded(self, rows, first, limit):
+        self._has_more = len(rows) == limit
+        if rows:
+            self._after = self.page_key(rows[-1])
+        self.on_page(rows, self._has_more, first)
+        if first and self.on_done is not None:
+            self.on_done(None)
+
+    def _submit(self, search_text, previous_rows, previous_text):
+        self._rows = None
+        self._pending_rows = []
+        self._after = None
+        self._has_more = False
+        if self._paged(search_text):
+            self._submit_page(None)
+            return
+        repository = self.repository
+        query = self.query
+
+        def job(repos):
+            source = repository(repos)
+            if previous_rows is not None:
+                rows = source.narrow(previous_rows, previous_text, search_text)
+                if rows is not None:
+                    return rows
+            return query(source, search_text)
+
+        self.executor.fetch(self.key, job, self._batch, on_done=lambda _: self._finished(search_text),
+                            on_error=self.on_error)
+
+    def _batch(self, rows, first):
+        if first:
+            self._pending_rows = []
+        self._pending_rows.extend(rows)
+        self.on_batch(rows, first)
+
+    def _finished(self, search_text):
+        self._rows = self._pending_rows
+        self._rows_text = search_text
+        self._pending_rows = []
+        if self.on_done is not None:
+            self.on_done(None)
@@ -0,0 +1,151 @@
+# table_model.py
+#
+# Wspólny model tabel depozytów i klientów (QTableView zamiast QTableWidget).
+# Wiersze są przechowywane tak, jak zwraca je repozytorium (krotki/namedtuple) - bez obiektu
+# QTableWidgetItem na każdą komórkę. Tekst komórki powstaje dopiero, gdy widok ją rysuje,
+# a widok dostaje wiersze porcjami przez canFetchMore/fetchMore podczas przewijania.
+# Po zmianie kilku rekordów update_rows podmienia, usuwa albo dopisuje tylko ich wiersze.
+# Listy stronicowane (add_page) po dojściu do końca wczytanych wierszy proszą o kolejną stronę z bazy.
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+# Liczba wierszy udostępnianych widokowi za jednym razem
+FETCH_SIZE = 200
+
+
+def yes_no(value):
+    return "Tak" if value else "Nie"
+
+
+def whole_days(value):
+    return str(int(value)) if value else "0"
+
+
+class RowTableModel(QAbstractTableModel):
+    """
+    Model tylko do odczytu nad listą wierszy.
+
+    formatters: {kolumna: funkcja(wartość) -> tekst}, domyślnie str(wartość).
+    backgrounds: {kolumna: funkcja(wartość) -> QColor albo None}.
+    """
+
+    def __init__(self, headers, formatters=None, backgrounds=None, fetch_size=FETCH_SIZE, parent=None):
+        super().__init__(parent)
+        self.headers = list(headers)
+        self.formatters = formatters or {}
+        self.backgrounds = backgrounds or {}
+        self.fetch_size = fetch_size
+        self._rows = []
+        self._loaded = 0  # liczba wierszy widocznych dla widoku
+        self.has_more = False  # baza ma kolejne strony listy
+        self.fetch_next_page = None  # funkcja zamawiająca kolejną stronę; zwraca True, jeśli ją zamówiła
+        self._page_requested = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        column = index.column()
+        value = self._rows[index.row()][column]
+        if role == Qt.DisplayRole:
+            formatter = self.formatters.get(column)
+            return formatter(value) if formatter else str(value)
+        if role == Qt.BackgroundRole and column in self.backgrounds:
+            return self.backgrounds[column](value)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headers[section]
+        return str(section + 1)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self._loaded < len(self._rows) or (self.has_more and not self._page_requested)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        if self._loaded < len(self._rows):
+            self._show_rows(min(self.fetch_size, len(self._rows) - self._loaded))
+        elif self.has_more and not self._page_requested and self.fetch_next_page is not None:
+            self._page_requested = bool(self.fetch_next_page())
+
+    def add_rows(self, rows, replace=False):
+        """Dodaje paczkę wierszy (replace=True zastępuje dotychczasową zawartość)."""
+        if replace:
+            self.beginResetModel()
+            self._rows = list(rows)
+            self._loaded = min(len(self._rows), self.fetch_size)
+            self.has_more = False
+            self._page_requested = False
+            self.endResetModel()
+            return
+        self._rows.extend(rows)
+        if self._loaded < self.fetch_size:
+            # Widok nie jest jeszcze wypełniony - kolejna paczka pojawia się od razu
+            self._show_rows(min(self.fetch_size, len(self._rows)) - self._loaded)
+
+    def add_page(self, rows, has_more, first=False):
+        """Wyświetla stronę listy stronicowanej (first=True zastępuje dotychczasową zawartość)."""
+        if first:
+            self.add_rows(rows, replace=True)
+        else:
+            self._rows.extend(rows)
+            self._show_rows(len(self._rows) - self._loaded)
+        self.has_more = has_more
+        self._page_requested = False
+
+    def update_rows(self, ids, rows):
+        """
+        Odświeża wiersze o podanych ID (pierwsza kolumna). rows to ich aktualna postać w tej tabeli:
+        wiersz z rows zastępuje dotychczasowy, ID bez wiersza w rows znika z tabeli, a nowe
+        wiersze są dopisywane na początku (pełna kolejność wraca przy następnym przeładowaniu).
+        """
+        fresh = {row[0]: row for row in rows}
+        last_column = len(self.headers) - 1
+        for row_index in range(len(self._rows) - 1, -1, -1):
+            row_id = self._rows[row_index][0]
+            if row_id not in ids:
+                continue
+            row = fresh.pop(row_id, None)
+            if row is not None:
+                self._rows[row_index] = row
+                if row_index < self._loaded:
+                    self.dataChanged.emit(self.index(row_index, 0), self.index(row_index, last_column))
+            elif row_index < self._loaded:
+                self.beginRemoveRows(QModelIndex(), row_index, row_index)
+                del self._rows[row_index]
+                self._loaded -= 1
+                self.endRemoveRows()
+            else:
+                del self._rows[row_index]
+        new_rows = [row for row in rows if row[0] in fresh]
+        if new_rows:
+            self.beginInsertRows(QModelIndex(), 0, len(new_rows) - 1)
+            self._rows[0:0] = new_rows
+            self._loaded += len(new_rows)
+            self.endInsertRows()
+
+    def row(self, row_index):
+        """Wiersz repozytorium (namedtuple) dla numeru wiersza w widoku."""
+        return self._rows[row_index]
+
+    def total_rows(self):
+        """Liczba wszystkich wczytanych wierszy (także tych, których widok jeszcze nie pobrał)."""
+        return len(self._rows)
+
+    def _show_rows(self, count):
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
@@ -14,18 +14,27 @@ from reportlab.lib.pagesizes import A4, A6
 from reportlab.lib.units import mm
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QTableWidget, QTableWidgetItem, QPushButton, QLineEdit, QMessageBox,
+    QTableWidget, QTableWidgetItem, QTableView, QPushButton, QLineEdit, QMessageBox,
     QLabel, QFormLayout, QDialog, QComboBox, QMenu, QFileDialog,
-    QTabWidget, QInputDialog, QCompleter, QListWidget,
-    QPlainTextEdit, QHeaderView, QTextEdit, QDateEdit, QListWidget, QListWidgetItem, QCheckBox
+    QTabWidget, QInputDialog, QCompleter, QListWidget, QGridLayout,
+    QPlainTextEdit, QHeaderView, QTextEdit, QDateEdit, QListWidget, QListWidgetItem, QCheckBox, QSpinBox
 )
 from PySide6.QtGui import QAction, QColor, QPixmap, QIcon
 from PySide6.QtCore import Qt, QTimer, QSize, QSettings, QDate
 import traceback
 import platform
-import matplotlib.pyplot as plt
 import win32print
 import win32api
+from database import DEFAULT_PROFILE, open_connection, migrate, check_query_plans, check_analytics_plans, SCHEMA_VERSION
+from repositories import Repositories, DepositRepository, OrderRepository, STATEMENT_CACHE_SIZE, PAGE_SIZE
+from db_worker import QueryExecutor
+from table_model import RowTableModel, yes_no, whole_days
+from search_controller import SearchController
+from charts import BarChart, export_chart
+from scheduler import JobScheduler, Job, daily, weekly, utc_midnight
+from outbox import OutboxSender, DEFAULT_RATE_PER_MINUTE
+from reminders import queue_reminders
+from events import DepositChanged, ClientChanged, OrderChanged, InventoryChanged
 
 # Inicjalizacja aplikacji PySide6
 app = QApplication(sys.argv)
@@ -34,7 +43,18 @@ app = QApplication(sys.argv)
 APP_DATA_DIR = r"C:\Program Files\Menadżer Depozytów Opon"
 DATA_DIR = os.path.join(APP_DATA_DIR, "Dane")
 DATABASE_PATH = os.path.join(DATA_DIR, "tire_deposits.db")
+# Profil silnika SQLite: "desktop", "shared-workstation" lub "bulk-import" (patrz database.py)
+DATABASE_PROFILE = os.environ.get("TDM_DB_PROFILE", DEFAULT_PROFILE)
 
+# Liczba automatycznych kopii zapasowych (zadanie harmonogramu) przechowywanych w folderze kopii
+AUTO_BACKUP_KEEP = 14
+
+# Okresy szczytu sezonowej wymiany opon (MM-DD początku i dnia po końcu) dla zakładki analiz
+RUSH_PERIODS = (("Wiosna", "03-01", "05-16"), ("Jesień", "10-01", "12-16"))
+
+# Tło kolumny "Status" w tabelach depozytów
+STATUS_ACTIVE_COLOR = QColor("lightgreen")
+STATUS_INACTIVE_COLOR = QColor("lightgray")
 
 
 def check_admin_rights():
@@ -137,226 +157,28 @@ ensure_database_exists()
 
 # Funkcja tworzenia połączenia z bazą danych
 def create_connection():
-    """Tworzy połączenie z bazą danych SQLite."""
+    """Tworzy połączenie z bazą danych SQLite z ustawieniami profilu DATABASE_PROFILE."""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        logger.info(f"Połączono z bazą danych: {DATABASE_PATH}")
+        conn = open_connection(DATABASE_PATH, DATABASE_PROFILE, cached_statements=STATEMENT_CACHE_SIZE)
+        logger.info(f"Połączono z bazą danych: {DATABASE_PATH} (profil: {DATABASE_PROFILE})")
         return conn
     except sqlite3.Error as e:
         logger.error(f"Błąd połączenia z bazą danych: {e}")
         sys.exit(1)
 
 def create_tables(conn):
-    """Tworzy tabele w bazie danych lub aktualizuje ich strukturę."""
+    """Tworzy tabele w bazie danych lub aktualizuje ich strukturę (migracje wg PRAGMA user_version)."""
     try:
-        cursor = conn.cursor()
-
-        # Tworzenie tabel, jeśli nie istnieją
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clients (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                phone_number TEXT,
-                email TEXT,
-                additional_info TEXT,
-                discount REAL DEFAULT 0,
-                barcode TEXT
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS deposits (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_id INTEGER,
-                car_model TEXT,
-                registration_number TEXT,
-                tire_brand TEXT,
-                tire_size TEXT,
-                quantity INTEGER,
-                location TEXT,
-                washing BOOLEAN,
-                conservation BOOLEAN,
-                deposit_date TEXT,
-                issue_date TEXT,
-                status TEXT,
-                duration INTEGER,
-                season TEXT,
-                expected_return_date TEXT,
-                technical_condition TEXT,
-                storage_date TEXT,
-                price REAL,
-                FOREIGN KEY(client_id) REFERENCES clients(id)
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                deposit_id INTEGER,
-                change_date TEXT,
-                user TEXT,
-                description TEXT,
-                FOREIGN KEY(deposit_id) REFERENCES deposits(id)
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS client_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_id INTEGER,
-                interaction_date TEXT,
-                notes TEXT,
-                FOREIGN KEY(client_id) REFERENCES clients(id)
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS email_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                to_address TEXT,
-                subject TEXT,
-                body TEXT,
-                sent_date TEXT
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS locations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                is_default BOOLEAN DEFAULT 0
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS email_templates (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                subject TEXT,
-                body TEXT
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_id INTEGER,
-                order_date TEXT,
-                expected_delivery_date TEXT,
-                status TEXT,
-                notes TEXT,
-                FOREIGN KEY(client_id) REFERENCES clients(id)
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER,
-                brand_model TEXT,
-                size TEXT,
-                quantity INTEGER,
-                price REAL,
-                FOREIGN KEY(order_id) REFERENCES orders(id)
-            )
-        ''')
-
-        # Tworzenie tabeli 'inventory' (Opony na stanie)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS inventory (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                brand_model TEXT NOT NULL,
-                size TEXT NOT NULL,
-                quantity INTEGER DEFAULT 0,
-                price REAL DEFAULT 0.0,
-                dot TEXT
-            )
-        ''')
-        # Tworzenie tabeli column_settings, jeśli nie istnieje
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS column_settings (
-                id INTEGER PRIMARY KEY,
-                tab_name TEXT NOT NULL,
-                column_index INTEGER NOT NULL,
-                visible BOOLEAN NOT NULL
-            )
-        ''')
-
-        # Dodawanie brakujących kolumn do istniejących tabel
-        def add_missing_columns(table, columns):
-            cursor.execute(f"PRAGMA table_info({table})")
-            existing_columns = [column[1] for column in cursor.fetchall()]
-            for column_name, column_def in columns.items():
-                if column_name not in existing_columns:
-                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column_name} {column_def}")
-
-        # Dodawanie brakujących kolumn do tabel
-        add_missing_columns("clients", {
-            "email": "TEXT",
-            "discount": "REAL DEFAULT 0",
-            "barcode": "TEXT"
-        })
-        add_missing_columns("deposits", {
-            "technical_condition": "TEXT",
-            "storage_date": "TEXT",
-            "price": "REAL",
-            "season": "TEXT",
-            "expected_return_date": "TEXT"
-        })
-        add_missing_columns("inventory", {
-            "brand_model": "TEXT NOT NULL",
-            "size": "TEXT NOT NULL",
-            "quantity": "INTEGER DEFAULT 0",
-            "price": "REAL DEFAULT 0.0",
-            "dot": "TEXT",
-            "notes": "TEXT DEFAULT ''",  # Dodanie kolumny 'notes'
-            "season_type": "TEXT DEFAULT 'Letnia'"  # Dodanie kolumny 'season_type'
-        })
-        add_missing_columns("order_items", {
-            "tire_brand": "TEXT",
-            "tire_size": "TEXT",
-            "quantity": "INTEGER DEFAULT 0",
-            "price": "REAL DEFAULT 0.0",
-            "notes": "TEXT DEFAULT ''",
-        })
-        # Dodawanie brakujących kolumn
-        add_missing_columns("column_settings", {
-            "id": "INTEGER PRIMARY KEY",
-            "tab_name": "TEXT NOT NULL",
-            "column_index": "INTEGER NOT NULL",
-            "visible": "BOOLEAN NOT NULL DEFAULT 1"
-        })
-        # Zatwierdzenie zmian
-        conn.commit()
-        logger.info("Tabele bazy danych zostały utworzone lub zaktualizowane.")
+        applied = migrate(conn)
+        if applied:
+            logger.info(f"Schemat bazy danych zaktualizowany do wersji {SCHEMA_VERSION} (migracje: {applied}).")
+            for query_name, plan in check_query_plans(conn).items():
+                logger.warning(f"Zapytanie {query_name} nie korzysta z indeksu: {plan}")
+            for query_name, plan in check_analytics_plans(conn).items():
+                logger.warning(f"Zapytanie {query_name} czyta całą tabelę depozytów: {plan}")
     except sqlite3.Error as e:
         logger.error(f"Błąd tworzenia lub aktualizacji tabel: {e}")
 
-        # Dodanie domyślnego szablonu e-mail
-        create_default_email_template(conn)
-
-
-
-
-
-
-def create_default_email_template(conn):
-    """Tworzy domyślny szablon e-mail, jeśli nie istnieje."""
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM email_templates")
-        count = cursor.fetchone()[0]
-        if count == 0:
-            cursor.execute('''
-                INSERT INTO email_templates (name, subject, body)
-                VALUES (?, ?, ?)
-            ''', (
-                "Przypomnienie o zwrocie",
-                "Przypomnienie o zwrocie opon",
-                "Szanowny/a {client_name},\n\nPrzypominamy o oczekiwanym zwrocie opon do dnia {expected_return_date}.\n\nPozdrawiamy,\n{company_name}"
-            ))
-            conn.commit()
-            logger.info("Dodano domyślny szablon e-mail.")
-    except Exception as e:
-        logger.error(f"Błąd podczas tworzenia domyślnego szablonu e-mail: {e}")
 
 def resource_path(relative_path):
     """Funkcja do obsługi ścieżek zasobów w PyInstaller."""
@@ -548,36 +370,6 @@ def open_file(self, file_path):
 
 
 
-# Otwórz połączenie z bazą danych
-conn = create_connection()
-cursor = conn.cursor()
-
-try:
-    # Pobierz dane przykładowego depozytu z bazy
-    cursor.execute("""
-        SELECT d.id, c.name, d.tire_brand, d.tire_size, d.quantity
-        FROM deposits d
-        LEFT JOIN clients c ON d.client_id = c.id
-        LIMIT 1
-    """)
-    deposit = cursor.fetchone()
-
-    if deposit:
-        deposit_id, client_name, tire_brand, tire_size, quantity = deposit
-        deposit_details = [
-            f"Marka Opon: {tire_brand}",
-            f"Rozmiar Opon: {tire_size}",
-            f"Ilość: {quantity}",
-            f"Klient: {client_name}",
-        ]
-        logo_path = "path/to/logo.png"  # Ścieżka do logo, podmień na rzeczywistą ścieżkę
-
-    else:
-        logger.error("Brak danych w tabeli 'deposits'. Upewnij się, że baza danych zawiera rekordy.")
-
-finally:
-    conn.close()
-
 from niimprint.printer import PrinterClient
 from niimprint import SerialTransport
 from PIL import Image, ImageDraw, ImageFont
@@ -588,8 +380,7 @@ logger = logging.getLogger("TireDepositManager")
 
 
 class NiimbotPrinterManager:
-    def __init__(self, db_path, settings):
-        self.conn = sqlite3.connect(db_path)
+    def __init__(self, settings):
         self.settings = settings if settings else {}  # Domyślnie pusty słownik, jeśli brak ustawień
 
     def print_label_with_niimbot(self, file_path, serial_port='COM3'):
@@ -878,13 +669,19 @@ class DepositManager(QMainWindow):
         os.makedirs(self.data_dir, exist_ok=True)
 
         # Połączenie z bazą danych
-        self.conn = create_connection()
-        if self.conn is None:
+        conn = create_connection()
+        if conn is None:
             QMessageBox.critical(self, "Błąd", "Nie można nawiązać połączenia z bazą danych.")
             sys.exit(1)
 
         # Tworzenie tabel w bazie danych
-        create_tables(self.conn)
+        create_tables(conn)
+
+        # Repozytoria - jedyna droga interfejsu do bazy danych
+        self.repos = Repositories(conn, DATABASE_PROFILE)
+
+        # Wątek odczytów w tle z własnym połączeniem - ładowanie tabel nie blokuje okna
+        self.db = QueryExecutor(DATABASE_PATH, DATABASE_PROFILE, events=self.repos.events, parent=self)
 
         # Inicjalizacja atrybutów domyślnych
         self.backup_folder = 'backups'
@@ -921,7 +718,16 @@ class DepositManager(QMainWindow):
         self.barcode_input = QLineEdit()
         self.barcode_input.setPlaceholderText("Skanuj kartę stałego klienta.")
         self.barcode_input.returnPressed.connect(self.handle_barcode_scanned)
-        self.main_layout.addWidget(self.barcode_input)
+
+        # Pole do skanowania / wpisywania numeru rejestracyjnego
+        self.plate_input = QLineEdit()
+        self.plate_input.setPlaceholderText("Skanuj lub wpisz numer rejestracyjny...")
+        self.plate_input.returnPressed.connect(self.handle_plate_scanned)
+
+        scan_layout = QHBoxLayout()
+        scan_layout.addWidget(self.barcode_input)
+        scan_layout.addWidget(self.plate_input)
+        self.main_layout.addLayout(scan_layout)
 
         # Zakładki główne
         self.tabs = QTabWidget()
@@ -943,12 +749,14 @@ class DepositManager(QMainWindow):
         self.clients_tab = QWidget()
         self.orders_tab = QWidget()
         self.stats_tab = QWidget()
+        self.analytics_tab = QWidget()
         self.inventory_tab = QWidget()
         self.admin_tab = QWidget()
         self.tabs.addTab(self.clients_tab, "Klienci")
         self.tabs.addTab(self.orders_tab, "Zamówienia")
         self.tabs.addTab(self.admin_tab, "Administracja")
         self.tabs.addTab(self.stats_tab, "Statystyki")
+        self.tabs.addTab(self.analytics_tab, "Analizy")
 
         # Inicjalizacja zakładek
         self.init_active_tab()
@@ -957,28 +765,31 @@ class DepositManager(QMainWindow):
         self.init_clients_tab()
         self.init_orders_tab()
         self.init_stats_tab()
+        self.init_analytics_tab()
         self.init_inventory_tab()
+        self.init_search_controllers()
+        self.init_event_handlers()
 
         # Ustaw menu kontekstowe dla tabel
         self.setup_context_menus()
 
-        # Ładowanie danych
-        self.load_active_deposits()
-        self.load_issued_deposits()
-        self.load_overdue_deposits()
-        self.load_clients()
-        self.load_orders()
-        self.load_statistics()
+        # Ładowanie danych - tylko widocznej zakładki, pozostałe przy pierwszym otwarciu
+        self.init_tab_loading()
+        self.load_current_tab()
 
-        # Timer do aktualizacji czasu trwania depozytów
+        # Timer wykrywający zmiany w bazie wprowadzone poza oknem (np. przez drugą instancję programu)
         self.timer = QTimer()
-        self.timer.timeout.connect(self.update_deposit_durations)
+        self.timer.timeout.connect(self.check_database_changes)
         self.timer.start(60000)
 
-        # Timer do wysyłania przypomnień
-        self.reminder_timer = QTimer()
-        self.reminder_timer.timeout.connect(self.check_and_send_reminders)
-        self.reminder_timer.start(86400000)
+        # Wysyłka e-maili z kolejki w tle (przed harmonogramem - przypomnienia dopisują do kolejki)
+        self.init_outbox()
+
+        # Przypomnienia, kopie zapasowe, konserwacja i zmiana dnia - w ustalonych terminach
+        self.init_scheduler()
+
+        # Indeks unikalny numerów rejestracyjnych - ponawiany, dopóki blokują go zdublowane depozyty
+        QTimer.singleShot(0, lambda: self.show_plate_duplicates(self.repos.ensure_plate_index()))
 
         # Ustawienia okna
         self.load_window_settings()
@@ -989,7 +800,7 @@ class DepositManager(QMainWindow):
         }
 
         # Inicjalizacja drukarki Niimbot
-        self.printer_manager = NiimbotPrinterManager(db_path=self.db_path, settings=settings)
+        self.printer_manager = NiimbotPrinterManager(settings=settings)
 
 
     def init_tabs(self):
@@ -1015,16 +826,14 @@ class DepositManager(QMainWindow):
         self.tabs.addTab(self.orders_tab, "Zamówienia")  # Dodaj zakładkę Zamówienia
         self.tabs.addTab(self.inventory_tab, "Opony na stanie")  # Dodaj zakładkę Opony na stanie
         self.tabs.addTab(self.stats_tab, "Statystyki")
+        self.tabs.addTab(self.analytics_tab, "Analizy")
         self.tabs.addTab(self.admin_tab, "Administracja")
 
     def ensure_column_settings(self):
         """Upewnia się, że tabela 'column_settings' jest poprawnie zainicjalizowana."""
         try:
-            cursor = self.conn.cursor()
-
             # Sprawdź, czy tabela jest pusta
-            cursor.execute("SELECT COUNT(*) FROM column_settings")
-            if cursor.fetchone()[0] == 0:
+            if not self.repos.settings.has_column_settings():
                 # Dodaj domyślne ustawienia kolumn dla każdej zakładki
                 default_columns = {
                     "active_deposits": [("ID", 1), ("Klient", 1), ("Telefon", 1), ("Status", 1)],
@@ -1033,13 +842,9 @@ class DepositManager(QMainWindow):
                 }
 
                 for tab_name, columns in default_columns.items():
-                    for idx, (column_name, visible) in enumerate(columns):
-                        cursor.execute('''
-                            INSERT INTO column_settings (tab_name, column_index, visible)
-                            VALUES (?, ?, ?)
-                        ''', (tab_name, idx, visible))
-
-                self.conn.commit()
+                    self.repos.settings.save_column_visibility(
+                        tab_name, [(idx, visible) for idx, (column_name, visible) in enumerate(columns)]
+                    )
                 logger.info("Tabela 'column_settings' została zainicjalizowana.")
         except sqlite3.Error as e:
             logger.error(f"Błąd podczas inicjalizacji tabeli 'column_settings': {e}")
@@ -1106,13 +911,6 @@ class DepositManager(QMainWindow):
         about_action.triggered.connect(self.show_about)
         help_menu.addAction(about_action)
 
-    def closeEvent(self, event):
-        """Zapisuje ustawienia okna przy zamykaniu."""
-        settings = QSettings("TireDepositManager", "MainWindow")
-        settings.setValue("geometry", self.saveGeometry())
-        settings.setValue("windowState", self.saveState())
-        super().closeEvent(event)
-
     def init_active_tab(self):
         """Inicjalizuje zakładkę z aktywnymi depozytami."""
         layout = QVBoxLayout()
@@ -1122,7 +920,6 @@ class DepositManager(QMainWindow):
         search_layout = QHBoxLayout()
         self.search_bar_active = QLineEdit()
         self.search_bar_active.setPlaceholderText("Szukaj depozytów...")
-        self.search_bar_active.textChanged.connect(self.load_active_deposits)
         search_layout.addWidget(self.search_bar_active)
 
         # Dodanie guzika zarządzania kolumnami
@@ -1134,14 +931,19 @@ class DepositManager(QMainWindow):
         layout.addLayout(search_layout)
 
         # Tabela depozytów
-        self.table_active = QTableWidget()
-        self.table_active.setColumnCount(19)
-        self.table_active.setHorizontalHeaderLabels([
+        self.active_model = RowTableModel([
             "ID", "Klient", "Telefon", "E-mail", "Model auta", "Nr rejestracyjny", "Marka opon", "Rozmiar opon",
             "Ilość", "Lokalizacja", "Mycie", "Konserwacja", "Data", "Sezon", "Status", "Czas trwania (dni)", "Stan techniczny", "Data przechowywania", "Cena"
-        ])
-        self.table_active.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table_active.setSelectionBehavior(QTableWidget.SelectRows)
+        ], formatters={
+            10: yes_no, 11: yes_no,  # Kolumny Mycie i Konserwacja
+            15: whole_days,  # Czas trwania
+        }, backgrounds={
+            14: lambda status: STATUS_ACTIVE_COLOR if status == "Aktywny" else STATUS_INACTIVE_COLOR,  # Status
+        }, parent=self)
+        self.table_active = QTableView()
+        self.table_active.setModel(self.active_model)
+        self.table_active.setEditTriggers(QTableView.NoEditTriggers)
+        self.table_active.setSelectionBehavior(QTableView.SelectRows)
         self.table_active.horizontalHeader().setStretchLastSection(True)
         self.table_active.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(self.table_active)
@@ -1163,20 +965,25 @@ class DepositManager(QMainWindow):
 
     def manage_active_columns(self):
         """Otwiera okno dialogowe zarządzania widocznymi kolumnami dla aktywnych depozytów."""
-        dialog = ColumnManagerDialog(self.table_active, self.conn, "active_tab_columns", parent=self)
+        dialog = ColumnManagerDialog(self.table_active, self.repos, "active_tab_columns", parent=self)
         if dialog.exec() == QDialog.Accepted:
+            hidden_before = self.active_hidden_columns
             self.load_visible_columns()
+            # Kolumny ukryte wcześniej nie były pobierane - po ich pokazaniu wczytaj dane ponownie
+            if hidden_before - self.active_hidden_columns:
+                self.refresh_tab(self.active_tab)
 
 
     def load_visible_columns(self):
-        """Wczytuje widoczne kolumny dla tabeli aktywnych depozytów."""
+        """Wczytuje widoczne kolumny dla tabeli aktywnych depozytów (ukryte nie są pobierane z bazy)."""
+        self.active_hidden_columns = frozenset()
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT column_index, visible FROM column_settings WHERE tab_name = 'active_tab_columns'")
-            column_settings = cursor.fetchall()
-
-            for column_index, visible in column_settings:
+            hidden_columns = set()
+            for column_index, visible in self.repos.settings.column_visibility("active_tab_columns"):
                 self.table_active.setColumnHidden(column_index, not visible)
+                if not visible:
+                    hidden_columns.add(column_index)
+            self.active_hidden_columns = frozenset(hidden_columns)
         except sqlite3.Error as e:
             logger.error(f"Błąd podczas wczytywania widocznych kolumn: {e}")
 
@@ -1189,18 +996,22 @@ class DepositManager(QMainWindow):
         # Pasek wyszukiwania
         self.search_bar_issued = QLineEdit()
         self.search_bar_issued.setPlaceholderText("Szukaj depozytów...")
-        self.search_bar_issued.textChanged.connect(self.load_issued_deposits)
         layout.addWidget(self.search_bar_issued)
 
         # Tabela depozytów
-        self.table_issued = QTableWidget()
-        self.table_issued.setColumnCount(20)
-        self.table_issued.setHorizontalHeaderLabels([
+        self.issued_model = RowTableModel([
             "ID", "Klient", "Telefon", "E-mail", "Model auta", "Nr rejestracyjny", "Marka opon", "Rozmiar opon",
             "Ilość", "Lokalizacja", "Mycie", "Konserwacja", "Data depozytu", "Data wydania", "Sezon", "Status", "Czas trwania (dni)", "Stan techniczny", "Data przechowywania", "Cena"
-        ])
-        self.table_issued.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table_issued.setSelectionBehavior(QTableWidget.SelectRows)
+        ], formatters={
+            10: yes_no, 11: yes_no,  # Kolumny Mycie i Konserwacja
+            16: whole_days,  # Czas trwania
+        }, backgrounds={
+            15: lambda status: STATUS_INACTIVE_COLOR if status == "Wydany" else None,  # Status
+        }, parent=self)
+        self.table_issued = QTableView()
+        self.table_issued.setModel(self.issued_model)
+        self.table_issued.setEditTriggers(QTableView.NoEditTriggers)
+        self.table_issued.setSelectionBehavior(QTableView.SelectRows)
         self.table_issued.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table_issued.customContextMenuRequested.connect(self.open_context_menu_issued)
         self.table_issued.horizontalHeader().setStretchLastSection(True)
@@ -1215,18 +1026,19 @@ class DepositManager(QMainWindow):
         # Pasek wyszukiwania
         self.search_bar_overdue = QLineEdit()
         self.search_bar_overdue.setPlaceholderText("Szukaj depozytów...")
-        self.search_bar_overdue.textChanged.connect(self.load_overdue_deposits)
         layout.addWidget(self.search_bar_overdue)
 
         # Tabela depozytów
-        self.table_overdue = QTableWidget()
-        self.table_overdue.setColumnCount(17)
-        self.table_overdue.setHorizontalHeaderLabels([
+        self.overdue_model = RowTableModel([
             "ID", "Klient", "Telefon", "E-mail", "Model auta", "Nr rejestracyjny", "Marka opon", "Rozmiar opon",
             "Ilość", "Lokalizacja", "Data", "Oczekiwany zwrot", "Sezon", "Status", "Przeterminowany (dni)", "Kontakt", "Cena"
-        ])
-        self.table_overdue.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table_overdue.setSelectionBehavior(QTableWidget.SelectRows)
+        ], formatters={
+            14: whole_days,  # Przeterminowany (dni)
+        }, parent=self)
+        self.table_overdue = QTableView()
+        self.table_overdue.setModel(self.overdue_model)
+        self.table_overdue.setEditTriggers(QTableView.NoEditTriggers)
+        self.table_overdue.setSelectionBehavior(QTableView.SelectRows)
         self.table_overdue.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table_overdue.customContextMenuRequested.connect(self.open_context_menu_overdue)
         self.table_overdue.horizontalHeader().setStretchLastSection(True)
@@ -1241,17 +1053,16 @@ class DepositManager(QMainWindow):
         # Pasek wyszukiwania
         self.search_bar_clients = QLineEdit()
         self.search_bar_clients.setPlaceholderText("Szukaj klientów...")
-        self.search_bar_clients.textChanged.connect(self.load_clients)
         layout.addWidget(self.search_bar_clients)
 
         # Tabela klientów
-        self.table_clients = QTableWidget()
-        self.table_clients.setColumnCount(7)
-        self.table_clients.setHorizontalHeaderLabels([
+        self.clients_model = RowTableModel([
             "ID", "Nazwa", "Numer telefonu", "E-mail", "Dodatkowe informacje", "Rabat (%)", "Kod kreskowy"
-        ])
-        self.table_clients.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table_clients.setSelectionBehavior(QTableWidget.SelectRows)
+        ], parent=self)
+        self.table_clients = QTableView()
+        self.table_clients.setModel(self.clients_model)
+        self.table_clients.setEditTriggers(QTableView.NoEditTriggers)
+        self.table_clients.setSelectionBehavior(QTableView.SelectRows)
         self.table_clients.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table_clients.customContextMenuRequested.connect(self.open_context_menu_clients)
         self.table_clients.horizontalHeader().setStretchLastSection(True)
@@ -1266,37 +1077,14 @@ class DepositManager(QMainWindow):
         layout.addLayout(button_layout)
 
     def load_orders(self):
-        """Ładuje zamówienia z bazy danych i wyświetla je w tabeli."""
-        try:
-            search_text = self.search_bar_orders.text()
-            query = '''
-                SELECT orders.id, clients.name, orders.order_date, orders.expected_delivery_date, orders.status, orders.notes
-                FROM orders
-                INNER JOIN clients ON orders.client_id = clients.id
-                WHERE clients.name LIKE ? OR orders.status LIKE ?
-                ORDER BY orders.order_date DESC
-            '''
-            parameters = (f'%{search_text}%', f'%{search_text}%')
-            cursor = self.conn.cursor()
-            cursor.execute(query, parameters)
-            rows = cursor.fetchall()
-
-            self.table_orders.setRowCount(len(rows))
-            for row_idx, row in enumerate(rows):
-                for col_idx, value in enumerate(row):
-                    item = QTableWidgetItem(str(value))
-                    self.table_orders.setItem(row_idx, col_idx, item)
-        except Exception as e:
-            error_code = traceback.format_exc()
-            QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas ładowania zamówień.\nKod błędu:\n{error_code}")
-            logger.error(f"Błąd podczas ładowania zamówień: {e}")
+        """Ładuje zamówienia w tle i wyświetla je w tabeli."""
+        self.orders_search.reload()
 
     def add_order(self):
         """Otwiera okno dialogowe do dodawania nowego zamówienia."""
         try:
-            dialog = OrderDialog(self.conn, parent=self)
-            if dialog.exec() == QDialog.Accepted:
-                self.load_orders()
+            dialog = OrderDialog(self.repos, parent=self)
+            dialog.exec()
         except Exception as e:
             logger.error(f"Błąd podczas dodawania zamówienia: {e}")
             QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas dodawania zamówienia:\n{traceback.format_exc()}")
@@ -1314,10 +1102,10 @@ class DepositManager(QMainWindow):
             menu.addAction(delete_action)
 
             action = menu.exec(self.table_orders.viewport().mapToGlobal(position))
-            selected_row = self.table_orders.currentRow()
+            selected_row = self.table_orders.currentIndex().row()
             if selected_row < 0:
                 return
-            order_id = int(self.table_orders.item(selected_row, 0).text())
+            order_id = self.orders_model.row(selected_row).id
 
             if action == view_action:
                 self.view_order_details(order_id)
@@ -1333,7 +1121,7 @@ class DepositManager(QMainWindow):
     def view_order_details(self, order_id):
         """Wyświetla szczegóły zamówienia."""
         try:
-            dialog = OrderDetailsDialog(self.conn, order_id, parent=self)
+            dialog = OrderDetailsDialog(self.repos, order_id, parent=self)
             dialog.exec()
         except Exception as e:
             logger.error(f"Błąd podczas wyświetlania szczegółów zamówienia: {e}")
@@ -1341,9 +1129,8 @@ class DepositManager(QMainWindow):
     def edit_order(self, order_id):
         """Edytuje istniejące zamówienie."""
         try:
-            dialog = OrderDialog(self.conn, order_id=order_id, parent=self)
-            if dialog.exec() == QDialog.Accepted:
-                self.load_orders()
+            dialog = OrderDialog(self.repos, order_id=order_id, parent=self)
+            dialog.exec()
         except Exception as e:
             logger.error(f"Błąd podczas edycji zamówienia: {e}")
 
@@ -1356,11 +1143,7 @@ class DepositManager(QMainWindow):
                 QMessageBox.Yes | QMessageBox.No
             )
             if reply == QMessageBox.Yes:
-                cursor = self.conn.cursor()
-                cursor.execute("DELETE FROM order_items WHERE order_id = ?", (order_id,))
-                cursor.execute("DELETE FROM orders WHERE id = ?", (order_id,))
-                self.conn.commit()
-                self.load_orders()
+                self.repos.orders.delete(order_id)
         except Exception as e:
             logger.error(f"Błąd podczas usuwania zamówienia: {e}")
 
@@ -1372,17 +1155,16 @@ class DepositManager(QMainWindow):
         # Pasek wyszukiwania
         self.search_bar_orders = QLineEdit()
         self.search_bar_orders.setPlaceholderText("Szukaj zamówień...")
-        self.search_bar_orders.textChanged.connect(self.load_orders)
         layout.addWidget(self.search_bar_orders)
 
         # Tabela zamówień
-        self.table_orders = QTableWidget()
-        self.table_orders.setColumnCount(6)
-        self.table_orders.setHorizontalHeaderLabels([
+        self.orders_model = RowTableModel([
             "ID", "Klient", "Data zamówienia", "Oczekiwana dostawa", "Status", "Uwagi"
-        ])
-        self.table_orders.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table_orders.setSelectionBehavior(QTableWidget.SelectRows)
+        ], parent=self)
+        self.table_orders = QTableView()
+        self.table_orders.setModel(self.orders_model)
+        self.table_orders.setEditTriggers(QTableView.NoEditTriggers)
+        self.table_orders.setSelectionBehavior(QTableView.SelectRows)
         self.table_orders.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table_orders.customContextMenuRequested.connect(self.open_context_menu_orders)
         self.table_orders.horizontalHeader().setStretchLastSection(True)
@@ -1398,7 +1180,7 @@ class DepositManager(QMainWindow):
 
     def manage_email_templates(self):
         """Otwiera okno dialogowe do zarządzania szablonami e-mail."""
-        dialog = EmailTemplateManagerDialog(self.conn, parent=self)
+        dialog = EmailTemplateManagerDialog(self.repos, parent=self)
         dialog.exec()
 
     def init_stats_tab(self):
@@ -1410,9 +1192,53 @@ class DepositManager(QMainWindow):
         self.stats_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(self.stats_label)
 
-        self.stats_image = QLabel()
-        self.stats_image.setAlignment(Qt.AlignCenter)
-        layout.addWidget(self.stats_image)
+        self.stats_chart = BarChart("Depozyty w czasie", "Miesiąc", "Liczba depozytów")
+        layout.addWidget(self.stats_chart)
+
+        export_chart_button = QPushButton("Eksportuj wykres")
+        export_chart_button.clicked.connect(self.export_statistics_chart)
+        layout.addWidget(export_chart_button, alignment=Qt.AlignRight)
+
+        # Ostatnio wyświetlone statystyki - ten sam wynik z pamięci nie rysuje wykresu ponownie
+        self.shown_statistics = None
+
+    def init_analytics_tab(self):
+        """Inicjalizuje zakładkę analiz: stan magazynu, ruch w szczycie sezonu, czas przechowania, przychód."""
+        layout = QGridLayout()
+        self.analytics_tab.setLayout(layout)
+
+        period_layout = QHBoxLayout()
+        period_layout.addWidget(QLabel("Okres szczytu:"))
+        self.rush_period_combo = QComboBox()
+        # Rozpoczęte okresy szczytu z bieżącego i poprzedniego roku, od najnowszego
+        today = datetime.now().strftime('%Y-%m-%d')
+        for year in (datetime.now().year, datetime.now().year - 1):
+            for name, start, end in reversed(RUSH_PERIODS):
+                if f"{year}-{start}" <= today:
+                    self.rush_period_combo.addItem(f"{name} {year}", (f"{year}-{start}", f"{year}-{end}"))
+        self.rush_period_combo.currentIndexChanged.connect(lambda _index: self.load_analytics())
+        period_layout.addWidget(self.rush_period_combo)
+        period_layout.addStretch()
+        layout.addLayout(period_layout, 0, 0, 1, 2)
+
+        self.throughput_chart = BarChart("Przyjęcia i wydania dziennie", "Dzień", "Liczba depozytów")
+        layout.addWidget(self.throughput_chart, 1, 0)
+        self.throughput_label = QLabel()
+        self.throughput_label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        layout.addWidget(self.throughput_label, 1, 1)
+
+        self.revenue_chart = BarChart("Przychód z przyjętych depozytów", "Miesiąc", "PLN")
+        layout.addWidget(self.revenue_chart, 2, 0)
+        self.analytics_label = QLabel()
+        self.analytics_label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        layout.addWidget(self.analytics_label, 2, 1)
+
+        # Stan magazynu: wiersze - lokalizacje, kolumny - koniec kolejnych miesięcy
+        self.occupancy_table = QTableWidget()
+        self.occupancy_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.occupancy_table, 3, 0, 1, 2)
+
+        self.shown_analytics = None
 
     def init_inventory_tab(self):
         """Inicjalizuje zakładkę Opony na stanie."""
@@ -1422,8 +1248,7 @@ class DepositManager(QMainWindow):
 
         # Pasek wyszukiwania
         self.search_bar_inventory = QLineEdit()
-        self.search_bar_inventory.setPlaceholderText("Szukaj opon na stanie...")
-        self.search_bar_inventory.textChanged.connect(self.load_inventory)
+        self.search_bar_inventory.setPlaceholderText("Szukaj opon na stanie (np. Michelin, 205/55R16, R16 195-215)...")
         layout.addWidget(self.search_bar_inventory)
 
         # Tabela opon
@@ -1451,56 +1276,29 @@ class DepositManager(QMainWindow):
         self.tabs.removeTab(self.tabs.indexOf(self.admin_tab))
         self.tabs.addTab(self.inventory_tab, "Opony na stanie")
 
-        # Ładowanie danych przy starcie zakładki
-        self.load_inventory()
-
     def add_inventory_item(self):
         """Dodaje nową oponę do stanu magazynowego."""
-        dialog = InventoryItemDialog(self.conn, parent=self)
-        if dialog.exec() == QDialog.Accepted:
-            self.load_inventory()
+        dialog = InventoryItemDialog(self.repos, parent=self)
+        dialog.exec()
 
 
     def load_inventory(self):
-        """Ładuje dane o oponach na stanie do tabeli w zakładce 'Opony na stanie'."""
-        try:
-            search_text = self.search_bar_inventory.text().strip()
-            cursor = self.conn.cursor()
-
-            if search_text:
-                query = '''
-                    SELECT id, brand_model, size, quantity, price, dot, notes
-                    FROM inventory
-                    WHERE brand_model LIKE ? OR size LIKE ? OR dot LIKE ?
-                '''
-                parameters = (f'%{search_text}%', f'%{search_text}%', f'%{search_text}%')
-            else:
-                query = '''
-                    SELECT id, brand_model, size, quantity, price, dot, notes
-                    FROM inventory
-                '''
-                parameters = ()
-
-            cursor.execute(query, parameters)
-            rows = cursor.fetchall()
-
-            self.table_inventory.setRowCount(0)  # Wyczyszczenie tabeli przed załadowaniem nowych danych
-
-            for row_idx, row_data in enumerate(rows):
-                self.table_inventory.insertRow(row_idx)
-                # Wstawiamy dane w odpowiedniej kolejności
-                self.table_inventory.setItem(row_idx, 0, QTableWidgetItem(str(row_data[0])))  # ID
-                self.table_inventory.setItem(row_idx, 1, QTableWidgetItem(row_data[1]))       # Marka i model
-                self.table_inventory.setItem(row_idx, 2, QTableWidgetItem(row_data[2]))       # Rozmiar
-                self.table_inventory.setItem(row_idx, 3, QTableWidgetItem(str(row_data[3])))  # Ilość
-                self.table_inventory.setItem(row_idx, 4, QTableWidgetItem(row_data[5]))       # DOT
-                self.table_inventory.setItem(row_idx, 5, QTableWidgetItem(str(row_data[4])))  # Cena
-                self.table_inventory.setItem(row_idx, 6, QTableWidgetItem(row_data[6] or "")) # Uwagi (jeśli brak danych, wstaw pusty ciąg znaków)
-
-            logger.info("Dane opon na stanie zostały załadowane (z uwzględnieniem wyszukiwania).")
-        except Exception as e:
-            logger.error(f"Błąd podczas ładowania danych opon na stanie: {e}")
-            QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas ładowania danych:\n{e}")
+        """Ładuje w tle dane o oponach na stanie do tabeli w zakładce 'Opony na stanie'."""
+        self.inventory_search.reload()
+
+    def show_inventory(self, rows, first):
+        """Dopisuje paczkę opon na stanie do tabeli (pierwsza paczka zastępuje poprzednią zawartość)."""
+        start = 0 if first else self.table_inventory.rowCount()
+        self.table_inventory.setRowCount(start + len(rows))
+        for row_idx, row_data in enumerate(rows, start):
+            # Wstawiamy dane w odpowiedniej kolejności
+            self.table_inventory.setItem(row_idx, 0, QTableWidgetItem(str(row_data.id)))
+            self.table_inventory.setItem(row_idx, 1, QTableWidgetItem(row_data.brand_model))
+            self.table_inventory.setItem(row_idx, 2, QTableWidgetItem(row_data.size))
+            self.table_inventory.setItem(row_idx, 3, QTableWidgetItem(str(row_data.quantity)))
+            self.table_inventory.setItem(row_idx, 4, QTableWidgetItem(row_data.dot))
+            self.table_inventory.setItem(row_idx, 5, QTableWidgetItem(str(row_data.price)))
+            self.table_inventory.setItem(row_idx, 6, QTableWidgetItem(row_data.notes or "")) # Uwagi (jeśli brak danych, wstaw pusty ciąg znaków)
 
 
     def open_context_menu_inventory(self, position):
@@ -1544,25 +1342,18 @@ class DepositManager(QMainWindow):
     def print_inventory_item_label(self, tire_id):
         """Pobiera dane o oponie z bazy i wywołuje podgląd oraz drukowanie etykiety (generate_tire_label)."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT brand_model, size, dot
-                FROM inventory
-                WHERE id = ?
-            ''', (tire_id,))
-            result = cursor.fetchone()
-
-            if result:
-                brand_model, size, dot = result
+            tire = self.repos.inventory.get(tire_id)
+
+            if tire:
                 logger.info("Generowanie podglądu i drukowanie etykiety dla opony...")
 
                 # Wywołanie show_preview_and_print z use_label_image=False,
                 # co oznacza użycie generate_tire_label
                 self.printer_manager.show_preview_and_print(
                     use_label_image=False,
-                    brand_model=brand_model,
-                    size=size,
-                    dot=dot,
+                    brand_model=tire.brand_model,
+                    size=tire.size,
+                    dot=tire.dot,
                     serial_port="COM3"
                 )
             else:
@@ -1576,9 +1367,8 @@ class DepositManager(QMainWindow):
 
     def edit_inventory_item(self, tire_id):
         """Edytuje wybraną oponę."""
-        dialog = InventoryItemDialog(self.conn, tire_id, parent=self)
+        dialog = InventoryItemDialog(self.repos, tire_id, parent=self)
         if dialog.exec() == QDialog.Accepted:
-            self.load_inventory()
             QMessageBox.information(self, "Sukces", "Opona została zaktualizowana.")
 
 
@@ -1589,10 +1379,7 @@ class DepositManager(QMainWindow):
                                         QMessageBox.Yes | QMessageBox.No)
         if confirm == QMessageBox.Yes:
             try:
-                cursor = self.conn.cursor()
-                cursor.execute("DELETE FROM inventory WHERE id = ?", (tire_id,))
-                self.conn.commit()
-                self.load_inventory()
+                self.repos.inventory.delete(tire_id)
                 QMessageBox.information(self, "Sukces", "Opona została usunięta.")
             except sqlite3.Error as e:
                 QMessageBox.critical(self, "Błąd", f"Błąd bazy danych: {e}")
@@ -1611,7 +1398,7 @@ class DepositManager(QMainWindow):
 
     def view_email_history(self):
         """Wyświetla historię wysłanych e-maili."""
-        dialog = EmailHistoryDialog(self.conn, self)
+        dialog = EmailHistoryDialog(self.repos, self)
         dialog.exec()
 
     def printer_settings(self):
@@ -1626,153 +1413,206 @@ class DepositManager(QMainWindow):
         if dialog.exec():
             self.load_locations()
 
-    def load_active_deposits(self):
-        """Ładuje aktywne depozyty z bazy danych i wyświetla je w tabeli."""
+    def query_error_handler(self, message):
+        """Funkcja zwrotna błędu zapytania w tle - komunikat z kodem błędu jak dla zapytań w oknie."""
+        def on_error(error_code):
+            QMessageBox.critical(self, "Błąd", f"{message}\nKod błędu:\n{error_code}")
+        return on_error
+
+    def init_search_controllers(self):
+        """Paski wyszukiwania: opóźnienie do przerwy w pisaniu, anulowanie i zawężanie wyników w pamięci."""
+        self.active_search = SearchController(
+            self.search_bar_active, self.db, "deposits.active",
+            lambda repos: repos.deposits, lambda deposits, text: deposits.list_active(text, self.active_hidden_columns),
+            self.active_model.add_rows,
+            rows_by_ids=lambda deposits, ids: deposits.list_active_by_ids(ids, self.active_hidden_columns),
+            on_update=self.active_model.update_rows,
+            on_error=self.query_error_handler("Wystąpił błąd podczas ładowania aktywnych depozytów."), parent=self)
+        self.issued_search = SearchController(
+            self.search_bar_issued, self.db, "deposits.issued",
+            lambda repos: repos.deposits, lambda deposits, text: deposits.list_issued(text),
+            self.issued_model.add_rows,
+            rows_by_ids=lambda deposits, ids: deposits.list_issued_by_ids(ids), on_update=self.issued_model.update_rows,
+            page_query=lambda deposits, after, limit: deposits.list_issued_page(after, limit),
+            page_key=DepositRepository.issued_page_key, on_page=self.issued_model.add_page, page_size=self.page_size,
+            on_error=self.query_error_handler("Wystąpił błąd podczas ładowania wydanych depozytów."), parent=self)
+        self.overdue_search = SearchController(
+            self.search_bar_overdue, self.db, "deposits.overdue",
+            lambda repos: repos.deposits, lambda deposits, text: deposits.list_overdue(text),
+            self.overdue_model.add_rows,
+            rows_by_ids=lambda deposits, ids: deposits.list_overdue_by_ids(ids),
+            on_update=self.overdue_model.update_rows,
+            on_error=self.query_error_handler("Wystąpił błąd podczas ładowania przeterminowanych depozytów."),
+            parent=self)
+        self.clients_search = SearchController(
+            self.search_bar_clients, self.db, "clients",
+            lambda repos: repos.clients, lambda clients, text: clients.list(text),
+            self.clients_model.add_rows,
+            rows_by_ids=lambda clients, ids: clients.list_by_ids(ids), on_update=self.clients_model.update_rows,
+            on_error=self.query_error_handler("Wystąpił błąd podczas ładowania klientów."), parent=self)
+        self.orders_search = SearchController(
+            self.search_bar_orders, self.db, "orders",
+            lambda repos: repos.orders, lambda orders, text: orders.list(text),
+            self.orders_model.add_rows,
+            rows_by_ids=lambda orders, ids: orders.list_by_ids(ids), on_update=self.orders_model.update_rows,
+            page_query=lambda orders, after, limit: orders.list_page(after, limit),
+            page_key=OrderRepository.page_key, on_page=self.orders_model.add_page, page_size=self.page_size,
+            on_error=self.query_error_handler("Wystąpił błąd podczas ładowania zamówień."), parent=self)
+        self.inventory_search = SearchController(
+            self.search_bar_inventory, self.db, "inventory",
+            lambda repos: repos.inventory, lambda inventory, text: inventory.list(text.strip()),
+            self.show_inventory,
+            on_done=lambda _: logger.info("Dane opon na stanie zostały załadowane (z uwzględnieniem wyszukiwania)."),
+            on_error=self.query_error_handler("Wystąpił błąd podczas ładowania danych opon na stanie."), parent=self)
+        # Historia wydanych depozytów i zamówień - kolejne strony przy przewijaniu do końca tabeli
+        self.issued_model.fetch_next_page = self.issued_search.next_page
+        self.orders_model.fetch_next_page = self.orders_search.next_page
+
+    def init_tab_loading(self):
+        """Zakładki ładowane przy pierwszym otwarciu; zmiany w ukrytej zakładce tylko oznaczają ją jako nieaktualną."""
+        self.tab_refreshers = {
+            self.active_tab: self.active_search.refresh,
+            self.issued_tab: self.issued_search.refresh,
+            self.overdue_tab: self.overdue_search.refresh,
+            self.clients_tab: self.clients_search.refresh,
+            self.orders_tab: self.orders_search.refresh,
+            self.inventory_tab: self.inventory_search.refresh,
+            self.stats_tab: lambda ids: self.load_statistics(),
+            self.analytics_tab: lambda ids: self.load_analytics(),
+        }
+        # Tabele, z których czyta zakładka - ich liczniki zapisów mówią, czy widok jest aktualny
+        self.tab_tables = {
+            self.active_tab: ("deposits", "clients"),
+            self.issued_tab: ("deposits", "clients"),
+            self.overdue_tab: ("deposits", "clients"),
+            self.clients_tab: ("clients",),
+            self.orders_tab: ("orders", "clients"),
+            self.inventory_tab: ("inventory",),
+            self.stats_tab: ("deposits",),
+            self.analytics_tab: ("deposits",),
+        }
+        # Zakładki z wartościami liczonymi od dzisiejszej daty (czas trwania, dni po terminie)
+        self.date_dependent_tabs = {self.active_tab, self.overdue_tab, self.stats_tab, self.analytics_tab}
+        # Zakładka -> zbiór ID do odświeżenia przy otwarciu (None - pełne przeładowanie)
+        self.stale_tabs = {tab: None for tab in self.tab_refreshers}
+        self.tabs.currentChanged.connect(self.load_current_tab)
+        self.deposit_tabs.currentChanged.connect(self.load_current_tab)
+
+    def current_tab(self):
+        """Widoczna zakładka (w grupie "Depozyty" - wybrana zakładka depozytów)."""
+        tab = self.tabs.currentWidget()
+        return self.deposit_tabs.currentWidget() if tab is self.deposit_tabs else tab
+
+    def load_current_tab(self, _index=None):
+        """Ładuje widoczną zakładkę, jeśli nie była jeszcze załadowana albo jej dane się zmieniły."""
+        tab = self.current_tab()
+        if tab in self.stale_tabs:
+            self.run_tab_refresher(tab, self.stale_tabs.pop(tab))
+
+    def refresh_tab(self, tab, ids=None):
+        """Odświeża zakładkę po zmianie danych (ids=None - całość): widoczną od razu, ukrytą przy otwarciu."""
+        if tab is self.current_tab() and tab not in self.stale_tabs:
+            self.run_tab_refresher(tab, ids)
+        elif tab not in self.stale_tabs:
+            self.stale_tabs[tab] = None if ids is None else set(ids)
+        elif self.stale_tabs[tab] is not None:
+            if ids is None:
+                self.stale_tabs[tab] = None
+            else:
+                self.stale_tabs[tab].update(ids)
+
+    def run_tab_refresher(self, tab, ids):
+        # Wersje tabel z chwili odświeżenia - późniejsze zapisy wykryje check_database_changes
+        self.repos.changes.mark(tab, self.tab_tables[tab])
+        self.tab_refreshers[tab](ids)
+
+    def check_database_changes(self):
+        """Przeładowuje wyświetlone zakładki, których tabele zmieniono bez zdarzenia (np. inna instancja programu)."""
         try:
-            search_text = self.search_bar_active.text()
-            query = '''
-                SELECT deposits.id, clients.name, clients.phone_number, clients.email,
-                       deposits.car_model, deposits.registration_number,
-                       deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
-                       deposits.washing, deposits.conservation, deposits.deposit_date,
-                       deposits.season, deposits.status, deposits.duration,
-                       deposits.technical_condition, deposits.storage_date, deposits.price
-                FROM deposits
-                INNER JOIN clients ON deposits.client_id = clients.id
-                WHERE (clients.name LIKE ? OR deposits.registration_number LIKE ?)
-                  AND deposits.status = 'Aktywny'
-                ORDER BY deposits.deposit_date DESC
-            '''
-            parameters = (f'%{search_text}%', f'%{search_text}%')
-            cursor = self.conn.cursor()
-            cursor.execute(query, parameters)
-            rows = cursor.fetchall()
-
-            self.table_active.setRowCount(len(rows))
-            for row_idx, row in enumerate(rows):
-                for col_idx, value in enumerate(row):
-                    if col_idx == 10 or col_idx == 11:  # Kolumny Mycie i Konserwacja
-                        value = "Tak" if value else "Nie"
-                    if col_idx == 15:  # Czas trwania
-                        value = str(int(value)) if value else "0"
-                    item = QTableWidgetItem(str(value))
-                    self.table_active.setItem(row_idx, col_idx, item)
-                    if col_idx == 14:  # Status
-                        if value == "Aktywny":
-                            item.setBackground(QColor("lightgreen"))
-                        else:
-                            item.setBackground(QColor("lightgray"))
+            for tab, tables in self.tab_tables.items():
+                # Bez zmian w bazie to jedno odczytanie PRAGMA data_version - zakładki nie są dotykane
+                if tab not in self.stale_tabs and self.repos.changes.changed(tab, tables):
+                    self.refresh_tab(tab)
         except Exception as e:
-            error_code = traceback.format_exc()
-            QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas ładowania aktywnych depozytów.\nKod błędu:\n{error_code}")
-            logger.error(f"Błąd podczas ładowania aktywnych depozytów: {e}")
+            logger.error(f"Błąd podczas sprawdzania zmian w bazie danych: {e}")
+
+    def init_scheduler(self):
+        """Zadania okresowe z trwałymi terminami; przegapione przy zamkniętym programie wykonują się w tle po starcie."""
+        self.scheduler = JobScheduler(self.repos, DATABASE_PATH, DATABASE_PROFILE, [
+            Job("reminders", "Przypomnienia o odbiorze opon", daily(8), self.check_and_send_reminders),
+            Job("backup", "Automatyczna kopia zapasowa", daily(18), self.create_scheduled_backup),
+            Job("maintenance", "Konserwacja bazy danych", weekly(0, 7), self.maintain_database, self.show_plate_duplicates),
+            Job("day_rollover", "Zmiana dnia", utc_midnight, lambda repos: None, self.on_day_rollover),
+        ], events=self.repos.events, parent=self)
+        self.scheduler.job_failed.connect(
+            lambda name, error_code: logger.error(f"Zadanie {name} zakończyło się błędem:\n{error_code}"))
+        self.scheduler.start()
+
+    def maintain_database(self, repos):
+        """
+        Zadanie harmonogramu: kontrola (i naprawa) zestawień statystyk, ponowienie indeksu unikalnego
+        numerów rejestracyjnych, potem optymalizacja bazy. Zwraca duplikaty blokujące indeks.
+        """
+        repos.check_rollups(repair=True)
+        duplicates = repos.ensure_plate_index()
+        repos.optimize()
+        return duplicates
+
+    def show_plate_duplicates(self, duplicates):
+        """Pokazuje aktywne depozyty, przez które baza nie pilnuje jeszcze unikalności numerów rejestracyjnych."""
+        if not duplicates:
+            return
+        lines = [f"{plate_key} ({season}) - {count} aktywne depozyty" for plate_key, season, count in duplicates[:20]]
+        if len(duplicates) > 20:
+            lines.append(f"... i {len(duplicates) - 20} więcej")
+        QMessageBox.warning(self, "Zdublowane depozyty",
+                            "Te same auta mają po kilka aktywnych depozytów w tym samym sezonie:\n\n"
+                            + "\n".join(lines)
+                            + "\n\nWydaj lub popraw zdublowane depozyty - do tego czasu baza danych "
+                              "nie blokuje kolejnych duplikatów.")
+
+    def on_day_rollover(self, _result):
+        """Po północy UTC (zmiana DATE('now')) odświeża zakładki z czasem trwania i dniami po terminie."""
+        for tab in self.date_dependent_tabs:
+            self.refresh_tab(tab)
+
+    def init_event_handlers(self):
+        """Subskrypcje zdarzeń domenowych: odświeżane są tylko wiersze zmienionych rekordów."""
+        events = self.repos.events
+        events.subscribe(DepositChanged, self.on_deposits_changed)
+        events.subscribe(ClientChanged, lambda event: self.refresh_tab(self.clients_tab, event.ids))
+        events.subscribe(OrderChanged, lambda event: self.refresh_tab(self.orders_tab, event.ids))
+        events.subscribe(InventoryChanged, lambda event: self.refresh_tab(self.inventory_tab, event.ids))
+
+    def on_deposits_changed(self, event):
+        """Zmienione depozyty: ich wiersze są podmieniane lub przenoszone między zakładkami, statystyki liczone od nowa."""
+        self.refresh_tab(self.active_tab, event.ids)
+        self.refresh_tab(self.issued_tab, event.ids)
+        self.refresh_tab(self.overdue_tab, event.ids)
+        self.refresh_tab(self.stats_tab)
+        self.refresh_tab(self.analytics_tab)
+
+    def load_active_deposits(self):
+        """Ładuje aktywne depozyty w tle do modelu tabeli."""
+        self.active_search.reload()
 
     def load_issued_deposits(self):
-        """Ładuje wydane depozyty z bazy danych i wyświetla je w tabeli."""
-        try:
-            search_text = self.search_bar_issued.text()
-            query = '''
-                SELECT deposits.id, clients.name, clients.phone_number, clients.email,
-                       deposits.car_model, deposits.registration_number,
-                       deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
-                       deposits.washing, deposits.conservation, deposits.deposit_date,
-                       deposits.issue_date, deposits.season, deposits.status, deposits.duration,
-                       deposits.technical_condition, deposits.storage_date, deposits.price
-                FROM deposits
-                INNER JOIN clients ON deposits.client_id = clients.id
-                WHERE (clients.name LIKE ? OR deposits.registration_number LIKE ?)
-                  AND deposits.status = 'Wydany'
-                ORDER BY deposits.issue_date DESC
-            '''
-            parameters = (f'%{search_text}%', f'%{search_text}%')
-            cursor = self.conn.cursor()
-            cursor.execute(query, parameters)
-            rows = cursor.fetchall()
-
-            self.table_issued.setRowCount(len(rows))
-            for row_idx, row in enumerate(rows):
-                for col_idx, value in enumerate(row):
-                    if col_idx == 10 or col_idx == 11:  # Kolumny Mycie i Konserwacja
-                        value = "Tak" if value else "Nie"
-                    if col_idx == 16:  # Czas trwania
-                        value = str(int(value)) if value else "0"
-                    item = QTableWidgetItem(str(value))
-                    self.table_issued.setItem(row_idx, col_idx, item)
-                    if col_idx == 15:  # Status
-                        if value == "Wydany":
-                            item.setBackground(QColor("lightgray"))
-        except Exception as e:
-            error_code = traceback.format_exc()
-            QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas ładowania wydanych depozytów.\nKod błędu:\n{error_code}")
-            logger.error(f"Błąd podczas ładowania wydanych depozytów: {e}")
+        """Ładuje wydane depozyty w tle do modelu tabeli."""
+        self.issued_search.reload()
 
     def load_overdue_deposits(self):
-        """Ładuje przeterminowane depozyty i wyświetla je w tabeli."""
-        try:
-            search_text = self.search_bar_overdue.text()
-            query = '''
-                SELECT deposits.id, clients.name, clients.phone_number, clients.email,
-                       deposits.car_model, deposits.registration_number,
-                       deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
-                       deposits.deposit_date, deposits.expected_return_date, deposits.season, deposits.status,
-                       ROUND(julianday(DATE('now')) - julianday(deposits.expected_return_date)) as overdue_days,
-                       clients.phone_number, deposits.price
-                FROM deposits
-                INNER JOIN clients ON deposits.client_id = clients.id
-                WHERE (clients.name LIKE ? OR deposits.registration_number LIKE ?)
-                  AND deposits.status = 'Aktywny' AND deposits.expected_return_date < DATE('now')
-                ORDER BY deposits.expected_return_date ASC
-            '''
-            parameters = (f'%{search_text}%', f'%{search_text}%')
-            cursor = self.conn.cursor()
-            cursor.execute(query, parameters)
-            rows = cursor.fetchall()
-
-            self.table_overdue.setRowCount(len(rows))
-            for row_idx, row in enumerate(rows):
-                for col_idx, value in enumerate(row):
-                    if col_idx == 14:  # Przeterminowany (dni)
-                        value = str(int(value)) if value else "0"
-                    item = QTableWidgetItem(str(value))
-                    self.table_overdue.setItem(row_idx, col_idx, item)
-        except Exception as e:
-            error_code = traceback.format_exc()
-            QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas ładowania przeterminowanych depozytów.\nKod błędu:\n{error_code}")
-            logger.error(f"Błąd podczas ładowania przeterminowanych depozytów: {e}")
+        """Ładuje przeterminowane depozyty w tle do modelu tabeli."""
+        self.overdue_search.reload()
 
     def load_clients(self):
-        """Ładuje listę klientów i wyświetla w tabeli."""
-        try:
-            search_text = self.search_bar_clients.text()
-            query = '''
-                SELECT id, name, phone_number, email, additional_info, discount, barcode
-                FROM clients
-                WHERE name LIKE ?
-                ORDER BY name ASC
-            '''
-            parameters = (f'%{search_text}%',)
-            cursor = self.conn.cursor()
-            cursor.execute(query, parameters)
-            rows = cursor.fetchall()
-
-            self.table_clients.setRowCount(len(rows))
-            for row_idx, row in enumerate(rows):
-                for col_idx, value in enumerate(row):
-                    item = QTableWidgetItem(str(value))
-                    self.table_clients.setItem(row_idx, col_idx, item)
-        except Exception as e:
-            error_code = traceback.format_exc()
-            QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas ładowania klientów.\nKod błędu:\n{error_code}")
-            logger.error(f"Błąd podczas ładowania klientów: {e}")
+        """Ładuje listę klientów w tle do modelu tabeli."""
+        self.clients_search.reload()
 
     def add_deposit(self):
         """Otwiera okno dialogowe do dodawania nowego depozytu."""
         try:
-            dialog = DepositDialog(self.conn, default_location=self.default_location, parent=self)
-            if dialog.exec() == QDialog.Accepted:
-                self.load_clients()  # Odśwież listę klientów
-                self.load_active_deposits()
-                self.load_overdue_deposits()
+            dialog = DepositDialog(self.repos, default_location=self.default_location, parent=self)
+            dialog.exec()
         except Exception as e:
             logger.error(f"Błąd podczas dodawania depozytu: {e}")
             QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas dodawania depozytu:\n{traceback.format_exc()}")
@@ -1781,9 +1621,8 @@ class DepositManager(QMainWindow):
     def add_client(self):
         """Otwiera okno dialogowe do dodawania nowego klienta."""
         try:
-            dialog = AddClientDialog(self.conn, parent=self)
-            if dialog.exec() == QDialog.Accepted:
-                self.load_clients()
+            dialog = AddClientDialog(self.repos, parent=self)
+            dialog.exec()
         except Exception as e:
             error_code = traceback.format_exc()
             QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas dodawania klienta.\nKod błędu:\n{error_code}")
@@ -1809,10 +1648,10 @@ class DepositManager(QMainWindow):
             menu.addAction(delete_action)
 
             action = menu.exec(self.table_active.viewport().mapToGlobal(position))
-            selected_row = self.table_active.currentRow()
+            selected_row = self.table_active.currentIndex().row()
             if selected_row < 0:
                 return
-            deposit_id = int(self.table_active.item(selected_row, 0).text())
+            deposit_id = self.active_model.row(selected_row).id
 
             if action == edit_action:
                 self.edit_deposit(deposit_id)
@@ -1838,31 +1677,20 @@ class DepositManager(QMainWindow):
     def generate_and_print_label(self, deposit_id):
         """Generuje i drukuje etykietę dla wybranego depozytu, używając generate_label_image."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT deposits.id, clients.name, clients.phone_number, deposits.car_model,
-                    deposits.registration_number, deposits.tire_brand, deposits.tire_size, deposits.quantity
-                FROM deposits
-                INNER JOIN clients ON deposits.client_id = clients.id
-                WHERE deposits.id = ?
-            ''', (deposit_id,))
-            result = cursor.fetchone()
-
-            if result:
-                (deposit_id, client_name, phone_number, car_model,
-                registration_number, tire_brand, tire_size, quantity) = result
+            deposit = self.repos.deposits.get(deposit_id)
 
+            if deposit:
                 logger.info("Generowanie i drukowanie etykiety (A) ...")
                 
                 # Generowanie obrazu etykiety za pomocą generate_label_image (podgląd)
                 output_file = self.printer_manager.generate_label_image(
-                    client_name=client_name,
-                    phone_number=phone_number,
-                    car_model=car_model,
-                    registration_number=registration_number,
-                    tire_model=tire_brand,
-                    tire_size=tire_size,
-                    quantity=quantity,
+                    client_name=deposit.client_name,
+                    phone_number=deposit.phone_number,
+                    car_model=deposit.car_model,
+                    registration_number=deposit.registration_number,
+                    tire_model=deposit.tire_brand,
+                    tire_size=deposit.tire_size,
+                    quantity=deposit.quantity,
                     output_file="label.png",
                 )
                 
@@ -1874,13 +1702,13 @@ class DepositManager(QMainWindow):
                 # wiedziało, że ma użyć generate_label_image
                 self.printer_manager.show_preview_and_print(
                     use_label_image=True,
-                    client_name=client_name,
-                    phone_number=phone_number,
-                    car_model=car_model,
-                    registration_number=registration_number,
-                    tire_model=tire_brand,
-                    tire_size=tire_size,
-                    quantity=quantity,
+                    client_name=deposit.client_name,
+                    phone_number=deposit.phone_number,
+                    car_model=deposit.car_model,
+                    registration_number=deposit.registration_number,
+                    tire_model=deposit.tire_brand,
+                    tire_size=deposit.tire_size,
+                    quantity=deposit.quantity,
                     serial_port="COM3"
                 )
 
@@ -1908,10 +1736,10 @@ class DepositManager(QMainWindow):
             menu.addAction(delete_action)
 
             action = menu.exec(self.table_issued.viewport().mapToGlobal(position))
-            selected_row = self.table_issued.currentRow()
+            selected_row = self.table_issued.currentIndex().row()
             if selected_row < 0:
                 return
-            deposit_id = int(self.table_issued.item(selected_row, 0).text())
+            deposit_id = self.issued_model.row(selected_row).id
 
             if action == edit_action:
                 self.edit_deposit(deposit_id)
@@ -1940,10 +1768,10 @@ class DepositManager(QMainWindow):
             menu.addAction(delete_action)
 
             action = menu.exec(self.table_overdue.viewport().mapToGlobal(position))
-            selected_row = self.table_overdue.currentRow()
+            selected_row = self.table_overdue.currentIndex().row()
             if selected_row < 0:
                 return
-            deposit_id = int(self.table_overdue.item(selected_row, 0).text())
+            deposit_id = self.overdue_model.row(selected_row).id
 
             if action == contact_action:
                 self.contact_client(deposit_id)
@@ -1972,10 +1800,10 @@ class DepositManager(QMainWindow):
             menu.addAction(delete_client_action)
 
             action = menu.exec(self.table_clients.viewport().mapToGlobal(position))
-            selected_row = self.table_clients.currentRow()
+            selected_row = self.table_clients.currentIndex().row()
             if selected_row < 0:
                 return
-            client_id = int(self.table_clients.item(selected_row, 0).text())
+            client_id = self.clients_model.row(selected_row).id
 
             if action == view_deposits_action:
                 self.view_client_deposits(client_id)
@@ -1997,10 +1825,7 @@ class DepositManager(QMainWindow):
         text, ok = QInputDialog.getText(self, "Przypisz kod kreskowy", "Wprowadź kod kreskowy:")
         if ok and text:
             try:
-                cursor = self.conn.cursor()
-                cursor.execute("UPDATE clients SET barcode = ? WHERE id = ?", (text, client_id))
-                self.conn.commit()
-                self.load_clients()
+                self.repos.clients.set_barcode(client_id, text)
                 QMessageBox.information(self, "Sukces", "Kod kreskowy został przypisany do klienta.")
             except Exception as e:
                 error_code = traceback.format_exc()
@@ -2010,7 +1835,7 @@ class DepositManager(QMainWindow):
     def view_client_deposits(self, client_id):
         """Wyświetla depozyty powiązane z wybranym klientem."""
         try:
-            dialog = ClientDepositsDialog(self.conn, client_id, parent=self)
+            dialog = ClientDepositsDialog(self.repos, client_id, parent=self)
             dialog.exec()
         except Exception as e:
             error_code = traceback.format_exc()
@@ -2020,9 +1845,8 @@ class DepositManager(QMainWindow):
     def edit_client(self, client_id):
         """Edytuje informacje o kliencie."""
         try:
-            dialog = EditClientDialog(self.conn, client_id, parent=self)
-            if dialog.exec() == QDialog.Accepted:
-                self.load_clients()
+            dialog = EditClientDialog(self.repos, client_id, parent=self)
+            dialog.exec()
         except Exception as e:
             error_code = traceback.format_exc()
             QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas edycji klienta.\nKod błędu:\n{error_code}")
@@ -2037,15 +1861,7 @@ class DepositManager(QMainWindow):
                 QMessageBox.Yes | QMessageBox.No
             )
             if reply == QMessageBox.Yes:
-                cursor = self.conn.cursor()
-                cursor.execute("DELETE FROM deposits WHERE client_id = ?", (client_id,))
-                cursor.execute("DELETE FROM clients WHERE id = ?", (client_id,))
-                self.conn.commit()
-                self.load_clients()
-                self.load_active_deposits()
-                self.load_issued_deposits()
-                self.load_overdue_deposits()
-                self.load_statistics()
+                self.repos.clients.delete(client_id)
         except Exception as e:
             error_code = traceback.format_exc()
             QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas usuwania klienta.\nKod błędu:\n{error_code}")
@@ -2054,12 +1870,8 @@ class DepositManager(QMainWindow):
     def edit_deposit(self, deposit_id):
         """Edytuje istniejący depozyt."""
         try:
-            dialog = DepositDialog(self.conn, deposit_id, default_location=self.default_location, parent=self)
-            if dialog.exec() == QDialog.Accepted:
-                self.load_active_deposits()
-                self.load_issued_deposits()
-                self.load_overdue_deposits()
-                self.load_statistics()
+            dialog = DepositDialog(self.repos, deposit_id, default_location=self.default_location, parent=self)
+            dialog.exec()
         except Exception as e:
             error_code = traceback.format_exc()
             QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas edycji depozytu.\nKod błędu:\n{error_code}")
@@ -2074,14 +1886,9 @@ class DepositManager(QMainWindow):
                 QMessageBox.Yes | QMessageBox.No
             )
             if reply == QMessageBox.Yes:
-                cursor = self.conn.cursor()
-                cursor.execute("DELETE FROM deposits WHERE id = ?", (deposit_id,))
-                self.conn.commit()
-                self.record_history(deposit_id, "Usunięto depozyt")
-                self.load_active_deposits()
-                self.load_issued_deposits()
-                self.load_overdue_deposits()
-                self.load_statistics()
+                with self.repos.transaction():
+                    self.repos.deposits.delete(deposit_id)
+                    self.repos.deposits.record_history(deposit_id, "Usunięto depozyt")
         except Exception as e:
             error_code = traceback.format_exc()
             QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas usuwania depozytu.\nKod błędu:\n{error_code}")
@@ -2090,19 +1897,12 @@ class DepositManager(QMainWindow):
     def generate_label(self, deposit_id):
         """Generuje etykietę PDF z opcją drukowania, otwierania lub anulowania."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT deposits.id, clients.name, deposits.tire_brand, deposits.tire_size, deposits.quantity
-                FROM deposits
-                INNER JOIN clients ON deposits.client_id = clients.id
-                WHERE deposits.id = ?
-            ''', (deposit_id,))
-            result = cursor.fetchone()
-
-            if result:
-                deposit_id, client_name, tire_brand, tire_size, quantity = result
+            deposit = self.repos.deposits.get(deposit_id)
+
+            if deposit:
                 logo_path = get_file_path("logo.png")
-                output_path = generate_pdf_label(deposit_id, client_name, tire_brand, tire_size, quantity, logo_path)
+                output_path = generate_pdf_label(deposit.id, deposit.client_name, deposit.tire_brand,
+                                                 deposit.tire_size, deposit.quantity, logo_path)
 
                 message_box = QMessageBox(self)
                 message_box.setWindowTitle("Etykieta wygenerowana")
@@ -2165,31 +1965,22 @@ class DepositManager(QMainWindow):
     def print_confirmation(self, deposit_id):
         """Generuje potwierdzenie PDF z opcją drukowania, otwierania lub anulowania."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT deposits.id, clients.name, deposits.car_model, deposits.registration_number,
-                    deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.deposit_date
-                FROM deposits
-                INNER JOIN clients ON deposits.client_id = clients.id
-                WHERE deposits.id = ?
-            ''', (deposit_id,))
-            result = cursor.fetchone()
-
-            if result:
-                deposit_id, client_name, car_model, registration_number, tire_brand, tire_size, quantity, deposit_date = result
+            deposit = self.repos.deposits.get(deposit_id)
+
+            if deposit:
                 logo_path = get_file_path("logo.png")
 
                 # Tutaj przekazujemy brakujące argumenty: company_name, company_address, company_contact, 
                 output_path = generate_pdf_confirmation(
-                    deposit_id,
-                    client_name,
+                    deposit.id,
+                    deposit.client_name,
                     [
-                        f"Model Auta: {car_model}",
-                        f"Nr Rejestracyjny: {registration_number}",
-                        f"Marka Opon: {tire_brand}",
-                        f"Rozmiar Opon: {tire_size}",
-                        f"Ilość: {quantity}",
-                        f"Data Przyjęcia: {deposit_date}",
+                        f"Model Auta: {deposit.car_model}",
+                        f"Nr Rejestracyjny: {deposit.registration_number}",
+                        f"Marka Opon: {deposit.tire_brand}",
+                        f"Rozmiar Opon: {deposit.tire_size}",
+                        f"Ilość: {deposit.quantity}",
+                        f"Data Przyjęcia: {deposit.deposit_date}",
                     ],
                     logo_path,
                     self.company_name,
@@ -2255,30 +2046,24 @@ class DepositManager(QMainWindow):
         try:
             file_path, _ = QFileDialog.getSaveFileName(self, "Eksportuj dane", "", "CSV Files (*.csv)")
             if file_path:
-                cursor = self.conn.cursor()
-                cursor.execute('''
-                    SELECT deposits.id, clients.name, clients.phone_number, clients.email,
-                           deposits.car_model, deposits.registration_number,
-                           deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.location,
-                           deposits.washing, deposits.conservation, deposits.deposit_date,
-                           deposits.status, deposits.duration, deposits.technical_condition,
-                           deposits.storage_date, deposits.price
-                    FROM deposits
-                    INNER JOIN clients ON deposits.client_id = clients.id
-                ''')
-                rows = cursor.fetchall()
-                import csv
-                with open(file_path, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    writer.writerow([
-                        "ID", "Klient", "Telefon", "E-mail", "Model auta", "Nr rejestracyjny", "Marka opon", "Rozmiar opon",
-                        "Ilość", "Lokalizacja", "Mycie",
-                        "Konserwacja", "Data depozytu", "Status", "Czas trwania (dni)", "Stan techniczny",
-                        "Data przechowywania", "Cena"
-                    ])
-                    for row in rows:
-                        writer.writerow(row)
-                    QMessageBox.information(self, "Eksport zakończony", f"Dane zostały wyeksportowane do {file_path}")
+                def export_rows(repos):
+                    # Wykonywane w wątku bazy danych - okno pozostaje responsywne
+                    import csv
+                    with open(file_path, 'w', newline='', encoding='utf-8') as f:
+                        writer = csv.writer(f)
+                        writer.writerow([
+                            "ID", "Klient", "Telefon", "E-mail", "Model auta", "Nr rejestracyjny", "Marka opon", "Rozmiar opon",
+                            "Ilość", "Lokalizacja", "Mycie",
+                            "Konserwacja", "Data depozytu", "Status", "Czas trwania (dni)", "Stan techniczny",
+                            "Data przechowywania", "Cena"
+                        ])
+                        writer.writerows(repos.deposits.export_rows())
+
+                self.db.call(
+                    "export", export_rows,
+                    on_done=lambda _: QMessageBox.information(self, "Eksport zakończony", f"Dane zostały wyeksportowane do {file_path}"),
+                    on_error=self.query_error_handler("Wystąpił błąd podczas eksportu danych.")
+                )
         except Exception as e:
             error_code = traceback.format_exc()
             QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas eksportu danych.\nKod błędu:\n{error_code}")
@@ -2289,39 +2074,28 @@ class DepositManager(QMainWindow):
         try:
             file_path, _ = QFileDialog.getOpenFileName(self, "Importuj dane", "", "CSV Files (*.csv)")
             if file_path:
-                import csv
-                with open(file_path, 'r', newline='', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    cursor = self.conn.cursor()
-                    for row in reader:
-                        # Wstaw lub zaktualizuj klienta
-                        cursor.execute("SELECT id FROM clients WHERE name = ?", (row['Klient'],))
-                        client = cursor.fetchone()
-                        if client:
-                            client_id = client[0]
-                        else:
-                            cursor.execute("INSERT INTO clients (name, phone_number, email) VALUES (?, ?, ?)", (row['Klient'], row['Telefon'], row['E-mail']))
-                            client_id = cursor.lastrowid
-                        # Wstaw depozyt
-                        cursor.execute('''
-                            INSERT INTO deposits (
-                                client_id, car_model, registration_number, tire_brand, tire_size,
-                                quantity, location, washing, conservation, deposit_date, status,
-                                technical_condition, storage_date, price
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', (
-                            client_id, row['Model auta'], row['Nr rejestracyjny'], row['Marka opon'], row['Rozmiar opon'],
-                            row['Ilość'], row['Lokalizacja'], row['Mycie'] == 'Tak',
-                            row['Konserwacja'] == 'Tak', row['Data depozytu'], row['Status'],
-                            row['Stan techniczny'], row['Data przechowywania'], row['Cena']
-                        ))
-                    self.conn.commit()
-                QMessageBox.information(self, "Import zakończony", f"Dane zostały zaimportowane z {file_path}")
-                self.load_active_deposits()
-                self.load_issued_deposits()
-                self.load_overdue_deposits()
-                self.load_clients()
-                self.load_statistics()
+                def import_rows(repos):
+                    # Wykonywane w wątku bazy danych, na jego połączeniu
+                    import csv
+                    with open(file_path, 'r', newline='', encoding='utf-8') as f, repos.bulk_import(), repos.transaction():
+                        reader = csv.DictReader(f)
+                        for row in reader:
+                            # Wstaw lub zaktualizuj klienta
+                            client_id = repos.clients.get_or_create(row['Klient'], row['Telefon'], row['E-mail'])
+                            # Wstaw depozyt
+                            repos.deposits.import_row(
+                                client_id, row['Model auta'], row['Nr rejestracyjny'], row['Marka opon'], row['Rozmiar opon'],
+                                row['Ilość'], row['Lokalizacja'], row['Mycie'] == 'Tak',
+                                row['Konserwacja'] == 'Tak', row['Data depozytu'], row['Status'],
+                                row['Stan techniczny'], row['Data przechowywania'], row['Cena']
+                            )
+
+                def on_imported(_):
+                    # Tabele odświeżają się same po zdarzeniach z wątku bazy danych
+                    QMessageBox.information(self, "Import zakończony", f"Dane zostały zaimportowane z {file_path}")
+
+                self.db.call("import", import_rows, on_done=on_imported,
+                             on_error=self.query_error_handler("Wystąpił błąd podczas importu danych."))
         except Exception as e:
             error_code = traceback.format_exc()
             QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas importu danych.\nKod błędu:\n{error_code}")
@@ -2337,18 +2111,9 @@ class DepositManager(QMainWindow):
     def mark_as_issued(self, deposit_id):
         """Oznacza depozyt jako wydany."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                UPDATE deposits
-                SET status = 'Wydany', issue_date = ?
-                WHERE id = ?
-            ''', (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), deposit_id))
-            self.conn.commit()
-            self.record_history(deposit_id, "Oznaczono jako wydany")
-            self.load_active_deposits()
-            self.load_issued_deposits()
-            self.load_overdue_deposits()
-            self.load_statistics()
+            with self.repos.transaction():
+                self.repos.deposits.mark_issued(deposit_id)
+                self.repos.deposits.record_history(deposit_id, "Oznaczono jako wydany")
         except Exception as e:
             error_code = traceback.format_exc()
             QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas oznaczania depozytu jako wydany.\nKod błędu:\n{error_code}")
@@ -2357,48 +2122,35 @@ class DepositManager(QMainWindow):
     def mark_as_active(self, deposit_id):
         """Oznacza depozyt jako aktywny."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                UPDATE deposits
-                SET status = 'Aktywny', issue_date = NULL
-                WHERE id = ?
-            ''', (deposit_id,))
-            self.conn.commit()
-            self.record_history(deposit_id, "Oznaczono jako aktywny")
-            self.load_active_deposits()
-            self.load_issued_deposits()
-            self.load_overdue_deposits()
-            self.load_statistics()
+            # Sprawdzenie i komunikat przed transakcją - okno dialogowe nie trzyma blokady zapisu bazy
+            deposit = self.repos.deposits.get(deposit_id)
+            if deposit:
+                duplicate_id = self.repos.deposits.find_active_duplicate(
+                    deposit.registration_number, deposit.season, deposit_id)
+                if duplicate_id:
+                    QMessageBox.warning(self, "Błąd", f"Aktywny depozyt auta {deposit.registration_number} w sezonie "
+                                                      f"{deposit.season} już istnieje (ID {duplicate_id}).")
+                    return
+            with self.repos.transaction():
+                self.repos.deposits.mark_active(deposit_id)
+                self.repos.deposits.record_history(deposit_id, "Oznaczono jako aktywny")
         except Exception as e:
             error_code = traceback.format_exc()
             QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas oznaczania depozytu jako aktywny.\nKod błędu:\n{error_code}")
             logger.error(f"Błąd podczas oznaczania depozytu jako aktywny: {e}")
 
-    def record_history(self, deposit_id, description):
-        """Rejestruje zmianę w historii."""
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO history (deposit_id, change_date, user, description)
-                VALUES (?, ?, ?, ?)
-            ''', (
-                deposit_id,
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                "Użytkownik",  # Możesz zastąpić to faktycznym użytkownikiem
-                description
-            ))
-            self.conn.commit()
-        except Exception as e:
-            logger.error(f"Błąd podczas rejestrowania historii: {e}")
-
     def open_settings(self):
         """Otwiera okno ustawień aplikacji."""
         try:
             dialog = SettingsDialog(self)
             if dialog.exec():  # Wywołanie `exec()` tylko raz
                 self.load_settings()
-                self.load_active_deposits()
-                self.load_statistics()
+                self.issued_search.page_size = self.page_size
+                self.orders_search.page_size = self.page_size
+                self.refresh_tab(self.active_tab)
+                self.refresh_tab(self.issued_tab)
+                self.refresh_tab(self.orders_tab)
+                self.refresh_tab(self.stats_tab)
                 QMessageBox.information(self, "Ustawienia", "Ustawienia zostały zaktualizowane.")
             else:
                 logger.info("Zmiany w ustawieniach zostały anulowane.")
@@ -2415,7 +2167,8 @@ class DepositManager(QMainWindow):
                 os.makedirs(self.backup_folder)
             backup_name = f"backup_{datetime.now().strftime('%Y%m%d%H%M%S')}.db"
             backup_path = os.path.join(self.backup_folder, backup_name)
-            shutil.copy(DATABASE_NAME, backup_path)
+            # Kopia przez API backup, bo w trybie WAL część danych może być jeszcze w pliku -wal
+            self.repos.backup(backup_path)
             QMessageBox.information(self, "Kopia zapasowa", f"Kopia zapasowa została utworzona: {backup_path}")
         except Exception as e:
             error_code = traceback.format_exc()
@@ -2423,133 +2176,176 @@ class DepositManager(QMainWindow):
             logger.error(f"Błąd podczas tworzenia kopii zapasowej: {e}")
 
     def load_statistics(self):
-        """Ładuje i wyświetla statystyki."""
+        """Ładuje statystyki w tle (części niezmienione od ostatniego zapisu - z pamięci) i wyświetla wynik."""
+        self.db.call("statistics", lambda repos: repos.statistics.summary(),
+                     self.show_statistics,
+                     on_error=self.query_error_handler("Wystąpił błąd podczas ładowania statystyk."))
+
+    def show_statistics(self, result):
+        """Wyświetla statystyki i wykres depozytów w czasie."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM deposits WHERE status = 'Aktywny'")
-            active_count = cursor.fetchone()[0]
-            cursor.execute("SELECT COUNT(*) FROM deposits WHERE status = 'Wydany'")
-            issued_count = cursor.fetchone()[0]
-            cursor.execute("SELECT AVG(duration) FROM deposits WHERE duration IS NOT NULL")
-            avg_duration = cursor.fetchone()[0] or 0
-
-            # Raport finansowy
-            cursor.execute("SELECT SUM(price) FROM deposits WHERE status = 'Aktywny'")
-            total_income = cursor.fetchone()[0] or 0
+            if result == self.shown_statistics:
+                return
+            stats, data, by_season, by_location = result
 
             stats_text = f"""
             <h2>Statystyki</h2>
-            <p>Liczba aktywnych depozytów: {active_count}</p>
-            <p>Liczba wydanych depozytów: {issued_count}</p>
-            <p>Średni czas trwania depozytu: {avg_duration:.2f} dni</p>
-            <p>Przychody z aktywnych depozytów: {total_income} PLN</p>
-            """
-
-            # Wykres
-            cursor.execute('''
-                SELECT strftime('%Y-%m', deposit_date) as month, COUNT(*) FROM deposits
-                GROUP BY month
-                ORDER BY month
-            ''')
-            data = cursor.fetchall()
-            months = [row[0] for row in data]
-            counts = [row[1] for row in data]
-
-            plt.figure(figsize=(8, 4))
-            plt.bar(months, counts)
-            plt.xlabel('Miesiąc')
-            plt.ylabel('Liczba depozytów')
-            plt.title('Depozyty w czasie')
-            plt.tight_layout()
-            plt.savefig('stats.png')
-            plt.close()
+            <p>Liczba aktywnych depozytów: {stats.active_count}</p>
+            <p>Liczba wydanych depozytów: {stats.issued_count}</p>
+            <p>Średni czas trwania depozytu: {stats.avg_duration:.2f} dni</p>
+            <p>Przychody z aktywnych depozytów: {stats.active_income} PLN</p>
+            """ + self.rollup_html("Sezon", by_season) + self.rollup_html("Lokalizacja", by_location)
 
             self.stats_label.setText(stats_text)
-            pixmap = QPixmap('stats.png')
-            self.stats_image.setPixmap(pixmap)
+            # Wykres rysowany w oknie z danych zagregowanych w bazie
+            self.stats_chart.set_data([row.month or "brak daty" for row in data], [row.count for row in data])
+            self.shown_statistics = result
         except Exception as e:
             error_code = traceback.format_exc()
             QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas ładowania statystyk.\nKod błędu:\n{error_code}")
             logger.error(f"Błąd podczas ładowania statystyk: {e}")
 
-    def update_deposit_durations(self):
-        """Aktualizuje czas trwania depozytów."""
+    def rollup_html(self, title, rows):
+        """Tabela HTML zestawienia (sezon, lokalizacja) do etykiety statystyk."""
+        cells = "".join(
+            f"<tr><td>{row.bucket or 'brak'}</td><td align='right'>{row.active_count}</td>"
+            f"<td align='right'>{row.issued_count}</td><td align='right'>{row.active_income} PLN</td></tr>"
+            for row in rows
+        )
+        return (f"<table cellspacing='0' cellpadding='3' style='margin-top: 8px'>"
+                f"<tr><th align='left'>{title}</th><th>Aktywne</th><th>Wydane</th><th>Przychód z aktywnych</th></tr>"
+                f"{cells}</table>")
+
+    def load_analytics(self):
+        """Ładuje analizy w tle; bez zapisu do depozytów od poprzedniego odczytu wyniki pochodzą z pamięci."""
+        period = self.rush_period_combo.currentData()
+        if period is None:
+            return
+        start, end = period
+        self.db.call("analytics", lambda repos: repos.dashboard.dashboard(start, end),
+                     self.show_analytics,
+                     on_error=self.query_error_handler("Wystąpił błąd podczas ładowania analiz."))
+
+    def show_analytics(self, result):
+        """Wyświetla stan magazynu, ruch w wybranym okresie szczytu, czas przechowania i przychód."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                UPDATE deposits
-                SET duration = ROUND(julianday(CASE WHEN issue_date IS NULL THEN DATE('now') ELSE issue_date END) - julianday(deposit_date))
-                WHERE deposit_date IS NOT NULL
-            ''')
-            self.conn.commit()
-            self.load_active_deposits()
-            self.load_issued_deposits()
-            self.load_overdue_deposits()
-            self.load_statistics()
+            if result == self.shown_analytics:
+                return
+            occupancy, throughput, dwell, revenue = result
+
+            self.throughput_chart.set_data([row.day[5:] for row in throughput],
+                                           [row.check_ins + row.check_outs for row in throughput])
+            if throughput:
+                busiest = max(throughput, key=lambda row: row.check_ins + row.check_outs)
+                peak = max(throughput, key=lambda row: row.moving_average)
+                self.throughput_label.setText(f"""
+                <h3>{self.rush_period_combo.currentText()}</h3>
+                <p>Przyjęcia: {sum(row.check_ins for row in throughput)}</p>
+                <p>Wydania: {sum(row.check_outs for row in throughput)}</p>
+                <p>Najwięcej w jednym dniu: {busiest.check_ins + busiest.check_outs} ({busiest.day})</p>
+                <p>Najwyższa średnia z 7 dni: {peak.moving_average} (do {peak.day})</p>
+                """)
+            else:
+                self.throughput_label.setText("")
+
+            self.revenue_chart.set_data([row.month for row in revenue], [row.revenue for row in revenue])
+            dwell_cells = "".join(
+                f"<tr><td>{row.season or 'brak'}</td><td align='right'>{row.count}</td>"
+                f"<td align='right'>{row.average_days}</td><td align='right'>{row.median_days}</td>"
+                f"<td align='right'>{row.max_days:.0f}</td></tr>"
+                for row in dwell
+            )
+            revenue_cells = "".join(
+                f"<tr><td>{row.month}</td><td align='right'>{row.deposits}</td><td align='right'>{row.revenue} PLN</td>"
+                f"<td align='right'>{'' if row.change is None else f'{row.change:+.2f}'}</td>"
+                f"<td align='right'>{row.year_to_date} PLN</td></tr>"
+                for row in revenue
+            )
+            self.analytics_label.setText(
+                "<h3>Czas przechowania (wydane w ostatnich 2 latach)</h3>"
+                "<table cellspacing='0' cellpadding='3'><tr><th align='left'>Sezon</th><th>Depozyty</th>"
+                f"<th>Średnio [dni]</th><th>Mediana [dni]</th><th>Najdłużej [dni]</th></tr>{dwell_cells}</table>"
+                "<h3>Przychód w miesiącach</h3>"
+                "<table cellspacing='0' cellpadding='3'><tr><th align='left'>Miesiąc</th><th>Depozyty</th>"
+                f"<th>Przychód</th><th>Zmiana</th><th>Od początku roku</th></tr>{revenue_cells}</table>"
+            )
+
+            months = {month: column for column, month in enumerate(sorted({row.month for row in occupancy}))}
+            locations = {location: index for index, location in enumerate(dict.fromkeys(row.location for row in occupancy))}
+            self.occupancy_table.clear()
+            self.occupancy_table.setRowCount(len(locations))
+            self.occupancy_table.setColumnCount(len(months))
+            self.occupancy_table.setHorizontalHeaderLabels(list(months))
+            self.occupancy_table.setVerticalHeaderLabels([location or "brak" for location in locations])
+            for row in occupancy:
+                item = QTableWidgetItem(str(row.deposits))
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.occupancy_table.setItem(locations[row.location], months[row.month], item)
+            self.shown_analytics = result
         except Exception as e:
-            logger.error(f"Błąd podczas aktualizacji czasu trwania depozytów: {e}")
+            error_code = traceback.format_exc()
+            QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas ładowania analiz.\nKod błędu:\n{error_code}")
+            logger.error(f"Błąd podczas ładowania analiz: {e}")
 
-    def check_and_send_reminders(self):
-        """Sprawdza terminy i wysyła przypomnienia do klientów."""
+    def export_statistics_chart(self):
+        """Zapisuje wykres depozytów w czasie do pliku (PDF/SVG wymagają pakietu matplotlib)."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT deposits.id, clients.name, clients.email, deposits.expected_return_date
-                FROM deposits
-                INNER JOIN clients ON deposits.client_id = clients.id
-                WHERE deposits.status = 'Aktywny'
-            ''')
-            rows = cursor.fetchall()
-            today = QDate.currentDate()
-            for row in rows:
-                deposit_id, client_name, client_email, expected_return_date = row
-                if client_email and expected_return_date:
-                    return_date = QDate.fromString(expected_return_date, 'yyyy-MM-dd')
-                    days_left = today.daysTo(return_date)
-                    if days_left == 7:  # Przypomnienie na 7 dni przed terminem
-                        subject = "Przypomnienie o odbiorze opon"
-                        body = f"Szanowny {client_name},\n\nPrzypominamy o zbliżającym się terminie odbioru opon: {expected_return_date}.\n\nPozdrawiamy,\n{self.company_name}"
-                        self.send_email(client_email, subject, body)
+            file_path, _ = QFileDialog.getSaveFileName(self, "Eksportuj wykres", "wykres_depozytow.png",
+                                                       "Obraz PNG (*.png);;Dokument PDF (*.pdf);;Grafika SVG (*.svg)")
+            if file_path:
+                export_chart(self.stats_chart, file_path)
+                QMessageBox.information(self, "Eksport zakończony", f"Wykres został zapisany do {file_path}")
         except Exception as e:
-            logger.error(f"Błąd podczas wysyłania przypomnień: {e}")
+            logger.error(f"Błąd podczas eksportu wykresu: {e}")
+            QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas eksportu wykresu:\n{e}")
+
+    def create_scheduled_backup(self, repos):
+        """Zadanie harmonogramu: automatyczna kopia zapasowa; zostaje AUTO_BACKUP_KEEP najnowszych kopii."""
+        os.makedirs(self.backup_folder, exist_ok=True)
+        backup_path = os.path.join(self.backup_folder, f"backup_auto_{datetime.now().strftime('%Y%m%d%H%M%S')}.db")
+        repos.backup(backup_path)
+        for old_backup in sorted(glob.glob(os.path.join(self.backup_folder, "backup_auto_*.db")))[:-AUTO_BACKUP_KEEP]:
+            os.remove(old_backup)
+        logger.info(f"Utworzono automatyczną kopię zapasową: {backup_path}")
+        return backup_path
+
+    def check_and_send_reminders(self, repos):
+        """
+        Zadanie harmonogramu (wątek zadania): dopisuje należne przypomnienia do kolejki wysyłki.
+        Błąd przechodzi do harmonogramu - zapisuje go w last_error i ponawia zadanie.
+        """
+        queued = queue_reminders(repos, self.company_name)
+        if any(queued.values()):
+            logger.info(f"Dodano do kolejki wysyłki przypomnienia: {queued}")
+            self.outbox.wake()
 
-    def send_email(self, to_address, subject, body):
-        """Wysyła e-mail z przypomnieniem i zapisuje historię."""
-        from_address = self.email_settings.get('email_address', '')
-        password = self.email_settings.get('email_password', '')
-        smtp_server = self.email_settings.get('smtp_server', '')
-        smtp_port = int(self.email_settings.get('smtp_port', '465'))
+    def send_email(self, to_address, subject, body, repos=None):
+        """
+        Dopisuje e-mail do kolejki wysyłki (repos - połączenie wątku, który wysyła; w trwającej transakcji
+        wiadomość zostaje zapisana razem z nią). Wysyła go w tle OutboxSender, historię zapisuje kolejka.
+        """
+        (repos or self.repos).emails.enqueue(to_address, subject, body)
+        self.outbox.wake()
 
-        msg = MIMEText(body)
-        msg['Subject'] = subject
-        msg['From'] = from_address
-        msg['To'] = to_address
+    def init_outbox(self):
+        """Wątek wysyłki e-maili z kolejki email_outbox (ponawianie, limit wiadomości na minutę)."""
+        self.outbox = OutboxSender(DATABASE_PATH, DATABASE_PROFILE, parent=self)
+        self.outbox.message_failed.connect(self.on_email_failed)
+        self.outbox.start()
 
-        try:
-            server = smtplib.SMTP_SSL(smtp_server, smtp_port)
-            server.login(from_address, password)
-            server.sendmail(from_address, [to_address], msg.as_string())
-            server.quit()
-            logger.info(f"Wysłano e-mail do {to_address}")
-            self.save_email_history(to_address, subject, body)
-        except Exception as e:
-            logger.error(f"Błąd podczas wysyłania e-maila: {e}")
+    def on_email_failed(self, outbox_id, error, final):
+        if final:
+            QMessageBox.warning(self, "Wysyłka e-maila",
+                                f"Nie udało się wysłać e-maila (nr {outbox_id} w kolejce) mimo kolejnych prób:\n{error}")
 
     def send_email_to_client(self, deposit_id):
         """Otwiera okno wysyłania e-maila do klienta."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT clients.email, clients.name, deposits.expected_return_date
-                FROM deposits
-                INNER JOIN clients ON deposits.client_id = clients.id
-                WHERE deposits.id = ?
-            ''', (deposit_id,))
-            result = cursor.fetchone()
-            if result:
-                email, client_name, expected_return_date = result
-                if email:
-                    dialog = SendEmailDialog(self.conn, email, client_name, expected_return_date, parent=self)
+            deposit = self.repos.deposits.get(deposit_id)
+            if deposit:
+                if deposit.email:
+                    dialog = SendEmailDialog(self.repos, deposit.email, deposit.client_name,
+                                             deposit.expected_return_date, parent=self)
                     dialog.exec()
                 else:
                     QMessageBox.warning(self, "Brak adresu e-mail", "Klient nie ma podanego adresu e-mail.")
@@ -2558,32 +2354,15 @@ class DepositManager(QMainWindow):
         except Exception as e:
             logger.error(f"Błąd podczas przygotowywania e-maila: {e}")
 
-    def save_email_history(self, to_address, subject, body):
-        """Zapisuje historię wysłanego e-maila."""
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO email_history (to_address, subject, body, sent_date)
-                VALUES (?, ?, ?, ?)
-            ''', (to_address, subject, body, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-            self.conn.commit()
-        except Exception as e:
-            logger.error(f"Błąd podczas zapisywania historii e-maili: {e}")
-
     def get_logo_path():
         """Pobiera ścieżkę do logo z ustawień aplikacji."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT value FROM settings WHERE key = 'company_logo'")
-        result = cursor.fetchone()
-        return result[0] if result else None
+        return self.repos.settings.get('company_logo')
 
 
     def load_settings(self):
         """Ładuje ustawienia z bazy danych."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT key, value FROM settings")
-            settings = dict(cursor.fetchall())
+            settings = self.repos.settings.all()
 
             # Ustawienia aplikacji
             self.backup_folder = settings.get('backup_folder', 'backups')
@@ -2603,6 +2382,10 @@ class DepositManager(QMainWindow):
             self.auto_print = settings.get('auto_print', 'False') == 'True'
             self.default_printer = settings.get('default_printer', '')
             self.label_printer = settings.get('label_printer', '')
+            try:
+                self.page_size = max(1, int(settings.get('page_size', PAGE_SIZE)))
+            except ValueError:
+                self.page_size = PAGE_SIZE
 
             # Ustawienia e-mail
             self.email_settings = {
@@ -2610,6 +2393,7 @@ class DepositManager(QMainWindow):
                 'email_password': settings.get('email_password', ''),
                 'smtp_server': settings.get('smtp_server', ''),
                 'smtp_port': settings.get('smtp_port', '465'),
+                'email_rate_per_minute': settings.get('email_rate_per_minute', str(DEFAULT_RATE_PER_MINUTE)),
             }
 
             # Logowanie poprawnego załadowania ustawień
@@ -2627,6 +2411,7 @@ class DepositManager(QMainWindow):
             self.auto_print = False
             self.default_printer = ''
             self.label_printer = ''
+            self.page_size = PAGE_SIZE
             self.email_settings = {
                 'email_address': '',
                 'email_password': '',
@@ -2654,6 +2439,20 @@ class DepositManager(QMainWindow):
         settings = QSettings("TireDepositManager", "MainWindow")
         settings.setValue("geometry", self.saveGeometry())
         settings.setValue("windowState", self.saveState())
+        self.scheduler.shutdown()
+        self.outbox.stop()
+        self.db.shutdown()
+        for name, count, total_ms, avg_ms in self.repos.stats.report()[:10]:
+            logger.debug(f"Zapytanie {name}: {count} wykonań, łącznie {total_ms:.1f} ms, średnio {avg_ms:.3f} ms")
+        if self.db.stats is not None:
+            for name, count, total_ms, avg_ms in self.db.stats.report()[:10]:
+                logger.debug(f"Zapytanie w tle {name}: {count} wykonań, łącznie {total_ms:.1f} ms, średnio {avg_ms:.3f} ms")
+        if self.db.statistics is not None:
+            for name, hits, misses, total_ms in self.db.statistics.counters():
+                logger.debug(f"Statystyki {name}: z pamięci {hits}, przeliczeń {misses}, łącznie {total_ms:.1f} ms")
+        if self.db.dashboard is not None:
+            for name, hits, misses, total_ms in self.db.dashboard.counters():
+                logger.debug(f"Analizy {name}: z pamięci {hits}, przeliczeń {misses}, łącznie {total_ms:.1f} ms")
         super().closeEvent(event)
 
     def handle_barcode_scanned(self):
@@ -2661,12 +2460,9 @@ class DepositManager(QMainWindow):
         barcode, ok = QInputDialog.getText(self, "Skanuj kartę", "Zeskanuj kod kreskowy klienta:")
         if ok and barcode:
             try:
-                cursor = self.conn.cursor()
-                cursor.execute("SELECT id FROM clients WHERE barcode = ?", (barcode,))
-                result = cursor.fetchone()
-                if result:
-                    client_id = result[0]
-                    QMessageBox.information(self, "Sukces", f"Znaleziono klienta o ID: {client_id}")
+                client = self.repos.clients.find_by_barcode(barcode)
+                if client:
+                    QMessageBox.information(self, "Sukces", f"Znaleziono klienta o ID: {client.id}")
                 else:
                     QMessageBox.warning(self, "Nie znaleziono", "Nie znaleziono klienta z tym kodem kreskowym.")
             except Exception as e:
@@ -2708,28 +2504,44 @@ class DepositManager(QMainWindow):
         """Obsługuje zeskanowanie kodu kreskowego klienta."""
         barcode, ok = QInputDialog.getText(self, "Skanuj kartę", "Zeskanuj kod kreskowy klienta:")
         if ok and barcode:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT id FROM clients WHERE barcode = ?", (barcode,))
-            client = cursor.fetchone()
+            client = self.repos.clients.find_by_barcode(barcode)
             if client:
-                client_id = client[0]
-                self.open_client_vehicles_dialog(client_id)
+                self.open_client_vehicles_dialog(client.id)
             else:
                 QMessageBox.warning(self, "Nie znaleziono", "Nie znaleziono klienta z podanym kodem kreskowym.")
 
+    def handle_plate_scanned(self):
+        """Wyszukuje depozyt po numerze rejestracyjnym (spacje, myślniki i wielkość liter bez znaczenia)."""
+        registration_number = self.plate_input.text().strip()
+        if not registration_number:
+            return
+        try:
+            deposits = self.repos.deposits.find_by_plate(registration_number)
+            active = [deposit for deposit in deposits if deposit.status == "Aktywny"]
+            if not deposits:
+                QMessageBox.warning(self, "Nie znaleziono", f"Nie znaleziono depozytu dla numeru {registration_number}.")
+            elif len(active) == 1 or len(deposits) == 1:
+                self.view_deposit_details((active or deposits)[0].id)
+            else:
+                # Kilka aktywnych depozytów (różne sezony) - pokaż je na liście
+                self.tabs.setCurrentWidget(self.deposit_tabs)
+                self.deposit_tabs.setCurrentWidget(self.active_tab)
+                self.search_bar_active.setText(registration_number)
+            self.plate_input.clear()
+        except Exception as e:
+            QMessageBox.critical(self, "Błąd", f"Błąd podczas wyszukiwania numeru rejestracyjnego: {e}")
+            logger.error(f"Błąd podczas wyszukiwania numeru rejestracyjnego: {e}")
+
     def open_client_vehicles_dialog(self, client_id):
         """Otwiera okno z pojazdami i depozytami klienta."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT name FROM clients WHERE id = ?", (client_id,))
-            result = cursor.fetchone()
+            client = self.repos.clients.get(client_id)
 
-            if not result:
+            if not client:
                 QMessageBox.warning(self, "Błąd", "Nie znaleziono klienta.")
                 return
 
-            client_name = result[0]
-            dialog = ClientVehiclesDialog(self.conn, client_id, client_name, parent=self)
+            dialog = ClientVehiclesDialog(self.repos, client_id, client.name, parent=self)
             dialog.exec()
         except sqlite3.Error as e:
             QMessageBox.critical(self, "Błąd", f"Błąd podczas otwierania okna pojazdów klienta: {e}")
@@ -2738,17 +2550,9 @@ class DepositManager(QMainWindow):
     def contact_client(self, deposit_id):
         """Otwiera okno dialogowe do kontaktu z klientem."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT clients.name, clients.phone_number, clients.email
-                FROM deposits
-                INNER JOIN clients ON deposits.client_id = clients.id
-                WHERE deposits.id = ?
-            ''', (deposit_id,))
-            result = cursor.fetchone()
-            if result:
-                client_name, phone_number, email = result
-                message = f"Klient: {client_name}\nTelefon: {phone_number}\nE-mail: {email}"
+            deposit = self.repos.deposits.get(deposit_id)
+            if deposit and deposit.client_name is not None:
+                message = f"Klient: {deposit.client_name}\nTelefon: {deposit.phone_number}\nE-mail: {deposit.email}"
                 QMessageBox.information(self, "Dane kontaktowe", message)
             else:
                 QMessageBox.warning(self, "Błąd", "Nie znaleziono danych klienta.")
@@ -2758,18 +2562,18 @@ class DepositManager(QMainWindow):
     def view_deposit_details(self, deposit_id):
         """Wyświetla szczegóły depozytu."""
         try:
-            dialog = DepositDetailsDialog(self.conn, deposit_id, parent=self)
+            dialog = DepositDetailsDialog(self.repos, deposit_id, parent=self)
             dialog.exec()
         except Exception as e:
             logger.error(f"Błąd podczas wyświetlania szczegółów depozytu: {e}")
 
 class ColumnManagerDialog(QDialog):
     """Dialog do zarządzania widocznymi kolumnami."""
-    def __init__(self, table, conn, tab_name, parent=None):
+    def __init__(self, table, repos, tab_name, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Zarządzaj kolumnami")
         self.table = table
-        self.conn = conn
+        self.repos = repos
         self.tab_name = tab_name
         self.layout = QVBoxLayout(self)
 
@@ -2777,9 +2581,9 @@ class ColumnManagerDialog(QDialog):
         self.checkboxes = []
 
         # Pobieranie nazw kolumn
-        column_count = self.table.columnCount()
-        for col in range(column_count):
-            checkbox = QCheckBox(self.table.horizontalHeaderItem(col).text())
+        model = self.table.model()
+        for col in range(model.columnCount()):
+            checkbox = QCheckBox(model.headerData(col, Qt.Horizontal))
             checkbox.setChecked(not self.table.isColumnHidden(col))
             self.checkboxes.append((col, checkbox))
             self.checkbox_layout.addWidget(checkbox)
@@ -2799,19 +2603,10 @@ class ColumnManagerDialog(QDialog):
     def save_column_settings(self):
         """Zapisuje ustawienia widoczności kolumn w bazie danych."""
         try:
-            cursor = self.conn.cursor()
-
-            # Usuń poprzednie ustawienia
-            cursor.execute("DELETE FROM column_settings WHERE tab_name = ?", (self.tab_name,))
-
-            # Zapisz nowe ustawienia
-            for col, checkbox in self.checkboxes:
-                cursor.execute(
-                    "INSERT INTO column_settings (tab_name, column_index, visible) VALUES (?, ?, ?)",
-                    (self.tab_name, col, checkbox.isChecked())
-                )
-
-            self.conn.commit()
+            # Zastąp poprzednie ustawienia nowymi
+            self.repos.settings.save_column_visibility(
+                self.tab_name, [(col, checkbox.isChecked()) for col, checkbox in self.checkboxes]
+            )
             QMessageBox.information(self, "Sukces", "Ustawienia kolumn zostały zapisane.")
             self.accept()
         except sqlite3.Error as e:
@@ -2820,9 +2615,9 @@ class ColumnManagerDialog(QDialog):
 
 class OrderDialog(QDialog):
     """Dialog do dodawania i edycji zamówień."""
-    def __init__(self, conn, order_id=None, parent=None):
+    def __init__(self, repos, order_id=None, parent=None):
         super().__init__(parent)
-        self.conn = conn
+        self.repos = repos
         self.order_id = order_id
         self.setWindowTitle("Dodaj zamówienie" if order_id is None else "Edytuj zamówienie")
         self.resize(800, 600)
@@ -2908,9 +2703,7 @@ class OrderDialog(QDialog):
     def get_client_names(self):
         """Pobiera listę nazw klientów z bazy danych."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT name FROM clients")
-            return [row[0] for row in cursor.fetchall()]
+            return self.repos.clients.names()
         except Exception as e:
             logger.error(f"Błąd podczas pobierania klientów: {e}")
             return []
@@ -2919,11 +2712,9 @@ class OrderDialog(QDialog):
         """Aktualizuje numer telefonu na podstawie wybranego klienta."""
         client_name = self.client_field.text()
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT phone_number FROM clients WHERE name = ?", (client_name,))
-            result = cursor.fetchone()
-            if result:
-                self.phone_label.setText(f"Numer telefonu: {result[0]}")
+            phone_number = self.repos.clients.phone_by_name(client_name)
+            if phone_number is not None:
+                self.phone_label.setText(f"Numer telefonu: {phone_number}")
             else:
                 self.phone_label.setText("Numer telefonu: -")
         except Exception as e:
@@ -2933,7 +2724,7 @@ class OrderDialog(QDialog):
     def add_client(self):
         """Otwiera okno dialogowe do dodawania nowego klienta."""
         try:
-            dialog = AddClientDialog(self.conn, parent=self)
+            dialog = AddClientDialog(self.repos, parent=self)
             if dialog.exec() == QDialog.Accepted:
                 self.client_completer.model().setStringList(self.get_client_names())
         except Exception as e:
@@ -2996,28 +2787,17 @@ class OrderDialog(QDialog):
 
     def load_order_data(self):
         """Ładuje dane zamówienia do formularza."""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT client_id, order_date, expected_delivery_date, status, notes
-            FROM orders WHERE id = ?
-        ''', (self.order_id,))
-        order = cursor.fetchone()
+        order = self.repos.orders.get(self.order_id)
         if order:
-            client_id = order[0]
-            client_name = cursor.execute("SELECT name FROM clients WHERE id = ?", (client_id,)).fetchone()[0]
-            self.client_field.setText(client_name)
-            order_date = QDate.fromString(order[1], 'yyyy-MM-dd')
+            self.client_field.setText(order.client_name)
+            order_date = QDate.fromString(order.order_date, 'yyyy-MM-dd')
             self.order_date_input.setDate(order_date)
-            expected_delivery_date = QDate.fromString(order[2], 'yyyy-MM-dd')
+            expected_delivery_date = QDate.fromString(order.expected_delivery_date, 'yyyy-MM-dd')
             self.expected_delivery_date_input.setDate(expected_delivery_date)
-            self.status_combo.setCurrentText(order[3])
-            self.notes_input.setPlainText(order[4])
-
-            cursor.execute('''
-                SELECT tire_brand, tire_size, price, quantity
-                FROM order_items WHERE order_id = ?
-            ''', (self.order_id,))
-            items = cursor.fetchall()
+            self.status_combo.setCurrentText(order.status)
+            self.notes_input.setPlainText(order.notes)
+
+            items = self.repos.orders.items(self.order_id)
             self.items_table.setRowCount(len(items))
             for row_idx, item in enumerate(items):
                 for col_idx, value in enumerate(item):
@@ -3027,47 +2807,25 @@ class OrderDialog(QDialog):
     def save_order(self):
         """Zapisuje zamówienie do bazy danych."""
         try:
-            client_name = self.client_field.text()
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT id FROM clients WHERE name = ?", (client_name,))
-            client = cursor.fetchone()
-            if client:
-                client_id = client[0]
-            else:
-                cursor.execute("INSERT INTO clients (name) VALUES (?)", (client_name,))
-                self.conn.commit()
-                client_id = cursor.lastrowid
-
             order_date = self.order_date_input.date().toString('yyyy-MM-dd')
             expected_delivery_date = self.expected_delivery_date_input.date().toString('yyyy-MM-dd')
             status = self.status_combo.currentText()
             notes = self.notes_input.toPlainText()
 
-            if self.order_id:
-                cursor.execute('''
-                    UPDATE orders
-                    SET client_id = ?, order_date = ?, expected_delivery_date = ?, status = ?, notes = ?
-                    WHERE id = ?
-                ''', (client_id, order_date, expected_delivery_date, status, notes, self.order_id))
-            else:
-                cursor.execute('''
-                    INSERT INTO orders (client_id, order_date, expected_delivery_date, status, notes)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (client_id, order_date, expected_delivery_date, status, notes))
-                self.order_id = cursor.lastrowid
-
-            cursor.execute("DELETE FROM order_items WHERE order_id = ?", (self.order_id,))
+            items = []
             for row in range(self.items_table.rowCount()):
                 tire_brand = self.items_table.item(row, 0).text()
                 tire_size = self.items_table.item(row, 1).text()
                 price = self.items_table.item(row, 2).text()
                 quantity = self.items_table.item(row, 3).text()
-                cursor.execute('''
-                    INSERT INTO order_items (order_id, tire_brand, tire_size, price, quantity)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (self.order_id, tire_brand, tire_size, price, quantity))
+                items.append((tire_brand, tire_size, price, quantity))
 
-            self.conn.commit()
+            # Nowy klient i zamówienie z pozycjami - jeden commit
+            with self.repos.transaction():
+                client_id = self.repos.clients.get_or_create(self.client_field.text())
+                self.order_id = self.repos.orders.save(
+                    self.order_id, client_id, order_date, expected_delivery_date, status, notes, items
+                )
             self.accept()
         except Exception as e:
             QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas zapisywania zamówienia: {e}")
@@ -3078,9 +2836,9 @@ class OrderDialog(QDialog):
 
 
 class InventoryItemDialog(QDialog):
-    def __init__(self, conn, inventory_id=None, parent=None):
+    def __init__(self, repos, inventory_id=None, parent=None):
         super().__init__(parent)
-        self.conn = conn
+        self.repos = repos
         self.inventory_id = inventory_id
         self.setWindowTitle("Dodaj oponę" if inventory_id is None else "Edytuj oponę")
         self.layout = QVBoxLayout(self)
@@ -3123,47 +2881,21 @@ class InventoryItemDialog(QDialog):
         if inventory_id:
             self.load_inventory_data()
 
-    def update_inventory_table(conn):
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA table_info(inventory)")
-        columns = [column[1] for column in cursor.fetchall()]
-        if "notes" not in columns:
-            cursor.execute("ALTER TABLE inventory ADD COLUMN notes TEXT DEFAULT ''")
-        if "season_type" not in columns:  # Dodaj inne brakujące kolumny, jeśli są potrzebne
-            cursor.execute("ALTER TABLE inventory ADD COLUMN season_type TEXT DEFAULT 'Letnia'")
-        conn.commit()
-
-        
-
     def load_inventory_data(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT brand_model, size, quantity, price, dot, notes, season_type FROM inventory WHERE id = ?", (self.inventory_id,))
-        item = cursor.fetchone()
+        item = self.repos.inventory.get(self.inventory_id)
         if item:
-            self.brand_model_input.setText(item[0])
-            self.size_input.setText(item[1])
-            self.quantity_input.setText(str(item[2]))
-            self.price_input.setText(str(item[3]))
-            self.dot_input.setText(item[4])
-            self.notes_input.setPlainText(item[5] if len(item) > 5 and item[5] else "")
-            if len(item) > 6 and item[6]:
-                index = self.season_type_combo.findText(item[6])
+            self.brand_model_input.setText(item.brand_model)
+            self.size_input.setText(item.size)
+            self.quantity_input.setText(str(item.quantity))
+            self.price_input.setText(str(item.price))
+            self.dot_input.setText(item.dot)
+            self.notes_input.setPlainText(item.notes or "")
+            if item.season_type:
+                index = self.season_type_combo.findText(item.season_type)
                 if index >= 0:
                     self.season_type_combo.setCurrentIndex(index)
 
 
-    def update_inventory_table(conn):
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA table_info(inventory)")
-        columns = [column[1] for column in cursor.fetchall()]
-        if "brand_model" not in columns:
-            cursor.execute("ALTER TABLE inventory ADD COLUMN brand_model TEXT NOT NULL DEFAULT ''")
-        if "notes" not in columns:
-            cursor.execute("ALTER TABLE inventory ADD COLUMN notes TEXT DEFAULT ''")
-        if "season_type" not in columns:
-            cursor.execute("ALTER TABLE inventory ADD COLUMN season_type TEXT DEFAULT 'Letnia'")
-        conn.commit()
-
     def save_inventory(self):
         """Zapisuje oponę do tabeli inventory."""
         try:
@@ -3191,19 +2923,9 @@ class InventoryItemDialog(QDialog):
             quantity = int(quantity)
             price = float(price)
 
-            cursor = self.conn.cursor()
-            if self.inventory_id:
-                cursor.execute('''
-                    UPDATE inventory
-                    SET brand_model = ?, size = ?, quantity = ?, price = ?, dot = ?, notes = ?, season_type = ?
-                    WHERE id = ?
-                ''', (brand_model, size, quantity, price, dot, notes, season_type, self.inventory_id))
-            else:
-                cursor.execute('''
-                    INSERT INTO inventory (brand_model, size, quantity, price, dot, notes, season_type)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (brand_model, size, quantity, price, dot, notes, season_type))
-            self.conn.commit()
+            self.inventory_id = self.repos.inventory.save(
+                self.inventory_id, brand_model, size, quantity, price, dot, notes, season_type
+            )
 
             QMessageBox.information(self, "Sukces", "Opona została zapisana.")
             self.accept()
@@ -3229,9 +2951,9 @@ class InventoryItemDialog(QDialog):
 
 class OrderDetailsDialog(QDialog):
     """Dialog wyświetlający szczegóły zamówienia."""
-    def __init__(self, conn, order_id, parent=None):
+    def __init__(self, repos, order_id, parent=None):
         super().__init__(parent)
-        self.conn = conn
+        self.repos = repos
         self.order_id = order_id
         self.setWindowTitle("Szczegóły Zamówienia")
         self.resize(800, 600)
@@ -3239,25 +2961,18 @@ class OrderDetailsDialog(QDialog):
         self.layout = QVBoxLayout(self)
 
         # Pobierz dane zamówienia
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT orders.*, clients.name, clients.phone_number, clients.email
-            FROM orders
-            INNER JOIN clients ON orders.client_id = clients.id
-            WHERE orders.id = ?
-        ''', (self.order_id,))
-        order = cursor.fetchone()
+        order = self.repos.orders.get(self.order_id)
 
         if order:
             order_info = {
-                'ID': order[0],
-                'Klient': order[-3],
-                'Telefon': order[-2],
-                'E-mail': order[-1],
-                'Data zamówienia': order[2],
-                'Oczekiwana dostawa': order[3],
-                'Status': order[4],
-                'Uwagi': order[5]
+                'ID': order.id,
+                'Klient': order.client_name,
+                'Telefon': order.phone_number,
+                'E-mail': order.email,
+                'Data zamówienia': order.order_date,
+                'Oczekiwana dostawa': order.expected_delivery_date,
+                'Status': order.status,
+                'Uwagi': order.notes
             }
 
             # Wyświetl dane w formularzu
@@ -3278,11 +2993,7 @@ class OrderDetailsDialog(QDialog):
             self.layout.addWidget(self.items_table)
 
             # Załaduj pozycje zamówienia
-            cursor.execute('''
-                SELECT tire_brand, tire_size, price, quantity
-                FROM order_items WHERE order_id = ?
-            ''', (self.order_id,))
-            items = cursor.fetchall()
+            items = self.repos.orders.items(self.order_id)
 
             self.items_table.setRowCount(len(items))
             total = 0.0
@@ -3290,8 +3001,8 @@ class OrderDetailsDialog(QDialog):
                 for col_idx, value in enumerate(item):
                     self.items_table.setItem(row_idx, col_idx, QTableWidgetItem(str(value)))
                 # Oblicz wartość "Razem" i podsumowanie
-                price = float(item[2])
-                quantity = int(item[3])
+                price = float(item.price)
+                quantity = int(item.quantity)
                 total_price = price * quantity
                 self.items_table.setItem(row_idx, 4, QTableWidgetItem(f"{total_price:.2f}"))
                 total += total_price
@@ -3312,9 +3023,9 @@ class OrderDetailsDialog(QDialog):
 
 
 class DepositDialog(QDialog):
-    def __init__(self, conn, deposit_id=None, default_location='', parent=None):
+    def __init__(self, repos, deposit_id=None, default_location='', parent=None):
         super().__init__(parent)
-        self.conn = conn
+        self.repos = repos
         self.deposit_id = deposit_id
         self.default_location = default_location
         self.setWindowTitle("Dodaj depozyt" if deposit_id is None else "Edytuj depozyt")
@@ -3402,16 +3113,14 @@ class DepositDialog(QDialog):
 
     def load_clients(self):
         """Ładuje listę klientów do pola wyboru."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, name FROM clients")
-        clients = cursor.fetchall()
+        clients = self.repos.clients.choices()
         self.client_combo.clear()
         for client in clients:
             self.client_combo.addItem(client[1], client[0])
 
     def add_client(self):
         """Dodaje nowego klienta."""
-        dialog = AddClientDialog(self.conn, parent=self)
+        dialog = AddClientDialog(self.repos, parent=self)
         if dialog.exec() == QDialog.Accepted:
             self.load_clients()
             index = self.client_combo.findText(dialog.client_name)
@@ -3419,70 +3128,54 @@ class DepositDialog(QDialog):
                 self.client_combo.setCurrentIndex(index)
 
     def load_tire_sizes(self):
-        """Ładuje listę rozmiarów opon do autouzupełniania."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT DISTINCT tire_size FROM deposits")
-        sizes = [row[0] for row in cursor.fetchall() if row[0]]
+        """Ładuje listę rozmiarów opon (w postaci kanonicznej) do autouzupełniania."""
+        sizes = self.repos.deposits.tire_sizes()
         completer = QCompleter(sizes)
         self.tire_size_input.setCompleter(completer)
 
     def load_car_models(self):
         """Ładuje listę modeli aut do autouzupełniania."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT DISTINCT car_model FROM deposits")
-        models = [row[0] for row in cursor.fetchall() if row[0]]
+        models = self.repos.deposits.suggestions("car_model")
         completer = QCompleter(models)
         self.car_model_input.setCompleter(completer)
 
     def load_registration_numbers(self):
         """Ładuje listę numerów rejestracyjnych do autouzupełniania."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT DISTINCT registration_number FROM deposits")
-        numbers = [row[0] for row in cursor.fetchall() if row[0]]
+        numbers = self.repos.deposits.suggestions("registration_number")
         completer = QCompleter(numbers)
         self.registration_number_input.setCompleter(completer)
 
     def load_tire_brands(self):
         """Ładuje listę marek opon do autouzupełniania."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT DISTINCT tire_brand FROM deposits")
-        brands = [row[0] for row in cursor.fetchall() if row[0]]
+        brands = self.repos.deposits.suggestions("tire_brand")
         completer = QCompleter(brands)
         self.tire_brand_input.setCompleter(completer)
 
     def load_deposit_data(self):
         """Ładuje dane depozytu do formularza."""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT client_id, car_model, registration_number, tire_brand, tire_size,
-                   quantity, location, washing, conservation, status, season, expected_return_date,
-                   technical_condition, storage_date, price
-            FROM deposits WHERE id = ?
-        ''', (self.deposit_id,))
-        deposit = cursor.fetchone()
+        deposit = self.repos.deposits.get(self.deposit_id)
         if deposit:
-            client_id = deposit[0]
-            index = self.client_combo.findData(client_id)
+            index = self.client_combo.findData(deposit.client_id)
             if index >= 0:
                 self.client_combo.setCurrentIndex(index)
-            self.car_model_input.setText(deposit[1])
-            self.registration_number_input.setText(deposit[2])
-            self.tire_brand_input.setText(deposit[3])
-            self.tire_size_input.setText(deposit[4])
-            self.quantity_input.setText(str(deposit[5]))
-            self.location_input.setText(deposit[6])
-            self.washing_combo.setCurrentText("Tak" if deposit[7] else "Nie")
-            self.conservation_combo.setCurrentText("Tak" if deposit[8] else "Nie")
-            self.status_combo.setCurrentText(deposit[9])
-            self.season_combo.setCurrentText(deposit[10])
-            if deposit[11]:
-                date = QDate.fromString(deposit[11], 'yyyy-MM-dd')
+            self.car_model_input.setText(deposit.car_model)
+            self.registration_number_input.setText(deposit.registration_number)
+            self.tire_brand_input.setText(deposit.tire_brand)
+            self.tire_size_input.setText(deposit.tire_size)
+            self.quantity_input.setText(str(deposit.quantity))
+            self.location_input.setText(deposit.location)
+            self.washing_combo.setCurrentText("Tak" if deposit.washing else "Nie")
+            self.conservation_combo.setCurrentText("Tak" if deposit.conservation else "Nie")
+            self.status_combo.setCurrentText(deposit.status)
+            self.season_combo.setCurrentText(deposit.season)
+            if deposit.expected_return_date:
+                date = QDate.fromString(deposit.expected_return_date, 'yyyy-MM-dd')
                 self.expected_return_date_input.setDate(date)
-            self.technical_condition_input.setText(deposit[12])
-            if deposit[13]:
-                date = QDate.fromString(deposit[13], 'yyyy-MM-dd')
+            self.technical_condition_input.setText(deposit.technical_condition)
+            if deposit.storage_date:
+                date = QDate.fromString(deposit.storage_date, 'yyyy-MM-dd')
                 self.storage_date_input.setDate(date)
-            self.price_input.setText(str(deposit[14]))
+            self.price_input.setText(str(deposit.price))
 
     def save_deposit(self):
         """Zapisuje depozyt do bazy danych."""
@@ -3520,41 +3213,32 @@ class DepositDialog(QDialog):
                 QMessageBox.warning(self, "Błąd", "Musisz podać poprawną cenę.")
                 return
 
+            if status == "Aktywny":
+                duplicate_id = self.repos.deposits.find_active_duplicate(registration_number, season, self.deposit_id)
+                if duplicate_id:
+                    QMessageBox.warning(self, "Błąd", f"Aktywny depozyt auta {registration_number} w sezonie {season} "
+                                                      f"już istnieje (ID {duplicate_id}).")
+                    return
+
             quantity = int(quantity)
             price = float(price)
 
-            cursor = self.conn.cursor()
-            if self.deposit_id:
-                cursor.execute('''
-                    UPDATE deposits
-                    SET client_id = ?, car_model = ?, registration_number = ?, tire_brand = ?, tire_size = ?,
-                        quantity = ?, location = ?, washing = ?, conservation = ?, status = ?, season = ?, expected_return_date = ?,
-                        technical_condition = ?, storage_date = ?, price = ?
-                    WHERE id = ?
-                ''', (
-                    client_id, car_model, registration_number, tire_brand, tire_size,
-                    quantity, location, washing, conservation, status, season, expected_return_date,
-                    technical_condition, storage_date, price,
-                    self.deposit_id
-                ))
-                self.record_history(self.deposit_id, "Zaktualizowano depozyt")
-            else:
-                cursor.execute('''
-                    INSERT INTO deposits (
+            # Zapis depozytu i wpis historii - jeden commit
+            with self.repos.transaction():
+                if self.deposit_id:
+                    self.repos.deposits.update(
+                        self.deposit_id, client_id, car_model, registration_number, tire_brand, tire_size,
+                        quantity, location, washing, conservation, status, season, expected_return_date,
+                        technical_condition, storage_date, price
+                    )
+                    self.repos.deposits.record_history(self.deposit_id, "Zaktualizowano depozyt")
+                else:
+                    deposit_id = self.repos.deposits.create(
                         client_id, car_model, registration_number, tire_brand, tire_size,
-                        quantity, location, washing, conservation, deposit_date, status, season, expected_return_date,
+                        quantity, location, washing, conservation, status, season, expected_return_date,
                         technical_condition, storage_date, price
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    client_id, car_model, registration_number, tire_brand, tire_size,
-                    quantity, location, washing, conservation,
-                    datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    status, season, expected_return_date,
-                    technical_condition, storage_date, price
-                ))
-                deposit_id = cursor.lastrowid
-                self.record_history(deposit_id, "Dodano nowy depozyt")
-            self.conn.commit()
+                    )
+                    self.repos.deposits.record_history(deposit_id, "Dodano nowy depozyt")
             self.accept()
         except Exception as e:
             error_code = traceback.format_exc()
@@ -3568,27 +3252,10 @@ class DepositDialog(QDialog):
         except ValueError:
             return False
 
-    def record_history(self, deposit_id, description):
-        """Rejestruje zmianę w historii."""
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO history (deposit_id, change_date, user, description)
-                VALUES (?, ?, ?, ?)
-            ''', (
-                deposit_id,
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                "Użytkownik",  # Możesz zastąpić to faktycznym użytkownikiem
-                description
-            ))
-            self.conn.commit()
-        except Exception as e:
-            logger.error(f"Błąd podczas rejestrowania historii: {e}")
-
 class AddClientDialog(QDialog):
-    def __init__(self, conn, client_id=None, parent=None):
+    def __init__(self, repos, client_id=None, parent=None):
         super().__init__(parent)
-        self.conn = conn
+        self.repos = repos
         self.client_id = client_id
         self.client_name = ""
         self.setWindowTitle("Dodaj klienta" if client_id is None else "Edytuj klienta")
@@ -3635,19 +3302,14 @@ class AddClientDialog(QDialog):
     def load_client_data(self):
         """Ładuje dane klienta do formularza."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT name, phone_number, email, discount, additional_info, barcode
-                FROM clients WHERE id = ?
-            ''', (self.client_id,))
-            client = cursor.fetchone()
+            client = self.repos.clients.get(self.client_id)
             if client:
-                self.name_input.setText(client[0])
-                self.phone_input.setText(client[1])
-                self.email_input.setText(client[2])
-                self.discount_input.setText(str(client[3]))
-                self.additional_info_input.setText(client[4])
-                self.barcode_input.setText(client[5])
+                self.name_input.setText(client.name)
+                self.phone_input.setText(client.phone_number)
+                self.email_input.setText(client.email)
+                self.discount_input.setText(str(client.discount))
+                self.additional_info_input.setText(client.additional_info)
+                self.barcode_input.setText(client.barcode)
         except Exception as e:
             logger.error(f"Błąd podczas ładowania danych klienta: {e}")
 
@@ -3670,21 +3332,9 @@ class AddClientDialog(QDialog):
 
             discount = float(discount)
 
-            cursor = self.conn.cursor()
-            if self.client_id:
-                cursor.execute('''
-                    UPDATE clients
-                    SET name = ?, phone_number = ?, email = ?, discount = ?, additional_info = ?, barcode = ?
-                    WHERE id = ?
-                ''', (name, phone_number, email, discount, additional_info, barcode, self.client_id))
-            else:
-                cursor.execute('''
-                    INSERT INTO clients (name, phone_number, email, discount, additional_info, barcode)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (name, phone_number, email, discount, additional_info, barcode))
-                self.client_id = cursor.lastrowid
-
-            self.conn.commit()
+            self.client_id = self.repos.clients.save(
+                self.client_id, name, phone_number, email, discount, additional_info, barcode
+            )
             self.client_name = name
             self.accept()
         except Exception as e:
@@ -3705,12 +3355,9 @@ class AddClientDialog(QDialog):
         barcode = self.barcode_input.text().strip()
         if barcode:
             try:
-                cursor = self.conn.cursor()
-                cursor.execute("SELECT id, name FROM clients WHERE barcode = ?", (barcode,))
-                result = cursor.fetchone()
-                if result:
-                    client_id, name = result
-                    QMessageBox.information(self, "Sukces", f"Znaleziono klienta: {name} (ID: {client_id})")
+                client = self.repos.clients.find_by_barcode(barcode)
+                if client:
+                    QMessageBox.information(self, "Sukces", f"Znaleziono klienta: {client.name} (ID: {client.id})")
                 else:
                     QMessageBox.warning(self, "Nie znaleziono", "Nie znaleziono klienta z tym kodem kreskowym.")
             except Exception as e:
@@ -3720,14 +3367,14 @@ class AddClientDialog(QDialog):
 
 class EditClientDialog(AddClientDialog):
     """Dialog do edycji klienta."""
-    def __init__(self, conn, client_id, parent=None):
-        super().__init__(conn, client_id, parent)
+    def __init__(self, repos, client_id, parent=None):
+        super().__init__(repos, client_id, parent)
 
 class ClientDepositsDialog(QDialog):
     """Dialog wyświetlający depozyty powiązane z klientem."""
-    def __init__(self, conn, client_id, parent=None):
+    def __init__(self, repos, client_id, parent=None):
         super().__init__(parent)
-        self.conn = conn
+        self.repos = repos
         self.client_id = client_id
         self.setWindowTitle("Depozyty klienta")
         self.resize(1000, 600)  # Ustawienie większego rozmiaru okna
@@ -3761,16 +3408,7 @@ class ClientDepositsDialog(QDialog):
     def load_deposits(self):
         """Ładuje depozyty powiązane z klientem."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT id, car_model, registration_number, tire_brand, tire_size, quantity,
-                       location, washing, conservation, deposit_date, issue_date, season, status, duration,
-                       technical_condition, storage_date, price
-                FROM deposits
-                WHERE client_id = ?
-                ORDER BY deposit_date DESC
-            ''', (self.client_id,))
-            rows = cursor.fetchall()
+            rows = self.repos.deposits.list_for_client(self.client_id)
 
             self.table_deposits.setRowCount(len(rows))
             for row_idx, row in enumerate(rows):
@@ -3783,7 +3421,7 @@ class ClientDepositsDialog(QDialog):
                     self.table_deposits.setItem(row_idx, col_idx, item)
                 # Dodaj przycisk do historii
                 history_button = QPushButton("Pokaż historię")
-                history_button.clicked.connect(lambda checked, deposit_id=row[0]: self.show_history(deposit_id))
+                history_button.clicked.connect(lambda checked, deposit_id=row.id: self.show_history(deposit_id))
                 self.table_deposits.setCellWidget(row_idx, 17, history_button)
         except Exception as e:
             error_code = traceback.format_exc()
@@ -3825,7 +3463,7 @@ class ClientDepositsDialog(QDialog):
     def edit_deposit(self, deposit_id):
         """Edytuje depozyt."""
         try:
-            dialog = DepositDialog(self.conn, deposit_id, parent=self)
+            dialog = DepositDialog(self.repos, deposit_id, parent=self)
             if dialog.exec() == QDialog.Accepted:
                 self.load_deposits()
         except Exception as e:
@@ -3842,9 +3480,7 @@ class ClientDepositsDialog(QDialog):
                 QMessageBox.Yes | QMessageBox.No
             )
             if reply == QMessageBox.Yes:
-                cursor = self.conn.cursor()
-                cursor.execute("DELETE FROM deposits WHERE id = ?", (deposit_id,))
-                self.conn.commit()
+                self.repos.deposits.delete(deposit_id)
                 self.load_deposits()
         except Exception as e:
             error_code = traceback.format_exc()
@@ -3854,19 +3490,12 @@ class ClientDepositsDialog(QDialog):
     def generate_label(self, deposit_id):
         """Generuje etykietę PDF z opcją drukowania, otwierania lub anulowania."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT deposits.id, clients.name, deposits.tire_brand, deposits.tire_size, deposits.quantity
-                FROM deposits
-                INNER JOIN clients ON deposits.client_id = clients.id
-                WHERE deposits.id = ?
-            ''', (deposit_id,))
-            result = cursor.fetchone()
-
-            if result:
-                deposit_id, client_name, tire_brand, tire_size, quantity = result
+            deposit = self.repos.deposits.get(deposit_id)
+
+            if deposit:
                 logo_path = get_file_path("logo.png")
-                output_path = generate_pdf_label(deposit_id, client_name, tire_brand, tire_size, quantity, logo_path)
+                output_path = generate_pdf_label(deposit.id, deposit.client_name, deposit.tire_brand,
+                                                 deposit.tire_size, deposit.quantity, logo_path)
 
                 message_box = QMessageBox(self)
                 message_box.setWindowTitle("Etykieta wygenerowana")
@@ -3930,29 +3559,20 @@ class ClientDepositsDialog(QDialog):
     def print_confirmation(self, deposit_id):
         """Generuje potwierdzenie PDF z opcją drukowania, otwierania lub anulowania."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT deposits.id, clients.name, deposits.car_model, deposits.registration_number,
-                    deposits.tire_brand, deposits.tire_size, deposits.quantity, deposits.deposit_date
-                FROM deposits
-                INNER JOIN clients ON deposits.client_id = clients.id
-                WHERE deposits.id = ?
-            ''', (deposit_id,))
-            result = cursor.fetchone()
-
-            if result:
-                deposit_id, client_name, car_model, registration_number, tire_brand, tire_size, quantity, deposit_date = result
+            deposit = self.repos.deposits.get(deposit_id)
+
+            if deposit:
                 logo_path = get_file_path("logo.png")
                 output_path = generate_pdf_confirmation(
-                    deposit_id,
-                    client_name,
+                    deposit.id,
+                    deposit.client_name,
                     [
-                        f"Model Auta: {car_model}",
-                        f"Nr Rejestracyjny: {registration_number}",
-                        f"Marka Opon: {tire_brand}",
-                        f"Rozmiar Opon: {tire_size}",
-                        f"Ilość: {quantity}",
-                        f"Data Przyjęcia: {deposit_date}",
+                        f"Model Auta: {deposit.car_model}",
+                        f"Nr Rejestracyjny: {deposit.registration_number}",
+                        f"Marka Opon: {deposit.tire_brand}",
+                        f"Rozmiar Opon: {deposit.tire_size}",
+                        f"Ilość: {deposit.quantity}",
+                        f"Data Przyjęcia: {deposit.deposit_date}",
                     ],
                     logo_path
                 )
@@ -4011,7 +3631,7 @@ class ClientDepositsDialog(QDialog):
 
     def show_history(self, deposit_id):
         """Wyświetla historię zmian dla danego depozytu."""
-        dialog = HistoryDialog(self.conn, deposit_id, parent=self)
+        dialog = HistoryDialog(self.repos, deposit_id, parent=self)
         dialog.exec()
 
 class LocationManagerDialog(QDialog):
@@ -4019,6 +3639,7 @@ class LocationManagerDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Zarządzaj Lokalizacjami")
+        self.repos = parent.repos
         self.layout = QVBoxLayout(self)
 
         self.location_list = QListWidget()
@@ -4045,12 +3666,9 @@ class LocationManagerDialog(QDialog):
     def load_locations(self):
         """Ładuje listę lokalizacji z bazy danych."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT name FROM locations ORDER BY name")
-            locations = cursor.fetchall()
-            self.locations_list_widget.clear()
-            for location in locations:
-                self.locations_list_widget.addItem(QListWidgetItem(location[0]))
+            self.location_list.clear()
+            for location_name in self.repos.settings.location_names():
+                self.location_list.addItem(QListWidgetItem(location_name))
         except Exception as e:
             QMessageBox.critical(self, "Błąd", f"Wystąpił błąd podczas ładowania lokalizacji:\n{e}")
             logger.error(f"Błąd podczas ładowania lokalizacji: {e}")
@@ -4061,9 +3679,7 @@ class LocationManagerDialog(QDialog):
         location_name, ok = QInputDialog.getText(self, "Dodaj lokalizację", "Podaj nazwę lokalizacji:")
         if ok and location_name.strip():
             try:
-                cursor = self.conn.cursor()
-                cursor.execute("INSERT INTO locations (name) VALUES (?)", (location_name.strip(),))
-                self.conn.commit()
+                self.repos.settings.add_location(location_name.strip())
                 self.load_locations()  # Przeładuj listę lokalizacji
                 QMessageBox.information(self, "Sukces", "Lokalizacja została dodana.")
             except sqlite3.IntegrityError:
@@ -4080,10 +3696,8 @@ class LocationManagerDialog(QDialog):
             old_name = selected_item.text()
             new_name, ok = QInputDialog.getText(self, "Edytuj Lokalizację", "Nowa nazwa lokalizacji:", text=old_name)
             if ok and new_name:
-                cursor = self.parent().conn.cursor()
                 try:
-                    cursor.execute("UPDATE locations SET name = ? WHERE name = ?", (new_name, old_name))
-                    self.parent().conn.commit()
+                    self.repos.settings.rename_location(old_name, new_name)
                     self.load_locations()
                 except sqlite3.IntegrityError:
                     QMessageBox.warning(self, "Błąd", "Lokalizacja o tej nazwie już istnieje.")
@@ -4095,9 +3709,7 @@ class LocationManagerDialog(QDialog):
             name = selected_item.text()
             reply = QMessageBox.question(self, "Usuń Lokalizację", f"Czy na pewno chcesz usunąć lokalizację '{name}'?", QMessageBox.Yes | QMessageBox.No)
             if reply == QMessageBox.Yes:
-                cursor = self.parent().conn.cursor()
-                cursor.execute("DELETE FROM locations WHERE name = ?", (name,))
-                self.parent().conn.commit()
+                self.repos.settings.delete_location(name)
                 self.load_locations()
 
     def set_default_location(self):
@@ -4105,18 +3717,15 @@ class LocationManagerDialog(QDialog):
         selected_item = self.location_list.currentItem()
         if selected_item:
             name = selected_item.text()
-            cursor = self.parent().conn.cursor()
-            cursor.execute("UPDATE locations SET is_default = 0")
-            cursor.execute("UPDATE locations SET is_default = 1 WHERE name = ?", (name,))
-            self.parent().conn.commit()
+            self.repos.settings.set_default_location(name)
             self.load_locations()
 
 class ClientVehiclesDialog(QDialog):
     """Dialog do wyświetlania pojazdów i depozytów klienta z dodatkowymi funkcjami."""
 
-    def __init__(self, conn, client_id, client_name, parent=None):
+    def __init__(self, repos, client_id, client_name, parent=None):
         super().__init__(parent)
-        self.conn = conn
+        self.repos = repos
         self.client_id = client_id
         self.client_name = client_name
         self.setWindowTitle(f"Pojazdy i depozyty klienta: {client_name}")
@@ -4158,20 +3767,13 @@ class ClientVehiclesDialog(QDialog):
     def load_client_info(self):
         """Ładowanie szczegółowych informacji o kliencie."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT phone_number, email, discount, barcode, additional_info
-                FROM clients
-                WHERE id = ?
-            ''', (self.client_id,))
-            client_data = cursor.fetchone()
-            if client_data:
-                phone, email, discount, barcode, additional_info = client_data
-                info = f"Telefon: {phone or 'Brak'}\n"
-                info += f"Email: {email or 'Brak'}\n"
-                info += f"Rabat: {discount or 0}%\n"
-                info += f"Kod kreskowy: {barcode or 'Brak'}\n"
-                info += f"Dodatkowe informacje: {additional_info or 'Brak'}"
+            client = self.repos.clients.get(self.client_id)
+            if client:
+                info = f"Telefon: {client.phone_number or 'Brak'}\n"
+                info += f"Email: {client.email or 'Brak'}\n"
+                info += f"Rabat: {client.discount or 0}%\n"
+                info += f"Kod kreskowy: {client.barcode or 'Brak'}\n"
+                info += f"Dodatkowe informacje: {client.additional_info or 'Brak'}"
                 self.client_info_label.setText(info)
         except sqlite3.Error as e:
             QMessageBox.critical(self, "Błąd", f"Błąd podczas ładowania danych klienta: {e}")
@@ -4180,13 +3782,10 @@ class ClientVehiclesDialog(QDialog):
     def load_data(self):
         """Ładowanie danych pojazdów i depozytów klienta."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT d.id, d.car_model, d.registration_number, d.tire_brand, d.tire_size, d.status
-                FROM deposits d
-                WHERE d.client_id = ?
-            ''', (self.client_id,))
-            rows = cursor.fetchall()
+            rows = [
+                (d.id, d.car_model, d.registration_number, d.tire_brand, d.tire_size, d.status)
+                for d in self.repos.deposits.list_for_client(self.client_id)
+            ]
 
             self.table.setRowCount(0)  # Wyczyszczenie tabeli
             for row_idx, row_data in enumerate(rows):
@@ -4233,13 +3832,10 @@ class ClientVehiclesDialog(QDialog):
     def toggle_deposit_status(self, deposit_id):
         """Przełącza status depozytu między 'Aktywny' a 'Wydany'."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT status FROM deposits WHERE id = ?", (deposit_id,))
-            current_status = cursor.fetchone()[0]
-            new_status = "Aktywny" if current_status == "Wydany" else "Wydany"
-
-            cursor.execute("UPDATE deposits SET status = ? WHERE id = ?", (new_status, deposit_id))
-            self.conn.commit()
+            new_status = self.repos.deposits.toggle_status(deposit_id)
+            if new_status is None:
+                QMessageBox.warning(self, "Błąd", "Nie znaleziono depozytu.")
+                return
 
             QMessageBox.information(self, "Sukces", f"Status depozytu został zmieniony na: {new_status}")
             self.load_data()
@@ -4250,18 +3846,12 @@ class ClientVehiclesDialog(QDialog):
     def generate_label(self, deposit_id):
         """Generuje etykietę dla depozytu."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT car_model, registration_number, tire_brand, tire_size
-                FROM deposits
-                WHERE id = ?
-            ''', (deposit_id,))
-            deposit = cursor.fetchone()
+            deposit = self.repos.deposits.get(deposit_id)
             if not deposit:
                 QMessageBox.warning(self, "Błąd", "Nie znaleziono depozytu.")
                 return
 
-            label_content = f"Etykieta depozytu:\n\nPojazd: {deposit[0]}\nRejestracja: {deposit[1]}\nMarka opon: {deposit[2]}\nRozmiar opon: {deposit[3]}"
+            label_content = f"Etykieta depozytu:\n\nPojazd: {deposit.car_model}\nRejestracja: {deposit.registration_number}\nMarka opon: {deposit.tire_brand}\nRozmiar opon: {deposit.tire_size}"
             file_path = QFileDialog.getSaveFileName(self, "Zapisz etykietę", "", "Pliki PDF (*.pdf)")[0]
             if file_path:
                 generate_pdf(file_path, label_content)
@@ -4273,18 +3863,12 @@ class ClientVehiclesDialog(QDialog):
     def generate_confirmation(self, deposit_id):
         """Generuje potwierdzenie dla depozytu."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT car_model, registration_number, tire_brand, tire_size, status
-                FROM deposits
-                WHERE id = ?
-            ''', (deposit_id,))
-            deposit = cursor.fetchone()
+            deposit = self.repos.deposits.get(deposit_id)
             if not deposit:
                 QMessageBox.warning(self, "Błąd", "Nie znaleziono depozytu.")
                 return
 
-            confirmation_content = f"Potwierdzenie depozytu:\n\nPojazd: {deposit[0]}\nRejestracja: {deposit[1]}\nMarka opon: {deposit[2]}\nRozmiar opon: {deposit[3]}\nStatus: {deposit[4]}"
+            confirmation_content = f"Potwierdzenie depozytu:\n\nPojazd: {deposit.car_model}\nRejestracja: {deposit.registration_number}\nMarka opon: {deposit.tire_brand}\nRozmiar opon: {deposit.tire_size}\nStatus: {deposit.status}"
             file_path = QFileDialog.getSaveFileName(self, "Zapisz potwierdzenie", "", "Pliki PDF (*.pdf)")[0]
             if file_path:
                 generate_pdf(file_path, confirmation_content)
@@ -4294,7 +3878,7 @@ class ClientVehiclesDialog(QDialog):
             logger.error(f"Błąd podczas generowania potwierdzenia: {e}")
     def edit_deposit(self, deposit_id):
         """Edytuje depozyt."""
-        dialog = DepositDialog(self.conn, deposit_id=deposit_id, parent=self)
+        dialog = DepositDialog(self.repos, deposit_id=deposit_id, parent=self)
         if dialog.exec() == QDialog.Accepted:
             self.load_data()
 
@@ -4303,9 +3887,7 @@ class ClientVehiclesDialog(QDialog):
         confirmation = QMessageBox.question(self, "Potwierdzenie usunięcia", "Czy na pewno chcesz usunąć ten depozyt?")
         if confirmation == QMessageBox.Yes:
             try:
-                cursor = self.conn.cursor()
-                cursor.execute("DELETE FROM deposits WHERE id = ?", (deposit_id,))
-                self.conn.commit()
+                self.repos.deposits.delete(deposit_id)
                 QMessageBox.information(self, "Sukces", "Depozyt został usunięty.")
                 self.load_data()
             except sqlite3.Error as e:
@@ -4314,16 +3896,16 @@ class ClientVehiclesDialog(QDialog):
 
     def edit_client(self):
         """Edytuje dane klienta."""
-        dialog = EditClientDialog(self.conn, client_id=self.client_id, parent=self)
+        dialog = EditClientDialog(self.repos, client_id=self.client_id, parent=self)
         if dialog.exec() == QDialog.Accepted:
             self.load_client_info()
             QMessageBox.information(self, "Sukces", "Dane klienta zostały zaktualizowane.")
 
 class HistoryDialog(QDialog):
     """Dialog wyświetlający historię zmian dla depozytu."""
-    def __init__(self, conn, deposit_id, parent=None):
+    def __init__(self, repos, deposit_id, parent=None):
         super().__init__(parent)
-        self.conn = conn
+        self.repos = repos
         self.deposit_id = deposit_id
         self.setWindowTitle("Historia depozytu")
         self.resize(600, 400)
@@ -4343,14 +3925,7 @@ class HistoryDialog(QDialog):
     def load_history(self):
         """Ładuje historię zmian dla depozytu."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT change_date, user, description, id
-                FROM history
-                WHERE deposit_id = ?
-                ORDER BY change_date DESC
-            ''', (self.deposit_id,))
-            rows = cursor.fetchall()
+            rows = self.repos.deposits.history(self.deposit_id)
 
             self.table_history.setRowCount(len(rows))
             for row_idx, row in enumerate(rows):
@@ -4413,6 +3988,12 @@ class SettingsDialog(QDialog):
         self.auto_print_checkbox.addItems(["Nie", "Tak"])
         self.form_layout.addRow("Automatyczny wydruk:", self.auto_print_checkbox)
 
+        # Liczba wierszy wczytywanych naraz w historii wydanych depozytów i zamówień
+        self.page_size_input = QSpinBox()
+        self.page_size_input.setRange(50, 5000)
+        self.page_size_input.setSingleStep(50)
+        self.form_layout.addRow("Wierszy na stronę historii:", self.page_size_input)
+
         # Edycja szablonów
         self.edit_templates_button = QPushButton("Edytuj szablony")
         self.edit_templates_button.clicked.connect(self.edit_templates)
@@ -4445,9 +4026,7 @@ class SettingsDialog(QDialog):
 
     def load_settings(self):
         """Ładuje ustawienia z bazy danych."""
-        cursor = self.parent.conn.cursor()
-        cursor.execute("SELECT key, value FROM settings")
-        settings = dict(cursor.fetchall())
+        settings = self.parent.repos.settings.all()
 
         self.company_name_input.setText(settings.get('company_name', ''))
         self.company_address_input.setText(settings.get('company_address', ''))
@@ -4455,6 +4034,7 @@ class SettingsDialog(QDialog):
         self.company_logo_input.setText(settings.get('company_logo', ''))
         self.default_location_input.setText(settings.get('default_location', ''))
         self.auto_print_checkbox.setCurrentText("Tak" if settings.get('auto_print', 'False') == 'True' else "Nie")
+        self.page_size_input.setValue(self.parent.page_size)
 
     def save_settings(self):
         """Zapisuje ustawienia aplikacji."""
@@ -4471,7 +4051,6 @@ class SettingsDialog(QDialog):
         label_printer = getattr(self.parent, 'label_printer', '')
 
         try:
-            cursor = self.parent.conn.cursor()
             settings = {
                 'company_name': company_name,
                 'company_address': company_address,
@@ -4482,16 +4061,10 @@ class SettingsDialog(QDialog):
                 'auto_print': str(auto_print),
                 'default_printer': default_printer,
                 'label_printer': label_printer,
+                'page_size': str(self.page_size_input.value()),
             }
 
-            for key, value in settings.items():
-                cursor.execute('''
-                    INSERT INTO settings (key, value)
-                    VALUES (?, ?)
-                    ON CONFLICT(key) DO UPDATE SET value=excluded.value
-                ''', (key, value))
-
-            self.parent.conn.commit()
+            self.parent.repos.settings.save(settings)
             self.parent.load_settings()
             QMessageBox.information(self, "Ustawienia", "Ustawienia zostały zaktualizowane.")
             self.accept()
@@ -4512,10 +4085,7 @@ class SettingsDialog(QDialog):
                     QMessageBox.No
                 )
                 if confirm == QMessageBox.Yes:
-                    current_db_path = self.parent.conn.database
-                    self.parent.conn.close()
-                    shutil.copy(file_path, current_db_path)
-                    self.parent.conn = sqlite3.connect(current_db_path)
+                    self.parent.repos.restore(file_path)
                     self.parent.load_settings()
                     QMessageBox.information(self, "Sukces", "Kopia zapasowa została zaimportowana pomyślnie.")
             except Exception as e:
@@ -4623,9 +4193,9 @@ class LogViewerDialog(QDialog):
 
 class SendEmailDialog(QDialog):
     """Dialog do wysyłania e-maila do klienta."""
-    def __init__(self, conn, email, client_name, expected_return_date, parent=None):
+    def __init__(self, repos, email, client_name, expected_return_date, parent=None):
         super().__init__(parent)
-        self.conn = conn
+        self.repos = repos
         self.email = email
         self.client_name = client_name
         self.expected_return_date = expected_return_date
@@ -4662,13 +4232,10 @@ class SendEmailDialog(QDialog):
 
     def load_templates(self):
         """Ładuje listę szablonów e-mail."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT name FROM email_templates")
-        templates = cursor.fetchall()
         self.template_combo.clear()
         self.template_combo.addItem("Brak szablonu")
-        for template in templates:
-            self.template_combo.addItem(template[0])
+        for template_name in self.repos.emails.template_names():
+            self.template_combo.addItem(template_name)
 
     def load_template(self):
         """Ładuje wybrany szablon e-mail."""
@@ -4677,12 +4244,10 @@ class SendEmailDialog(QDialog):
             self.subject_input.clear()
             self.body_input.clear()
             return
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT subject, body FROM email_templates WHERE name = ?", (template_name,))
-        template = cursor.fetchone()
+        template = self.repos.emails.get_template(template_name)
         if template:
-            subject = template[0].replace("{client_name}", self.client_name).replace("{expected_return_date}", self.expected_return_date)
-            body = template[1].replace("{client_name}", self.client_name).replace("{expected_return_date}", self.expected_return_date)
+            subject = template.subject.replace("{client_name}", self.client_name).replace("{expected_return_date}", self.expected_return_date)
+            body = template.body.replace("{client_name}", self.client_name).replace("{expected_return_date}", self.expected_return_date)
             self.subject_input.setText(subject)
             self.body_input.setPlainText(body)
 
@@ -4692,33 +4257,11 @@ class SendEmailDialog(QDialog):
         subject = self.subject_input.text()
         body = self.body_input.toPlainText()
 
-        # Implementacja wysyłania e-maila
+        # Wiadomość trafia do kolejki - wysyła ją wątek w tle, historia zapisuje się po wysłaniu
         try:
-            settings = self.parent().email_settings
-            from_address = settings['email_address']
-            password = settings['email_password']
-            smtp_server = settings['smtp_server']
-            smtp_port = settings['smtp_port']
-
-            msg = MIMEText(body)
-            msg['Subject'] = subject
-            msg['From'] = from_address
-            msg['To'] = to_address
-
-            server = smtplib.SMTP_SSL(smtp_server, smtp_port)
-            server.login(from_address, password)
-            server.sendmail(from_address, [to_address], msg.as_string())
-            server.quit()
-
-            # Zapisanie historii e-maili
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO email_history (to_address, subject, body, sent_date)
-                VALUES (?, ?, ?, ?)
-            ''', (to_address, subject, body, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-            self.conn.commit()
-
-            QMessageBox.information(self, "E-mail", "E-mail został wysłany.")
+            self.parent().send_email(to_address, subject, body, self.repos)
+
+            QMessageBox.information(self, "E-mail", "E-mail został dodany do kolejki wysyłki.")
             self.accept()
         except Exception as e:
             logger.error(f"Błąd podczas wysyłania e-maila: {e}")
@@ -4745,6 +4288,10 @@ class EmailSettingsDialog(QDialog):
         self.smtp_port_input = QLineEdit("465")
         self.form_layout.addRow("Port SMTP:", self.smtp_port_input)
 
+        self.rate_input = QSpinBox()
+        self.rate_input.setRange(1, 600)
+        self.form_layout.addRow("Limit wiadomości na minutę:", self.rate_input)
+
         self.layout.addLayout(self.form_layout)
 
         # Przyciski
@@ -4766,6 +4313,7 @@ class EmailSettingsDialog(QDialog):
         self.email_password_input.setText(settings.get('email_password', ''))
         self.smtp_server_input.setText(settings.get('smtp_server', ''))
         self.smtp_port_input.setText(settings.get('smtp_port', '465'))
+        self.rate_input.setValue(int(settings.get('email_rate_per_minute') or DEFAULT_RATE_PER_MINUTE))
 
     def save_email_settings(self):
         """Zapisuje ustawienia e-mail."""
@@ -4774,49 +4322,23 @@ class EmailSettingsDialog(QDialog):
         smtp_server = self.smtp_server_input.text()
         smtp_port = self.smtp_port_input.text()
 
-        cursor = self.parent().conn.cursor()
         settings = {
             'email_address': email_address,
             'email_password': email_password,
             'smtp_server': smtp_server,
-            'smtp_port': smtp_port
+            'smtp_port': smtp_port,
+            'email_rate_per_minute': str(self.rate_input.value()),
         }
-        for key, value in settings.items():
-            cursor.execute('''
-                INSERT INTO settings (key, value)
-                VALUES (?, ?)
-                ON CONFLICT(key) DO UPDATE SET value=excluded.value
-            ''', (key, value))
-        self.parent().conn.commit()
+        self.parent().repos.settings.save(settings)
         self.parent().email_settings = settings
         QMessageBox.information(self, "Ustawienia e-mail", "Ustawienia e-mail zostały zapisane.")
         self.accept()
 
-    def create_default_email_template(conn):
-        """Tworzy domyślny szablon e-mail, jeśli nie istnieje."""
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM email_templates")
-            count = cursor.fetchone()[0]
-            if count == 0:
-                cursor.execute('''
-                    INSERT INTO email_templates (name, subject, body)
-                    VALUES (?, ?, ?)
-                ''', (
-                    "Przypomnienie o zwrocie",
-                    "Przypomnienie o zwrocie opon",
-                    "Szanowny/a {client_name},\n\nPrzypominamy o oczekiwanym zwrocie opon do dnia {expected_return_date}.\n\nPozdrawiamy,\n{company_name}"
-                ))
-                conn.commit()
-                logger.info("Dodano domyślny szablon e-mail.")
-        except Exception as e:
-            logger.error(f"Błąd podczas tworzenia domyślnego szablonu e-mail: {e}")
-
 class EmailHistoryDialog(QDialog):
     """Dialog do wyświetlania historii wysłanych e-maili."""
-    def __init__(self, conn, parent=None):
+    def __init__(self, repos, parent=None):
         super().__init__(parent)
-        self.conn = conn
+        self.repos = repos
         self.setWindowTitle("Historia wysłanych e-maili")
         self.resize(800, 600)
         self.layout = QVBoxLayout(self)
@@ -4837,13 +4359,7 @@ class EmailHistoryDialog(QDialog):
     def load_email_history(self):
         """Ładuje historię wysłanych e-maili."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT sent_date, to_address, subject, body
-                FROM email_history
-                ORDER BY sent_date DESC
-            ''')
-            rows = cursor.fetchall()
+            rows = self.repos.emails.history()
 
             self.table_emails.setRowCount(len(rows))
             for row_idx, row in enumerate(rows):
@@ -4855,9 +4371,9 @@ class EmailHistoryDialog(QDialog):
 
 class EmailTemplateManagerDialog(QDialog):
     """Dialog do zarządzania szablonami e-mail i SMS."""
-    def __init__(self, conn, parent=None):
+    def __init__(self, repos, parent=None):
         super().__init__(parent)
-        self.conn = conn
+        self.repos = repos
         self.setWindowTitle("Szablony wiadomości")
         self.resize(600, 400)
         self.layout = QVBoxLayout(self)
@@ -4892,22 +4408,17 @@ class EmailTemplateManagerDialog(QDialog):
 
     def load_templates(self):
         """Ładuje listę szablonów."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT name FROM email_templates")
-        templates = cursor.fetchall()
         self.template_list.clear()
-        for template in templates:
-            self.template_list.addItem(template[0])
+        for template_name in self.repos.emails.template_names():
+            self.template_list.addItem(template_name)
 
     def load_template(self, item):
         """Ładuje wybrany szablon do formularza."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT subject, body FROM email_templates WHERE name = ?", (item.text(),))
-        template = cursor.fetchone()
+        template = self.repos.emails.get_template(item.text())
         if template:
             self.template_name_input.setText(item.text())
-            self.subject_input.setText(template[0])
-            self.body_input.setPlainText(template[1])
+            self.subject_input.setText(template.subject)
+            self.body_input.setPlainText(template.body)
 
     def save_template(self):
         """Zapisuje szablon do bazy danych."""
@@ -4917,13 +4428,7 @@ class EmailTemplateManagerDialog(QDialog):
         if not name:
             QMessageBox.warning(self, "Błąd", "Musisz podać nazwę szablonu.")
             return
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO email_templates (name, subject, body)
-            VALUES (?, ?, ?)
-            ON CONFLICT(name) DO UPDATE SET subject=excluded.subject, body=excluded.body
-        ''', (name, subject, body))
-        self.conn.commit()
+        self.repos.emails.save_template(name, subject, body)
         self.load_templates()
         QMessageBox.information(self, "Szablony", "Szablon został zapisany.")
 
@@ -4935,9 +4440,7 @@ class EmailTemplateManagerDialog(QDialog):
             return
         reply = QMessageBox.question(self, "Usuń szablon", f"Czy na pewno chcesz usunąć szablon '{name}'?", QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
-            cursor = self.conn.cursor()
-            cursor.execute("DELETE FROM email_templates WHERE name = ?", (name,))
-            self.conn.commit()
+            self.repos.emails.delete_template(name)
             self.load_templates()
             self.template_name_input.clear()
             self.subject_input.clear()
@@ -4983,61 +4486,47 @@ class PrinterSettingsDialog(QDialog):
         default_printer = self.default_printer_input.text()
         label_printer = self.label_printer_input.text()
 
-        cursor = self.parent().conn.cursor()
         settings = {
             'default_printer': default_printer,
             'label_printer': label_printer
         }
-        for key, value in settings.items():
-            cursor.execute('''
-                INSERT INTO settings (key, value)
-                VALUES (?, ?)
-                ON CONFLICT(key) DO UPDATE SET value=excluded.value
-            ''', (key, value))
-        self.parent().conn.commit()
+        self.parent().repos.settings.save(settings)
         self.accept()
 
 class DepositDetailsDialog(QDialog):
     """Dialog wyświetlający szczegóły depozytu."""
-    def __init__(self, conn, deposit_id, parent=None):
+    def __init__(self, repos, deposit_id, parent=None):
         super().__init__(parent)
-        self.conn = conn
+        self.repos = repos
         self.deposit_id = deposit_id
         self.setWindowTitle("Szczegóły Depozytu")
         self.layout = QVBoxLayout(self)
 
         # Pobierz dane depozytu
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT deposits.*, clients.name, clients.phone_number, clients.email
-            FROM deposits
-            INNER JOIN clients ON deposits.client_id = clients.id
-            WHERE deposits.id = ?
-        ''', (self.deposit_id,))
-        deposit = cursor.fetchone()
+        deposit = self.repos.deposits.get(self.deposit_id)
         if deposit:
             deposit_info = {
-                'ID': deposit[0],
-                'Klient': deposit[-3],
-                'Telefon': deposit[-2],
-                'E-mail': deposit[-1],
-                'Model auta': deposit[2],
-                'Nr rejestracyjny': deposit[3],
-                'Marka opon': deposit[4],
-                'Rozmiar opon': deposit[5],
-                'Ilość': deposit[6],
-                'Lokalizacja': deposit[7],
-                'Mycie': 'Tak' if deposit[8] else 'Nie',
-                'Konserwacja': 'Tak' if deposit[9] else 'Nie',
-                'Data depozytu': deposit[10],
-                'Data wydania': deposit[11],
-                'Status': deposit[12],
-                'Czas trwania (dni)': deposit[13],
-                'Sezon': deposit[14],
-                'Oczekiwany zwrot': deposit[15],
-                'Stan techniczny': deposit[16],
-                'Data przechowywania': deposit[17],
-                'Cena': deposit[18],
+                'ID': deposit.id,
+                'Klient': deposit.client_name,
+                'Telefon': deposit.phone_number,
+                'E-mail': deposit.email,
+                'Model auta': deposit.car_model,
+                'Nr rejestracyjny': deposit.registration_number,
+                'Marka opon': deposit.tire_brand,
+                'Rozmiar opon': deposit.tire_size,
+                'Ilość': deposit.quantity,
+                'Lokalizacja': deposit.location,
+                'Mycie': 'Tak' if deposit.washing else 'Nie',
+                'Konserwacja': 'Tak' if deposit.conservation else 'Nie',
+                'Data depozytu': deposit.deposit_date,
+                'Data wydania': deposit.issue_date,
+                'Status': deposit.status,
+                'Czas trwania (dni)': deposit.duration,
+                'Sezon': deposit.season,
+                'Oczekiwany zwrot': deposit.expected_return_date,
+                'Stan techniczny': deposit.technical_condition,
+                'Data przechowywania': deposit.storage_date,
+                'Cena': deposit.price,
             }
             # Wyświetl dane w formularzu
             form_layout = QFormLayout()
@@ -0,0 +1,126 @@
+# tire_sizes.py
+#
+# Rozbiór rozmiaru opony zapisanego tekstem ("205/55 R16", "205/55R16", "205 55 16", "225/45 ZR17 94W")
+# na szerokość, profil, konstrukcję i średnicę felgi - przechowywane w osobnych, indeksowanych kolumnach.
+
+import re
+from collections import namedtuple
+
+TireSize = namedtuple("TireSize", ["width", "aspect_ratio", "construction", "rim_diameter"])
+
+# Filtr zakresu rozmiarów; None w polu oznacza brak ograniczenia
+SizeFilter = namedtuple("SizeFilter", ["width_min", "width_max", "aspect_ratio", "rim_diameter"])
+
+# Nazwy kolumn w tabelach deposits, inventory i order_items, w kolejności pól TireSize
+SIZE_COLUMNS = ("tire_width", "tire_aspect_ratio", "tire_construction", "tire_rim_diameter")
+
+EMPTY_SIZE = TireSize(None, None, None, None)
+
+_SIZE_PATTERN = re.compile(r'''
+    ^\s*(?:P|LT|ST|T)?\s*
+    (?P<width>\d{3})
+    (?:\s*[/\s]\s*(?P<aspect>\d{2,3}))?
+    \s*[-/]?\s*
+    (?P<construction>ZR|R|D|B)?
+    \s*[-/]?\s*
+    (?P<rim>\d{2})(?:[.,]0)?
+    (?![\d.,])
+''', re.VERBOSE | re.IGNORECASE)
+
+_RIM_TOKEN = re.compile(r'^Z?R(\d{2})$', re.IGNORECASE)
+_WIDTH_TOKEN = re.compile(r'^(\d{3})$')
+_WIDTH_RANGE_TOKEN = re.compile(r'^(\d{3})\s*(?:-|–|\.\.)\s*(\d{3})$')
+_WIDTH_ASPECT_TOKEN = re.compile(r'^(\d{3})/(\d{2,3})$')
+_ASPECT_TOKEN = re.compile(r'^/(\d{2,3})$')
+
+
+def parse_tire_size(text):
+    """Zwraca TireSize albo None, jeśli tekst nie wygląda na rozmiar opony (np. "31x10.50R15")."""
+    if not text:
+        return None
+    match = _SIZE_PATTERN.match(text)
+    if not match:
+        return None
+    construction = (match.group("construction") or "R").upper()
+    if construction == "ZR":
+        # ZR to opona radialna z oznaczeniem prędkości
+        construction = "R"
+    aspect_ratio = match.group("aspect")
+    return TireSize(
+        int(match.group("width")),
+        int(aspect_ratio) if aspect_ratio else None,
+        construction,
+        int(match.group("rim")),
+    )
+
+
+def size_columns(text):
+    """Wartości kolumn SIZE_COLUMNS dla tekstu rozmiaru (same None, gdy nie da się go rozebrać)."""
+    return tuple(parse_tire_size(text) or EMPTY_SIZE)
+
+
+def format_tire_size(size):
+    """Postać kanoniczna, np. TireSize(205, 55, 'R', 16) -> "205/55 R16"."""
+    if size.aspect_ratio is None:
+        return f"{size.width} {size.construction}{size.rim_diameter}"
+    return f"{size.width}/{size.aspect_ratio} {size.construction}{size.rim_diameter}"
+
+
+def parse_size_filter(text):
+    """
+    Rozpoznaje w pasku wyszukiwania zapytanie o zakres rozmiarów.
+
+    Obsługiwane: pełny rozmiar ("205/55R16"), średnica ("R16"), szerokość ("205"),
+    zakres szerokości ("195-215"), szerokość z profilem ("205/55"), profil ("/55")
+    oraz ich połączenia ("195-215 R16"). Zwraca SizeFilter albo None dla zwykłego tekstu.
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+
+    size = parse_tire_size(text)
+    if size and (size.aspect_ratio is not None or re.search(r'[RDB]\s*\d', text, re.IGNORECASE)):
+        return SizeFilter(size.width, size.width, size.aspect_ratio, size.rim_diameter)
+
+    width_min = width_max = aspect_ratio = rim_diameter = None
+    for token in re.split(r'[\s,;]+', text):
+        if _RIM_TOKEN.match(token):
+            rim_diameter = int(_RIM_TOKEN.match(token).group(1))
+        elif _WIDTH_RANGE_TOKEN.match(token):
+            low, high = _WIDTH_RANGE_TOKEN.match(token).groups()
+            width_min, width_max = sorted((int(low), int(high)))
+        elif _WIDTH_ASPECT_TOKEN.match(token):
+            width, aspect = _WIDTH_ASPECT_TOKEN.match(token).groups()
+            width_min = width_max = int(width)
+            aspect_ratio = int(aspect)
+        elif _WIDTH_TOKEN.match(token):
+            width_min = width_max = int(token)
+        elif _ASPECT_TOKEN.match(token):
+            aspect_ratio = int(_ASPECT_TOKEN.match(token).group(1))
+        else:
+            return None
+    return SizeFilter(width_min, width_max, aspect_ratio, rim_diameter)
+
+
+def size_filter_sql(size_filter, table):
+    """Warunek WHERE (z parametrami) dla filtra rozmiarów na kolumnach SIZE_COLUMNS tabeli."""
+    conditions = []
+    parameters = []
+    if size_filter is None:
+        size_filter = SizeFilter(None, None, None, None)
+    if size_filter.rim_diameter is not None:
+        conditions.append(f"{table}.tire_rim_diameter = ?")
+        parameters.append(size_filter.rim_diameter)
+    if size_filter.width_min is not None:
+        if size_filter.width_min == size_filter.width_max:
+            conditions.append(f"{table}.tire_width = ?")
+            parameters.append(size_filter.width_min)
+        else:
+            conditions.append(f"{table}.tire_width BETWEEN ? AND ?")
+            parameters.extend((size_filter.width_min, size_filter.width_max))
+    if size_filter.aspect_ratio is not None:
+        conditions.append(f"{table}.tire_aspect_ratio = ?")
+        parameters.append(size_filter.aspect_ratio)
+    if not conditions:
+        conditions.append(f"{table}.tire_width IS NOT NULL")
+    return " AND ".join(conditions), tuple(parameters)